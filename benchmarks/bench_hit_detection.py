@@ -0,0 +1,104 @@
+import argparse
+import random
+import sys
+import time
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from game.map_data import MapData
+from game.spatial_hash import SpatialHash
+from game.array_world import ArrayWorld, np
+
+HIT_RADIUS = 20
+MAP_PATH = os.path.join(ROOT, 'assets', 'map', 'map.tmx')
+
+
+# Bullet vs player hit detection: the old all-pairs loop from
+# ClientThread.run against the spatial hash used by the server tick and,
+# when numpy is installed, the vectorized ArrayWorld (--world numpy)
+def naive_hits(players, bullets):
+    hits = 0
+    for shooter_id, bullet_x, bullet_y in bullets:
+        for target_id, (target_x, target_y) in players.items():
+            if target_id != shooter_id:
+                distance = ((bullet_x - target_x) ** 2 + (bullet_y - target_y) ** 2) ** 0.5
+                if distance < HIT_RADIUS:
+                    hits += 1
+                    break
+    return hits
+
+
+def grid_hits(grid, players, bullets):
+    for player_id, (x, y) in players.items():
+        grid.move(player_id, x, y)
+    radius_squared = HIT_RADIUS * HIT_RADIUS
+    hits = 0
+    for shooter_id, bullet_x, bullet_y in bullets:
+        for target_id, target_x, target_y in grid.query(bullet_x, bullet_y, HIT_RADIUS):
+            if target_id != shooter_id and (bullet_x - target_x) ** 2 + (bullet_y - target_y) ** 2 < radius_squared:
+                hits += 1
+                break
+    return hits
+
+
+def array_hits(world, players, bullets_by_owner):
+    # Bullets are re-reported every update, so this also times set_player
+    for player_id, position in players.items():
+        world.set_player(player_id, position, "", "falcon", 100, bullets_by_owner.get(player_id, []))
+    before = world.bullets.alive.sum()
+    world.step(0.0)
+    return int(before - world.bullets.alive.sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bullet vs player hit detection")
+    parser.add_argument('--players', default='100,300,500')
+    parser.add_argument('--bullets', default='1000,5000')
+    parser.add_argument('--ticks', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    width, height = MapData(MAP_PATH).get_map_size()
+    rng = random.Random(args.seed)
+    print(f"{'players':>7} {'bullets':>7} {'naive ms':>9} {'grid ms':>8} {'speedup':>8} {'numpy ms':>9} {'hits':>6}")
+    for player_count in [int(p) for p in args.players.split(',')]:
+        for bullet_count in [int(b) for b in args.bullets.split(',')]:
+            players = {i: (rng.uniform(0, width), rng.uniform(0, height)) for i in range(player_count)}
+            bullets = [(rng.randrange(player_count), rng.uniform(0, width), rng.uniform(0, height))
+                       for _ in range(bullet_count)]
+            # Players drift a little every tick, like real movement
+            frames = []
+            for _ in range(args.ticks):
+                players = {i: (x + rng.uniform(-5, 5), y + rng.uniform(-5, 5)) for i, (x, y) in players.items()}
+                frames.append(players)
+
+            start = time.perf_counter()
+            expected = sum(naive_hits(frame, bullets) for frame in frames)
+            naive = (time.perf_counter() - start) / args.ticks
+
+            grid = SpatialHash(HIT_RADIUS * 2, width, height)
+            start = time.perf_counter()
+            hits = sum(grid_hits(grid, frame, bullets) for frame in frames)
+            hashed = (time.perf_counter() - start) / args.ticks
+
+            vectorized = float('nan')
+            if np is not None:
+                bullets_by_owner = {}
+                for shooter_id, bullet_x, bullet_y in bullets:
+                    bullets_by_owner.setdefault(shooter_id, []).append((bullet_x, bullet_y, 'front', 0))
+                world = ArrayWorld(HIT_RADIUS)
+                start = time.perf_counter()
+                array_total = sum(array_hits(world, frame, bullets_by_owner) for frame in frames)
+                vectorized = (time.perf_counter() - start) / args.ticks
+                if array_total != expected:
+                    raise SystemExit(f"ArrayWorld found {array_total} hits, naive loop found {expected}")
+
+            print(f"{player_count:>7} {bullet_count:>7} {naive * 1000:>9.2f} {hashed * 1000:>8.2f} "
+                  f"{naive / hashed:>7.1f}x {vectorized * 1000:>9.2f} {hits // args.ticks:>6}")
+            if hits != expected:
+                raise SystemExit(f"grid found {hits} hits, naive loop found {expected}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+MAP_PATH = os.path.join(ROOT, 'assets', 'map', 'map.tmx')
+
+# Runs in a fresh interpreter so imports and file reads are paid each time.
+# Prints the time from before "import pygame" to the first map frame on
+# screen, and the part of it spent loading the map and drawing that frame.
+CHILD = """
+import time
+start = time.perf_counter()
+import sys
+sys.path.insert(0, {root!r})
+import pygame
+pygame.init()
+screen = pygame.display.set_mode((800, 600))
+from game.map_manager import MapManager
+map_start = time.perf_counter()
+map_manager = MapManager({map_path!r}, use_cache={use_cache!r})
+assert (map_manager.cache is not None) == {use_cache!r}
+map_manager.draw(screen, 0, 0)
+end = time.perf_counter()
+print(end - start, end - map_start)
+"""
+
+
+# Compare client map startup with pytmx (cold) and with the compiled cache
+def measure(map_path, use_cache, runs):
+    env = dict(os.environ, SDL_VIDEODRIVER='dummy', PYGAME_HIDE_SUPPORT_PROMPT='1')
+    code = CHILD.format(root=ROOT, map_path=map_path, use_cache=use_cache)
+    totals = []
+    map_times = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True)
+        total, map_time = output.stdout.strip().splitlines()[-1].split()
+        totals.append(float(total))
+        map_times.append(float(map_time))
+    return totals, map_times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold (pytmx) vs cached map startup")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--map', default=MAP_PATH)
+    args = parser.parse_args()
+
+    env = dict(os.environ, SDL_VIDEODRIVER='dummy', PYGAME_HIDE_SUPPORT_PROMPT='1')
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(ROOT, 'game', 'map_cache.py'), args.map], env=env, check=True)
+    print(f"compile: {(time.perf_counter() - start) * 1000:.1f} ms (whole process)")
+
+    print(f"{'mode':<8} {'startup ms':>10} {'min ms':>8} {'map ms':>8}")
+    for mode, use_cache in (('cold', False), ('cached', True)):
+        totals, map_times = measure(args.map, use_cache, args.runs)
+        print(f"{mode:<8} {statistics.median(totals) * 1000:>10.1f} {min(totals) * 1000:>8.1f} "
+              f"{statistics.median(map_times) * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import argparse
+import selectors
+import socket
+import sys
+import time
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from game import protocol
+from game.player_input import BUTTON_LEFT, BUTTON_RIGHT
+from common import start_server, percentile
+
+SEND_RATE = 60  # Les vrais clients envoient une mise à jour par frame
+WARMUP = 1.0  # Seconds of traffic before measuring, drains what queued up while connecting
+
+
+# Compare the threaded and eventloop engines: each run starts a fresh server
+# process, opens N fake clients that send updates at 60 Hz like client.py,
+# and measures how many of them got their init message plus the latency
+# between a probe input and the input ack the server sends with the first
+# snapshot that includes it.
+def receive(selector, timeout):
+    # Reads whatever arrived, returns [(client, message)]
+    messages = []
+    for key, _ in selector.select(timeout):
+        client = key.data
+        try:
+            data = client['sock'].recv(65536)
+        except (BlockingIOError, OSError):
+            continue
+        if not data:
+            selector.unregister(client['sock'])
+            continue
+        for msg in client['decoder'].feed(data):
+            if msg[0] == 'init':
+                client['id'] = msg[1]
+            elif msg[0] in ('snapshot', 'delta'):
+                client['tick'] = msg[1]  # Acked like a real client, the server sends deltas
+            messages.append((client, msg))
+    return messages
+
+
+def run_clients(port, count, duration):
+    selector = selectors.DefaultSelector()
+    clients = []
+    for i in range(count):
+        try:
+            sock = socket.create_connection(('127.0.0.1', port), timeout=2)
+        except OSError:
+            break
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        client = {'sock': sock, 'decoder': protocol.StreamDecoder(), 'id': None, 'index': i, 'tick': 0}
+        sock.send(protocol.encode_join(f"bot{i}", 'Falcon'))
+        selector.register(sock, selectors.EVENT_READ, client)
+        clients.append(client)
+        # Keep up with the snapshots of the clients already connected
+        receive(selector, 0)
+
+    probe = clients[0] if clients else None
+    pending = {}  # {probe input sequence: send time}
+    latencies = []
+    received = 0
+    sequence = 0
+    next_send = time.perf_counter()
+    measure_from = next_send + WARMUP
+    end = measure_from + duration
+
+    while time.perf_counter() < end:
+        now = time.perf_counter()
+        if now >= next_send:
+            next_send += 1.0 / SEND_RATE
+            sequence += 1
+            pending[sequence] = now
+            for client in clients:
+                # Walk left and right, everyone moves every frame
+                buttons = BUTTON_LEFT if (sequence // 60 + client['index']) % 2 else BUTTON_RIGHT
+                try:
+                    client['sock'].send(protocol.encode_input([(sequence, buttons)], client['tick']))
+                except (BlockingIOError, OSError):
+                    pass
+        timeout = max(0.0, next_send - time.perf_counter())
+        measuring = time.perf_counter() >= measure_from
+        for client, msg in receive(selector, timeout):
+            received += measuring
+            if client is probe and msg[0] == 'input_ack' and msg[2] in pending:
+                sent = pending.pop(msg[2])
+                if measuring:
+                    latencies.append(time.perf_counter() - sent)
+                # Older inputs were simulated in the same tick
+                for stale in [s for s in pending if s < msg[2]]:
+                    del pending[stale]
+
+    connected = sum(1 for client in clients if client['id'] is not None)
+    for client in clients:
+        client['sock'].close()
+    return connected, latencies, received
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark threaded vs eventloop server engines")
+    parser.add_argument('--clients', default='10,25,50', help="liste de tailles de lobby")
+    parser.add_argument('--duration', type=float, default=3.0)
+    parser.add_argument('--port', type=int, default=23456)
+    args = parser.parse_args()
+
+    print(f"{'engine':<10} {'clients':>7} {'connected':>9} {'p50 ms':>8} {'p99 ms':>8} {'msgs/s':>10}")
+    for count in [int(c) for c in args.clients.split(',')]:
+        for engine in ('threaded', 'eventloop'):
+            process = start_server(engine, args.port)
+            try:
+                connected, latencies, received = run_clients(args.port, count, args.duration)
+            finally:
+                process.kill()
+                process.wait()
+            print(f"{engine:<10} {count:>7} {connected:>9} "
+                  f"{percentile(latencies, 50) * 1000:>8.2f} {percentile(latencies, 99) * 1000:>8.2f} "
+                  f"{received / args.duration:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+import argparse
+import json
+import random
+import selectors
+import socket
+import sys
+import time
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+# Only the protocol and the headless simulation: no pygame, no window
+from game import protocol
+from game.player_input import (
+    BUTTON_LEFT, BUTTON_RIGHT, BUTTON_UP, BUTTON_DOWN, BUTTON_SHOOT, BUTTON_RESPAWN, INPUT_RATE
+)
+from common import start_server, percentile
+
+INPUT_REDUNDANCY = 3  # Like client.py, each message repeats the previous commands
+WORLD_HISTORY = 32  # Worlds kept per bot as delta baselines
+WARMUP = 1.0  # Seconds of traffic after the ramp before measuring
+SOLDIER_TYPES = ('falcon', 'rogue')
+PATTERNS = ('random', 'patrol', 'turret')
+MOVES = (BUTTON_LEFT, BUTTON_RIGHT, BUTTON_UP, BUTTON_DOWN)
+
+
+# Headless load generator: N bots speak the real protocol over TCP like
+# client.py does (join, one input command per frame at 60 Hz, ack of the
+# last snapshot applied, respawn when dead) and measure what the server
+# gives back. Bots are spread over worker processes so that decoding
+# hundreds of snapshot streams doesn't make the swarm the bottleneck.
+class Bot:
+    def __init__(self, index, pattern, rng):
+        self.index = index
+        self.pattern = pattern
+        self.rng = rng
+        self.sock = None
+        self.decoder = protocol.StreamDecoder()
+        self.client_id = None
+        self.connected = False
+        self.outbox = bytearray()  # Bytes the socket did not take yet, sent when it is writable
+        self.tick = 0  # Last snapshot applied, our delta baseline
+        self.worlds = {}  # {tick: full world}
+        self.health = 1
+        self.sequence = 0
+        self.commands = deque(maxlen=INPUT_REDUNDANCY)  # [(sequence, buttons)]
+        self.sent_at = {}  # {sequence: send time} not acknowledged yet
+        self.input_ack = None
+        self.last_snapshot = None  # Arrival of the previous snapshot
+        # Buttons held like a player would: a direction for a while, fire on and off
+        self.move = rng.choice(MOVES)
+        self.shooting = False
+        self.next_change = 0.0
+
+    def buttons(self, now):
+        # Same buttons as buttons_from_keys() gives Soldier.update
+        if self.health <= 0:
+            return BUTTON_RESPAWN
+        if now >= self.next_change:
+            if self.pattern == 'random':
+                self.move = self.rng.choice(MOVES + (0,))
+                self.shooting = self.rng.random() < 0.5
+                self.next_change = now + self.rng.uniform(0.5, 2.0)
+            elif self.pattern == 'patrol':
+                self.move = BUTTON_RIGHT if self.move == BUTTON_LEFT else BUTTON_LEFT
+                self.shooting = True
+                self.next_change = now + 1.0
+            else:
+                # Turret: fire all the time, one step now and then to turn around
+                self.move = self.rng.choice(MOVES) if self.move == 0 else 0
+                self.shooting = True
+                self.next_change = now + (1.0 / INPUT_RATE if self.move else 2.0)
+        return self.move | (BUTTON_SHOOT if self.shooting else 0)
+
+    def apply(self, msg):
+        if msg[0] == 'init':
+            self.client_id = msg[1]
+        elif msg[0] == 'input_ack':
+            self.input_ack = msg[1:]
+        elif msg[0] in ('snapshot', 'delta'):
+            if msg[0] == 'snapshot':
+                tick, states = msg[1], msg[2]
+            else:
+                tick, baseline, removed, changes = msg[1:]
+                if baseline not in self.worlds:
+                    return False
+                states = protocol.apply_delta(self.worlds[baseline], removed, changes)
+            self.worlds[tick] = states
+            for old_tick in [t for t in self.worlds if t <= tick - WORLD_HISTORY]:
+                del self.worlds[old_tick]
+            self.tick = tick
+            if self.client_id in states:
+                self.health = states[self.client_id][3]
+            return True
+        return False
+
+
+def flush(selector, bot, position):
+    # Non-blocking send of the outbox: keeps what the socket refused and only
+    # waits for EVENT_WRITE while something is left
+    if bot.outbox:
+        try:
+            sent = bot.sock.send(bot.outbox)
+        except BlockingIOError:
+            sent = 0
+        del bot.outbox[:sent]
+    events = selectors.EVENT_READ | (selectors.EVENT_WRITE if bot.outbox else 0)
+    selector.modify(bot.sock, events, position)
+
+
+def run_bots(host, port, indices, pattern, duration, ramp, seed):
+    # One worker process: connects its bots over the ramp, plays them for
+    # WARMUP + duration seconds and returns raw measurements
+    rng = random.Random(seed)
+    bots = [Bot(index, pattern, random.Random(rng.random())) for index in indices]
+    selector = selectors.DefaultSelector()
+    start = time.perf_counter()
+    connect_at = [start + ramp * (bot.index / max(1, indices[-1] + 1)) for bot in bots]
+    measure_from = start + ramp + WARMUP
+    end = measure_from + duration
+
+    stats = {
+        'bots': len(bots), 'connected': 0, 'connect_failures': 0, 'disconnects': 0,
+        'latencies': [], 'snapshot_intervals': [], 'snapshots': 0, 'dropped_deltas': 0,
+        'bytes_in': [0] * len(bots), 'bytes_out': [0] * len(bots), 'inputs_acked': 0,
+        'ticks': [None, None],  # First and last tick seen while measuring
+    }
+    to_connect = deque(zip(connect_at, range(len(bots))))
+    next_send = start
+    while True:
+        now = time.perf_counter()
+        if now >= end:
+            break
+        measuring = now >= measure_from
+
+        while to_connect and to_connect[0][0] <= now:
+            _, position = to_connect.popleft()
+            bot = bots[position]
+            try:
+                bot.sock = socket.create_connection((host, port), timeout=2)
+                bot.sock.setblocking(False)
+                bot.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            except OSError:
+                stats['connect_failures'] += 1
+                continue
+            bot.connected = True
+            stats['connected'] += 1
+            selector.register(bot.sock, selectors.EVENT_READ, position)
+            bot.outbox += protocol.encode_join(f"bot{bot.index}", SOLDIER_TYPES[bot.index % len(SOLDIER_TYPES)])
+            try:
+                flush(selector, bot, position)
+            except OSError:
+                pass  # Seen as a disconnect by the read side
+
+        if now >= next_send:
+            next_send += 1.0 / INPUT_RATE
+            if next_send < now:  # Fell behind, don't burst to catch up
+                next_send = now + 1.0 / INPUT_RATE
+            for position, bot in enumerate(bots):
+                if not bot.connected or bot.client_id is None:
+                    continue
+                bot.sequence += 1
+                bot.commands.append((bot.sequence, bot.buttons(now)))
+                bot.sent_at[bot.sequence] = now
+                if bot.outbox:
+                    continue  # Previous message still not sent, the server is behind: like a lost frame
+                data = protocol.encode_input(list(bot.commands), bot.tick)
+                bot.outbox += data
+                try:
+                    flush(selector, bot, position)
+                except OSError:
+                    continue  # Seen as a disconnect by the read side
+                if measuring:
+                    stats['bytes_out'][position] += len(data)
+
+        for key, events in selector.select(max(0.0, min(next_send, end) - time.perf_counter())):
+            position = key.data
+            bot = bots[position]
+            if events & selectors.EVENT_WRITE:
+                try:
+                    flush(selector, bot, position)
+                except OSError:
+                    pass  # Seen as a disconnect by the read side
+                if not events & selectors.EVENT_READ:
+                    continue
+            try:
+                data = bot.sock.recv(65536)
+            except BlockingIOError:
+                continue
+            except OSError:
+                data = b''
+            arrival = time.perf_counter()
+            if not data:
+                # The server closed on us
+                selector.unregister(bot.sock)
+                bot.sock.close()
+                bot.connected = False
+                stats['disconnects'] += 1
+                continue
+            measuring = arrival >= measure_from
+            if measuring:
+                stats['bytes_in'][position] += len(data)
+            for msg in bot.decoder.feed(data):
+                if msg[0] == 'input_ack':
+                    acked = msg[2]
+                    if acked in bot.sent_at and measuring:
+                        stats['latencies'].append(arrival - bot.sent_at[acked])
+                    for sequence in [s for s in bot.sent_at if s <= acked]:
+                        del bot.sent_at[sequence]
+                        stats['inputs_acked'] += measuring
+                if not bot.apply(msg):
+                    if msg[0] == 'delta':
+                        stats['dropped_deltas'] += 1
+                    continue
+                # A snapshot or delta applied
+                if measuring:
+                    stats['snapshots'] += 1
+                    if bot.last_snapshot is not None:
+                        stats['snapshot_intervals'].append(arrival - bot.last_snapshot)
+                    first, _ = stats['ticks']
+                    stats['ticks'] = [bot.tick if first is None else min(first, bot.tick),
+                                      max(bot.tick, stats['ticks'][1] or 0)]
+                bot.last_snapshot = arrival
+
+    for bot in bots:
+        if bot.connected:
+            bot.sock.close()
+    return stats
+
+
+def swarm(host, port, bots, pattern, duration, ramp, processes, seed):
+    # Bots are dealt round robin so every worker ramps up at the same pace
+    processes = max(1, min(processes, bots))
+    groups = [list(range(worker, bots, processes)) for worker in range(processes)]
+    with ProcessPoolExecutor(processes) as pool:
+        results = list(pool.map(
+            run_bots, [host] * processes, [port] * processes, groups, [pattern] * processes,
+            [duration] * processes, [ramp] * processes, [seed + worker for worker in range(processes)]
+        ))
+
+    latencies = [value for result in results for value in result['latencies']]
+    intervals = [value for result in results for value in result['snapshot_intervals']]
+    bytes_in = [value for result in results for value in result['bytes_in']]
+    bytes_out = [value for result in results for value in result['bytes_out']]
+    first_ticks = [result['ticks'][0] for result in results if result['ticks'][0] is not None]
+    last_ticks = [result['ticks'][1] for result in results if result['ticks'][1] is not None]
+    connected = sum(result['connected'] for result in results)
+    return {
+        'bots': bots,
+        'pattern': pattern,
+        'duration': duration,
+        'connected': connected,
+        'connect_failures': sum(result['connect_failures'] for result in results),
+        'disconnects': sum(result['disconnects'] for result in results),
+        # Server throughput: ticks it got out, and snapshots and inputs it processed per second
+        'server_ticks_per_s': (max(last_ticks) - min(first_ticks)) / duration if first_ticks else 0.0,
+        'snapshots_per_s': sum(result['snapshots'] for result in results) / duration,
+        'inputs_per_s': sum(result['inputs_acked'] for result in results) / duration,
+        'dropped_deltas': sum(result['dropped_deltas'] for result in results),
+        # Input sent -> input ack of the first snapshot that includes it
+        'latency_ms': {f'p{p}': percentile(latencies, p) * 1000 for p in (50, 90, 99)},
+        'snapshot_interval_ms': {f'p{p}': percentile(intervals, p) * 1000 for p in (50, 99)},
+        'bytes_in_per_client_s': sum(bytes_in) / max(1, connected) / duration,
+        'bytes_in_max_client_s': max(bytes_in, default=0) / duration,
+        'bytes_out_per_client_s': sum(bytes_out) / max(1, connected) / duration,
+    }
+
+
+def print_report(report):
+    print(f"bots            {report['connected']}/{report['bots']} connected, "
+          f"{report['connect_failures']} failed, {report['disconnects']} disconnected ({report['pattern']})")
+    print(f"server          {report['server_ticks_per_s']:.1f} ticks/s, {report['snapshots_per_s']:.0f} snapshots/s, "
+          f"{report['inputs_per_s']:.0f} inputs/s, {report['dropped_deltas']} deltas without baseline")
+    latency = report['latency_ms']
+    print(f"input latency   p50 {latency['p50']:.1f} ms, p90 {latency['p90']:.1f} ms, p99 {latency['p99']:.1f} ms")
+    interval = report['snapshot_interval_ms']
+    print(f"snapshot gap    p50 {interval['p50']:.1f} ms, p99 {interval['p99']:.1f} ms")
+    print(f"bandwidth       {report['bytes_in_per_client_s'] / 1024:.1f} KiB/s in per client "
+          f"(max {report['bytes_in_max_client_s'] / 1024:.1f}), "
+          f"{report['bytes_out_per_client_s'] / 1024:.1f} KiB/s out per client")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Essaim de bots sans fenêtre pour charger le serveur")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=12345)
+    parser.add_argument('--bots', type=int, default=50)
+    parser.add_argument('--pattern', choices=PATTERNS, default='random',
+                        help="random: direction et tir au hasard, patrol: gauche/droite en tirant, turret: tir sur place")
+    parser.add_argument('--duration', type=float, default=10.0, help="secondes mesurées, après la montée en charge")
+    parser.add_argument('--ramp', type=float, default=2.0, help="secondes pour connecter tous les bots")
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--spawn', choices=('threaded', 'eventloop'),
+                        help="démarre un serveur local avec ce moteur au lieu d'utiliser --host")
+    parser.add_argument('--server-args', default='', help="options en plus pour le serveur démarré par --spawn")
+    parser.add_argument('--json', action='store_true', help="rapport en JSON sur la sortie standard")
+    args = parser.parse_args()
+
+    process = None
+    host = args.host
+    if args.spawn:
+        process = start_server(args.spawn, args.port, args.server_args.split())
+        host = '127.0.0.1'
+    try:
+        report = swarm(host, args.port, args.bots, args.pattern, args.duration, args.ramp, args.processes, args.seed)
+    finally:
+        if process is not None:
+            process.kill()
+            process.wait()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import socket
+import subprocess
+import sys
+import time
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_SCRIPT = os.path.join(ROOT, 'server', 'server.py')
+
+
+# Shared by the benchmark scripts: a fresh server process per run and the
+# percentile they all report.
+def start_server(engine, port, extra_args=()):
+    process = subprocess.Popen(
+        [sys.executable, SERVER_SCRIPT, '--engine', engine, '--host', '127.0.0.1', '--port', str(port)] + list(extra_args),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError(f"Server ({engine}) did not start on port {port}")
+
+
+def percentile(values, p):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
@@ -0,0 +1,394 @@
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import uuid
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'client'))  # client.py imports menu as a top-level module
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+MAP_PATH = os.path.join(ROOT, 'assets', 'map', 'map.tmx')
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+TOLERANCE = 0.25  # A benchmark more than 25% slower than its baseline is a regression, at least
+NOISE_MARGIN = 2  # Noisy benchmarks get this many times their median/min spread as tolerance
+MIN_REPEAT_TIME = 0.05  # Seconds per repeat, loops are added until a repeat lasts this long
+REPEATS = 5
+PLAYERS = 50  # Lobby size for the protocol, hit and frame benchmarks
+BULLETS_PER_PLAYER = 5
+
+
+# Repeatable timings of the hot paths, micro (one function) and macro (a
+# whole server tick, a whole client frame). Every benchmark is a setup
+# function returning the callable to time. Results are the best and median
+# time per call over REPEATS, written as JSON and compared with a stored
+# baseline: any benchmark over it by more than its tolerance fails the run.
+# The reference baseline.json is committed; each entry carries a tolerance
+# sized from the spread of its own repeats so machine noise doesn't fail it.
+def random_states(rng, count, width=2000, height=2000):
+    directions = ('front', 'back', 'left', 'right')
+    return {
+        str(uuid.UUID(int=rng.getrandbits(128))): (
+            (float(rng.randrange(width)), float(rng.randrange(height))), f"bot{i}", 'falcon', rng.randrange(1, 101),
+            [(float(rng.randrange(width)), float(rng.randrange(height)), rng.choice(directions), b)
+             for b in range(BULLETS_PER_PLAYER)]
+        )
+        for i in range(count)
+    }
+
+
+def moved(rng, states, share=0.2):
+    # The next tick: a share of the players moved, their bullets always do
+    result = {}
+    for player_id, (position, pseudo, soldier_type, health, bullets) in states.items():
+        if rng.random() < share:
+            position = (position[0] + 5, position[1])
+        bullets = [(x, y + 20, direction, bullet_id) for x, y, direction, bullet_id in bullets]
+        result[player_id] = (position, pseudo, soldier_type, health, bullets)
+    return result
+
+
+# === Protocol ===
+def bench_encode_snapshot():
+    from game import protocol
+    states = random_states(random.Random(1), PLAYERS)
+    return lambda: protocol.encode_snapshot(1, ((player_id,) + state for player_id, state in states.items()))
+
+
+def bench_decode_snapshot():
+    from game import protocol
+    states = random_states(random.Random(1), PLAYERS)
+    frame = protocol.encode_snapshot(1, ((player_id,) + state for player_id, state in states.items()))
+    return lambda: protocol.StreamDecoder().feed(frame)
+
+
+def bench_encode_delta():
+    from game import protocol
+    rng = random.Random(1)
+    baseline = random_states(rng, PLAYERS)
+    states = moved(rng, baseline)
+    return lambda: protocol.encode_delta(2, 1, baseline, states)
+
+
+def bench_apply_delta():
+    from game import protocol
+    rng = random.Random(1)
+    baseline = random_states(rng, PLAYERS)
+    frame = protocol.encode_delta(2, 1, baseline, moved(rng, baseline))
+    _, _, _, removed, changes = protocol.StreamDecoder().feed(frame)[0]
+    return lambda: protocol.apply_delta(baseline, removed, changes)
+
+
+# === Server simulation ===
+def bench_resolve_hits():
+    # The bullet vs player damage pass of the tick (once the all-pairs loop
+    # of ClientThread.run). It consumes bullets, so each call starts again
+    # from the same players: restoring the dict is part of the time.
+    import server.server as server
+    rng = random.Random(1)
+    width, height = server.map_size
+    template = {
+        player_id: (object(), position, pseudo, soldier_type, health, bullets)
+        for player_id, (position, pseudo, soldier_type, health, bullets)
+        in random_states(rng, PLAYERS * 4, width, height).items()
+    }
+
+    def run():
+        server.players.clear()
+        server.players.update(template)
+        server.sync_player_grid()
+        server.resolve_hits(1.0 / server.UPDATE_RATE)
+    return run
+
+
+def bench_server_tick():
+    # A whole tick for a full lobby: inputs, simulation, hits, one snapshot per client
+    import server.server as server
+    from game.tick import TickScheduler
+    from game.player_input import BUTTON_LEFT, BUTTON_RIGHT, BUTTON_UP, BUTTON_DOWN, BUTTON_SHOOT, BUTTON_RESPAWN
+    rng = random.Random(1)
+    server.players.clear()
+    client_ids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(PLAYERS)]
+    for client_id in client_ids:
+        server.add_player(client_id, object())
+    tick = server.run_tick(TickScheduler(server.UPDATE_RATE), lambda client_socket, data, reliable=False: True)
+    moves = (BUTTON_LEFT, BUTTON_RIGHT, BUTTON_UP, BUTTON_DOWN)
+    progress = {'tick': 0, 'sequence': 0}
+
+    def run():
+        progress['tick'] += 1
+        for _ in range(2):  # 60 inputs/s at 30 ticks/s
+            progress['sequence'] += 1
+            for client_id in client_ids:
+                buttons = rng.choice(moves) | BUTTON_SHOOT | BUTTON_RESPAWN
+                server.queue_player_update(client_id, None, {
+                    'inputs': [(progress['sequence'], buttons)], 'ack': progress['tick'] - 1
+                })
+        tick(progress['tick'])
+    return run
+
+
+def bench_headless_soldiers():
+    # One second of game for a full lobby through the pygame-free core:
+    # INPUT_RATE steps of movement, shots and bullet flight per soldier
+    from game.map_data import MapData
+    from game.collision_map import CollisionMap
+    from game.simulation import SoldierCore
+    from game.player_input import INPUT_RATE, BUTTON_LEFT, BUTTON_RIGHT, BUTTON_UP, BUTTON_DOWN, BUTTON_SHOOT
+    collision = CollisionMap(MapData(MAP_PATH))
+    map_size = (collision.width * collision.tile_width, collision.height * collision.tile_height)
+    rng = random.Random(1)
+    moves = (BUTTON_LEFT, BUTTON_RIGHT, BUTTON_UP, BUTTON_DOWN)
+    inputs = [[rng.choice(moves) | BUTTON_SHOOT for _ in range(INPUT_RATE)] for _ in range(PLAYERS)]
+
+    def run():
+        soldiers = [SoldierCore(400, 300) for _ in range(PLAYERS)]
+        for soldier, buttons in zip(soldiers, inputs):
+            for step_buttons in buttons:
+                soldier.step_input(step_buttons, collision=collision, map_size=map_size)
+    return run
+
+
+# === Collision ===
+def bench_raycast():
+    from game.map_data import MapData
+    from game.collision_map import CollisionMap
+    collision = CollisionMap(MapData(MAP_PATH))
+    rng = random.Random(1)
+    width, height = collision.width * collision.tile_width, collision.height * collision.tile_height
+    segments = []
+    for _ in range(1000):
+        x, y = rng.uniform(0, width), rng.uniform(0, height)
+        segments.append((x, y, x + rng.uniform(-20, 20), y + rng.uniform(-20, 20)))  # One tick of bullet travel
+    return lambda: [collision.raycast(*segment) for segment in segments]
+
+
+def bench_move_box():
+    from game.map_data import MapData
+    from game.collision_map import CollisionMap
+    collision = CollisionMap(MapData(MAP_PATH))
+    rng = random.Random(1)
+    width, height = collision.width * collision.tile_width, collision.height * collision.tile_height
+    moves = [(rng.uniform(0, width), rng.uniform(0, height), rng.choice((-5, 0, 5)), rng.choice((-5, 0, 5)))
+             for _ in range(1000)]
+    return lambda: [collision.move_box(*move) for move in moves]
+
+
+# === Sprites and map (pygame, dummy video driver) ===
+def display():
+    import pygame
+    pygame.init()
+    return pygame.display.get_surface() or pygame.display.set_mode((800, 600))
+
+
+def bench_load_animations_cold():
+    display()
+    from game.soldier import Soldier
+    from game.sprite_cache import sprite_cache
+    soldier = Soldier(0, 0, 'falcon', 'bench')
+
+    def run():
+        sprite_cache.clear()
+        soldier.load_animations()
+    return run
+
+
+def bench_load_animations_cached():
+    display()
+    from game.soldier import Soldier
+    soldier = Soldier(0, 0, 'falcon', 'bench')
+    return soldier.load_animations
+
+
+def bench_bullet_load_images():
+    display()
+    from game.soldier import Bullet, SoldierDirection
+    from game.sprite_cache import sprite_cache
+    bullet = Bullet(0, 0, SoldierDirection.LEFT)
+
+    def run():
+        sprite_cache.clear()
+        bullet.load_images()
+    return run
+
+
+def bench_render_chunk():
+    # One chunk from the TMX tiles, what a cold MapManager pays per chunk
+    display()
+    from game.map_manager import MapManager
+    map_manager = MapManager(MAP_PATH, use_cache=False)
+    return lambda: map_manager._render_chunk(0, 0)
+
+
+def bench_map_draw():
+    # Steady state: the camera pans over chunks already built
+    screen = display()
+    from game.map_manager import MapManager
+    map_manager = MapManager(MAP_PATH)
+    positions = [(x, 100) for x in range(0, 400, 4)]
+    state = {'index': 0}
+
+    def run():
+        state['index'] = (state['index'] + 1) % len(positions)
+        map_manager.draw(screen, *positions[state['index']])
+    return run
+
+
+def bench_client_frame():
+    # One frame of client.main(): prediction, jitter buffer, map, remote
+    # soldiers with their bullets, our own soldier, display flip
+    display()
+    import pygame
+    import client as game_client
+    from game.soldier import Soldier
+    from game.interpolation import Interpolator
+    from game.player_input import BUTTON_RIGHT, BUTTON_SHOOT
+    rng = random.Random(1)
+    game_client.player = Soldier(400, 300, 'falcon', 'bench')
+    states = random_states(rng, PLAYERS, 800, 600)
+    game_client.other_players = states
+    interpolator = Interpolator()
+    start = time.perf_counter()
+    for tick in range(1, 4):
+        interpolator.add_snapshot(tick, start + tick / 30, {pid: state[0] for pid, state in states.items()})
+    collision = game_client.map_manager.collision
+    map_size = (game_client.map_width, game_client.map_height)
+
+    def run():
+        game_client.player.update(BUTTON_RIGHT | BUTTON_SHOOT, None, collision, map_size)
+        if game_client.player.x > 600:
+            game_client.player.x = 400
+        game_client.draw_frame(interpolator, start + 0.1, False)
+        pygame.display.flip()
+    return run
+
+
+BENCHMARKS = {
+    'protocol.encode_snapshot': bench_encode_snapshot,
+    'protocol.decode_snapshot': bench_decode_snapshot,
+    'protocol.encode_delta': bench_encode_delta,
+    'protocol.apply_delta': bench_apply_delta,
+    'server.resolve_hits': bench_resolve_hits,
+    'server.tick': bench_server_tick,
+    'simulation.soldiers_1s': bench_headless_soldiers,
+    'collision.raycast_x1000': bench_raycast,
+    'collision.move_box_x1000': bench_move_box,
+    'soldier.load_animations_cold': bench_load_animations_cold,
+    'soldier.load_animations_cached': bench_load_animations_cached,
+    'bullet.load_images_cold': bench_bullet_load_images,
+    'map.render_chunk': bench_render_chunk,
+    'map.draw': bench_map_draw,
+    'client.frame': bench_client_frame,
+}
+
+
+def measure(run, repeats=REPEATS, min_time=MIN_REPEAT_TIME):
+    # Same idea as timeit.autorange: enough loops for a repeat to be measurable
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            run()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 2 if elapsed * 10 < min_time else 1 + int(min_time / max(elapsed, 1e-9))
+    times = [elapsed / loops]
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            run()
+        times.append((time.perf_counter() - start) / loops)
+    return {'min_us': min(times) * 1e6, 'median_us': statistics.median(times) * 1e6, 'loops': loops}
+
+
+def tolerance_for(result):
+    spread = result['median_us'] / result['min_us'] - 1
+    return round(max(TOLERANCE, NOISE_MARGIN * spread), 2)
+
+
+def compare(results, baseline, tolerance=None):
+    # Returns the names that got slower than the baseline allows. tolerance
+    # overrides the one stored with each benchmark.
+    regressions = []
+    print(f"{'benchmark':<32} {'min us':>10} {'median us':>10} {'baseline':>10} {'ratio':>7}")
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            print(f"{name:<32} {result['min_us']:>10.1f} {result['median_us']:>10.1f} {'-':>10} {'new':>7}")
+            continue
+        ratio = result['min_us'] / reference['min_us']
+        allowed = tolerance if tolerance is not None else reference.get('tolerance', TOLERANCE)
+        flag = ""
+        if ratio > 1 + allowed:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<32} {result['min_us']:>10.1f} {result['median_us']:>10.1f} "
+              f"{reference['min_us']:>10.1f} {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks des chemins critiques, comparés à une référence")
+    parser.add_argument('--filter', default='', help="ne lance que les benchmarks dont le nom contient ce texte")
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="enregistre ces résultats comme référence")
+    parser.add_argument('--tolerance', type=float, default=None,
+                        help="ralentissement accepté pour tous (0.25 = 25%%), sinon celui de la référence")
+    parser.add_argument('--output', help="écrit les résultats en JSON dans ce fichier")
+    args = parser.parse_args()
+
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if args.filter in name:
+            results[name] = measure(setup(), args.repeats)
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.node(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if not args.save_baseline and not os.path.exists(args.baseline):
+        # Nothing to compare with would let any regression through
+        print(f"FAILED: no baseline at {args.baseline}, run with --save-baseline to create one")
+        sys.exit(1)
+
+    baseline = {}
+    if not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save_baseline:
+        # Keep the other benchmarks' references when only some were run
+        previous = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                previous = json.load(f)['results']
+        for result in results.values():
+            result['tolerance'] = tolerance_for(result)
+        report['results'] = dict(previous, **results)
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+
+    if regressions:
+        print(f"FAILED: {len(regressions)} benchmark(s) slower than the baseline allows: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,31 @@
 import pygame
 import socket
 import threading
-import pickle
-import uuid
+import argparse
 import logging
 import sys
 import os
+import time
+from collections import deque
+from types import MappingProxyType
 
 # Add the parent directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from menu import Menu
 from game.map_manager import MapManager
-from game.soldier import Soldier, SoldierState
+from game.soldier import Soldier, SoldierState, BulletPool, buttons_from_keys
+from game import protocol
+from game.player_input import SPAWN_POSITION
+from game.interpolation import Interpolator
+from game.text_cache import text_cache
+from game.transport import TcpConnection, UdpConnection, NetworkConditions, CONNECT_TIMEOUT, CLOSE_LINGER
 
 # Configuration du jeu
 DEFAULT_PORT = 12345
 SCREEN_WIDTH, SCREEN_HEIGHT = 800, 600
-player_speed = 5
-HOST = '0.0.0.0'  # Adresse de connection
-PORT = 12345  # Port à utiliser
+INPUT_REDUNDANCY = 3  # Each input message repeats the previous unacknowledged commands
+MAX_PENDING_INPUTS = 255  # Inputs kept for replay while the server hasn't acknowledged them
 
 WHITE = (255, 255, 255)
 RED = (255, 0, 0)
@@ -28,7 +34,8 @@ RED = (255, 0, 0)
 pygame.init()
 screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
 pygame.display.set_caption('Jeu Shooter Multijoueur')
-font = pygame.font.Font(None, 28)
+text_cache.preload((28, 36, 72))  # Name labels, respawn hint, game over
+bullet_pool = BulletPool()  # Remote players' bullets, needs the display for convert_alpha
 
 # Logger
 logging.basicConfig(
@@ -39,8 +46,16 @@ logger = logging.getLogger(__name__)
 
 # Variables globales
 client_id = None
-other_players = {}  # {client_id: (x, y, pseudo, soldier_type, health, bullets)}
+# Published by receive_data, read-only: a new mapping replaces it on each
+# snapshot, readers take the reference once and need no lock
+other_players = MappingProxyType({})  # {client_id: (x, y, pseudo, soldier_type, health, bullets)}
 other_soldiers = {}  # Cache for other players' Soldier objects
+last_snapshot_tick = 0  # Sent back with each update so the server knows our delta baseline
+# (last input sequence the server simulated, our state after it), replaced on each snapshot
+server_own_state = None
+# Every snapshot received, stamped with its arrival, for the interpolation of remote soldiers
+snapshot_queue = deque()  # [(tick, arrival time, {player_id: state})]
+SNAPSHOT_HISTORY = 64  # Worlds kept as possible delta baselines
 player = None
 
 # Camera
@@ -53,123 +68,159 @@ map_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__
 map_manager = MapManager(map_path)
 map_width, map_height = map_manager.get_map_size()
 
-# === SERVER CODE ===
-players = {}  # {client_id: (socket, position, pseudo, soldier_type, health, bullets)}
-client_sockets = {}
-
-
-class ClientThread(threading.Thread):
-    def __init__(self, client_socket, client_address):
-        threading.Thread.__init__(self)
-        self.client_socket = client_socket
-        self.client_address = client_address
-        self.client_id = str(uuid.uuid4())
-        players[self.client_id] = (client_socket, (400, 300), "", "falcon", 100, [])
-        client_sockets[client_socket] = self.client_id
-
-    def send_data(self, data):
-        try:
-            self.client_socket.send(pickle.dumps(data))
-            return True
-        except socket.error as e:
-            logger.error(f"Erreur envoi client: {e}")
-            return False
-
-    def run(self):
-        try:
-            if not self.send_data(('init', self.client_id)):
-                return
-
-            while True:
-                data = self.client_socket.recv(4096)
-                if not data:
-                    break
-
-                try:
-                    parsed = pickle.loads(data)
-                    if isinstance(parsed, dict):
-                        pos = parsed['position']
-                        pseudo = parsed['pseudo']
-                        soldier_type = parsed['soldier_type']
-                        health = parsed.get('health', 100)
-                        bullets = parsed.get('bullets', [])
-                        players[self.client_id] = (
-                            self.client_socket, pos, pseudo, soldier_type, health, bullets
-                        )
-                    else:
-                        continue
-                except Exception as e:
-                    logger.error(f"Erreur parsing: {e}")
-                    continue
-
-                for sock in client_sockets:
-                    for pid, (_, pos, pseudo, soldier_type, health, bullets) in players.items():
-                        try:
-                            sock.send(pickle.dumps((pid, pos, pseudo, soldier_type, health, bullets)))
-                        except socket.error:
-                            continue
-        finally:
-            self.client_socket.close()
-            if self.client_id in players:
-                msg = ('disconnect', self.client_id)
-                for sock in client_sockets:
-                    try:
-                        sock.send(pickle.dumps(msg))
-                    except socket.error:
-                        pass
-                del players[self.client_id]
-            if self.client_socket in client_sockets:
-                del client_sockets[self.client_socket]
-            logger.info(f"Client déconnecté: {self.client_address}")
-
-
-def start_server():
-    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    server_socket.bind((HOST, PORT))
-    server_socket.listen(5)
-    logger.info(f"Serveur démarré sur {HOST}:{PORT}")
-
-    while True:
-        client_socket, client_address = server_socket.accept()
-        logger.info(f"Nouvelle connexion de {client_address}")
-        client_thread = ClientThread(client_socket, client_address)
-        client_thread.start()
-
-
 # === CLIENT CODE ===
-def receive_data(sock):
-    global other_players, client_id
-    buffer = b""
+def connect(host, pseudo, soldier_type, udp=False, conditions=None):
+    # Returns the connection and the messages already received on it. Over
+    # UDP we wait for the init, and fall back to TCP if it never comes
+    # (server without --udp, firewall).
+    join = protocol.encode_join(pseudo, soldier_type)
+    if udp:
+        connection = UdpConnection(host, DEFAULT_PORT, conditions)
+        connection.send(join, reliable=True)
+        received = []
+        deadline = time.perf_counter() + CONNECT_TIMEOUT
+        while time.perf_counter() < deadline:
+            received += connection.receive()
+            if any(not isinstance(msg, dict) and msg[0] == 'init' for msg in received):
+                return connection, received
+        connection.close()
+        print("Pas de réponse en UDP, connexion en TCP")
+    connection = TcpConnection(host, DEFAULT_PORT)
+    connection.send(join)
+    return connection, []
+
+
+def receive_data(connection, messages=()):
+    global other_players, client_id, last_snapshot_tick, server_own_state
+    worlds = {}  # {tick: full world, ourselves included}
+    input_ack = None  # (tick, sequence) of the snapshot about to come
     while True:
         try:
-            data = sock.recv(4096)
-            if not data:
-                break
-            buffer += data
-            while len(buffer):
-                try:
-                    msg = pickle.loads(buffer)
-                    buffer = b""
-                    if msg[0] == 'init':
-                        client_id = msg[1]
-                    elif msg[0] == 'disconnect':
-                        if msg[1] in other_players:
-                            del other_players[msg[1]]
+            for msg in messages:
+                if isinstance(msg, dict):
+                    continue
+                # other_players is replaced, never edited in place (see its
+                # definition), so main() always draws a complete world
+                if msg[0] == 'init':
+                    client_id = msg[1]
+                elif msg[0] == 'input_ack':
+                    input_ack = msg[1:]
+                elif msg[0] == 'disconnect':
+                    other_players = MappingProxyType(
+                        {pid: state for pid, state in other_players.items() if pid != msg[1]}
+                    )
+                elif msg[0] in ('snapshot', 'delta'):
+                    # Over UDP the init is reliable and may come after the
+                    # first snapshots: without our id we would draw
+                    # ourselves as a remote soldier
+                    if client_id is None:
+                        continue
+                    # An oversized snapshot goes over the reliable channel
+                    # and can be overtaken by a newer one
+                    if msg[1] <= last_snapshot_tick:
+                        continue
+                    if msg[0] == 'snapshot':
+                        tick, states = msg[1], msg[2]
                     else:
-                        pid, pos, pseudo, soldier_type, health, bullets = msg
-                        if pid != client_id:
-                            other_players[pid] = (pos, pseudo, soldier_type, health, bullets)
-                except pickle.UnpicklingError:
-                    break
+                        tick, baseline, removed, changes = msg[1:]
+                        if baseline not in worlds:
+                            continue  # Server will fall back to a full snapshot
+                        states = protocol.apply_delta(worlds[baseline], removed, changes)
+                    worlds[tick] = states
+                    for old_tick in [t for t in worlds if t <= tick - SNAPSHOT_HISTORY]:
+                        del worlds[old_tick]
+                    last_snapshot_tick = tick
+                    if input_ack is not None and input_ack[0] == tick and client_id in states:
+                        server_own_state = (input_ack[1], states[client_id])
+                    other_players = MappingProxyType({pid: state for pid, state in states.items() if pid != client_id})
+                    snapshot_queue.append((tick, time.perf_counter(), other_players))
+            messages = connection.receive()
+            if messages is None:
+                break
+        except protocol.ProtocolError as e:
+            print(f"Erreur protocole: {e}")
+            break
         except socket.error as e:
             print(f"Erreur réception: {e}")
             break
 
 
-def main():
-    global SCREEN_WIDTH, SCREEN_HEIGHT, camera_x, camera_y, player, other_soldiers
-    player_x, player_y = 400, 300
+def draw_frame(interpolator, now, game_over):
+    # Everything main() draws in a frame, the caller flips the display
+    global camera_x, camera_y
+    if not game_over:
+        # Update camera to follow player smoothly
+        target_camera_x = player.x - SCREEN_WIDTH // 2
+        target_camera_y = player.y - SCREEN_HEIGHT // 2
+
+        # Clamp camera to map boundaries
+        target_camera_x = max(0, min(target_camera_x, map_width - SCREEN_WIDTH))
+        target_camera_y = max(0, min(target_camera_y, map_height - SCREEN_HEIGHT))
+
+        # Smooth camera movement
+        camera_x += (target_camera_x - camera_x) * camera_speed
+        camera_y += (target_camera_y - camera_y) * camera_speed
+
+    screen.fill((0, 0, 0))
+    
+    # Draw map
+    map_manager.draw(screen, camera_x, camera_y)
+    
+    # Feed the jitter buffer, then draw other players where they were a
+    # moment ago rather than where the last packet put them
+    while snapshot_queue:
+        tick, arrival, states = snapshot_queue.popleft()
+        interpolator.add_snapshot(tick, arrival, {pid: state[0] for pid, state in states.items()})
+
+    # Draw other players, all from the same published world
+    others = other_players
+    for pid, (pos, name, soldier_type, health, bullets) in others.items():
+        pos = interpolator.position(pid, now) or pos
+        if pid not in other_soldiers:
+            # Create new soldier object only if it doesn't exist
+            other_soldiers[pid] = Soldier(pos[0], pos[1], soldier_type, name)
+        else:
+            # Update existing soldier's position and health
+            other_soldiers[pid].x = pos[0]
+            other_soldiers[pid].y = pos[1]
+            other_soldiers[pid].health = health
+    
+            # Reconcile bullets by id, reusing objects from the pool
+            other_soldiers[pid].sync_bullets(bullets, bullet_pool)
+
+            # Update soldier state based on health
+            if health <= 0:
+                other_soldiers[pid].state = SoldierState.DEAD
+    
+        # Draw the soldier and their bullets
+        other_soldiers[pid].draw(screen, camera_x, camera_y)
+
+    # Clean up disconnected players
+    disconnected_players = set(other_soldiers.keys()) - set(others.keys())
+    for pid in disconnected_players:
+        other_soldiers[pid].release_bullets(bullet_pool)
+        del other_soldiers[pid]
+        interpolator.remove(pid)
+
+    # Draw current player
+    if not game_over:
+        player.draw(screen, camera_x, camera_y)
+    else:
+        # Show game over and respawn message
+        game_over_text = text_cache.render("GAME OVER", 72, RED)
+        respawn_text = text_cache.render("Press R to respawn", 36, WHITE)
+    
+        screen.blit(game_over_text, 
+                    (SCREEN_WIDTH // 2 - game_over_text.get_width() // 2, 
+                     SCREEN_HEIGHT // 2 - 50))
+        screen.blit(respawn_text, 
+                    (SCREEN_WIDTH // 2 - respawn_text.get_width() // 2, 
+                     SCREEN_HEIGHT // 2 + 20))
+
+
+def main(udp=False, conditions=None):
+    global player
+    player_x, player_y = SPAWN_POSITION
 
     menu = Menu(screen)
     action, ip = menu.show()
@@ -183,29 +234,41 @@ def main():
         return
 
     if action == 'host':
-        threading.Thread(target=start_server, daemon=True).start()
+        # Only the host needs the server code (and its imports)
+        from server.server import start_server
+        if udp:
+            # The same simulated conditions on both sides of the link
+            server_conditions = conditions and NetworkConditions(conditions.loss, conditions.latency, conditions.jitter)
+            threading.Thread(target=start_server, kwargs={
+                'engine': 'eventloop', 'udp': True, 'conditions': server_conditions
+            }, daemon=True).start()
+        else:
+            threading.Thread(target=start_server, daemon=True).start()
         host = '127.0.0.1'
     else:
         host = ip
 
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.connect((host, DEFAULT_PORT))
+        connection, received = connect(host, pseudo, soldier_type, udp, conditions)
     except socket.error as e:
         print(f"Erreur de connexion: {e}")
         pygame.quit()
         return
 
-    threading.Thread(target=receive_data, args=(sock,), daemon=True).start()
+    threading.Thread(target=receive_data, args=(connection, received), daemon=True).start()
     clock = pygame.time.Clock()
     running = True
 
     # Create player soldier
     player = Soldier(player_x, player_y, soldier_type, pseudo)
 
-    # Game state
-    game_over = False
-    respawn_message_timer = 0
+    # Remote soldiers are drawn a little in the past, between two snapshots
+    interpolator = Interpolator()
+
+    # Inputs sent but not yet simulated by the server, replayed on each snapshot
+    input_sequence = 0
+    pending_inputs = deque(maxlen=MAX_PENDING_INPUTS)  # [(sequence, buttons)]
+    reconciled_state = None
 
     while running:
         for event in pygame.event.get():
@@ -213,109 +276,53 @@ def main():
                 running = False
 
         keys = pygame.key.get_pressed()
-        
-        # Handle respawn on R key when dead
-        if player.health <= 0:
-            game_over = True
-            if keys[pygame.K_r]:
-                game_over = False
-                player = Soldier(player_x, player_y, soldier_type, pseudo)
-                
-        if not game_over:
-            player.update(keys, [other_soldiers.get(pid) for pid in other_soldiers])
-
-            # Clamp player position to map boundaries
-            player.x = max(0, min(player.x, map_width - 50))
-            player.y = max(0, min(player.y, map_height - 50))
-
-            # Update camera to follow player smoothly
-            target_camera_x = player.x - SCREEN_WIDTH // 2
-            target_camera_y = player.y - SCREEN_HEIGHT // 2
-
-            # Clamp camera to map boundaries
-            target_camera_x = max(0, min(target_camera_x, map_width - SCREEN_WIDTH))
-            target_camera_y = max(0, min(target_camera_y, map_height - SCREEN_HEIGHT))
-
-            # Smooth camera movement
-            camera_x += (target_camera_x - camera_x) * camera_speed
-            camera_y += (target_camera_y - camera_y) * camera_speed
-
-            # Extract bullet data for network transmission
-            bullet_data = []
-            for bullet in player.bullets:
-                bullet_data.append((bullet.x, bullet.y, bullet.direction))
-
-            try:
-                msg = {
-                    'position': (player.x, player.y),
-                    'pseudo': pseudo,
-                    'soldier_type': soldier_type,
-                    'health': player.health,
-                    'bullets': bullet_data
-                }
-                sock.send(pickle.dumps(msg))
-            except socket.error:
-                break
 
-        screen.fill((0, 0, 0))
-        
-        # Draw map
-        map_manager.draw(screen, camera_x, camera_y)
-        
-        # Draw other players
-        for pid, (pos, name, soldier_type, health, bullets) in other_players.items():
-            if pid not in other_soldiers:
-                # Create new soldier object only if it doesn't exist
-                other_soldiers[pid] = Soldier(pos[0], pos[1], soldier_type, name)
-            else:
-                # Update existing soldier's position and health
-                other_soldiers[pid].x = pos[0]
-                other_soldiers[pid].y = pos[1]
-                other_soldiers[pid].health = health
-                
-                # Clear and update bullets
-                other_soldiers[pid].bullets.clear()
-                for bullet_data in bullets:
-                    x, y, direction = bullet_data
-                    from game.soldier import Bullet
-                    bullet = Bullet(x, y, direction)
-                    other_soldiers[pid].bullets.append(bullet)
-                    
-                # Update soldier state based on health
-                if health <= 0:
-                    other_soldiers[pid].state = SoldierState.DEAD
-                
-            # Draw the soldier and their bullets
-            other_soldiers[pid].draw(screen, camera_x, camera_y)
-
-        # Clean up disconnected players
-        disconnected_players = set(other_soldiers.keys()) - set(other_players.keys())
-        for pid in disconnected_players:
-            del other_soldiers[pid]
-
-        # Draw current player
-        if not game_over:
-            player.draw(screen, camera_x, camera_y)
-        else:
-            # Show game over and respawn message
-            game_over_font = pygame.font.Font(None, 72)
-            game_over_text = game_over_font.render("GAME OVER", True, RED)
-            respawn_font = pygame.font.Font(None, 36)
-            respawn_text = respawn_font.render("Press R to respawn", True, WHITE)
-            
-            screen.blit(game_over_text, 
-                        (SCREEN_WIDTH // 2 - game_over_text.get_width() // 2, 
-                         SCREEN_HEIGHT // 2 - 50))
-            screen.blit(respawn_text, 
-                        (SCREEN_WIDTH // 2 - respawn_text.get_width() // 2, 
-                         SCREEN_HEIGHT // 2 + 20))
+        # Server reconciliation: our position and health are the server's,
+        # plus the inputs it had not received yet
+        own_state = server_own_state
+        if own_state is not None and own_state is not reconciled_state:
+            reconciled_state = own_state
+            acked_sequence, (position, _, _, health, _) = own_state
+            while pending_inputs and pending_inputs[0][0] <= acked_sequence:
+                pending_inputs.popleft()
+            player.reconcile(position, health, pending_inputs, map_manager.collision, (map_width, map_height))
+
+        # Client prediction: apply this frame's input right away (R respawns when dead)
+        input_sequence += 1
+        buttons = buttons_from_keys(keys)
+        pending_inputs.append((input_sequence, buttons))
+        player.update(buttons, [other_soldiers.get(pid) for pid in other_soldiers],
+                      map_manager.collision, (map_width, map_height))
+        game_over = player.health <= 0
 
+        try:
+            connection.send(protocol.encode_input(list(pending_inputs)[-INPUT_REDUNDANCY:], last_snapshot_tick))
+        except socket.error:
+            break
+
+        draw_frame(interpolator, time.perf_counter(), game_over)
         pygame.display.flip()
         clock.tick(60)
 
-    sock.close()
+    # UDP has no close, tell the server we are leaving instead of letting it
+    # time out: reliably, and wait a little for the ack before closing
+    if client_id is not None:
+        try:
+            connection.send(protocol.encode_disconnect(client_id), reliable=True)
+        except socket.error:
+            pass
+    connection.close(linger=CLOSE_LINGER)
     pygame.quit()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Client du jeu shooter multijoueur")
+    parser.add_argument('--udp', action='store_true', help="état du jeu en UDP, repli sur TCP si le serveur ne répond pas")
+    parser.add_argument('--loss', type=float, default=0.0, help="UDP : proportion de datagrammes perdus (simulation)")
+    parser.add_argument('--latency', type=float, default=0.0, help="UDP : latence ajoutée en ms (simulation)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="UDP : gigue ajoutée en ms (simulation)")
+    args = parser.parse_args()
+    conditions = None
+    if args.loss or args.latency or args.jitter:
+        conditions = NetworkConditions(args.loss, args.latency / 1000, args.jitter / 1000)
+    main(args.udp, conditions)
\ No newline at end of file
@@ -1,4 +1,5 @@
 import pygame
+from game.text_cache import text_cache
 
 # Init Pygame
 pygame.init()
@@ -15,8 +16,9 @@ CYAN = (0, 255, 255)
 MAGENTA = (255, 0, 255)
 
 # Police
-font = pygame.font.Font(None, 74)
-small_font = pygame.font.Font(None, 36)
+FONT_SIZE = 74
+SMALL_FONT_SIZE = 36
+text_cache.preload((FONT_SIZE, SMALL_FONT_SIZE))
 
 class Menu:
     def __init__(self, screen):
@@ -31,7 +33,7 @@ class Menu:
     def draw_input(self, text, x, y, width, height, active):
         color = BLUE if active else GRAY
         pygame.draw.rect(self.screen, color, (x, y, width, height), 2)
-        text_surface = small_font.render(text, True, WHITE)
+        text_surface = text_cache.render(text, SMALL_FONT_SIZE, WHITE)
         self.screen.blit(text_surface, (x + 5, y + 5))
         if active and self.cursor_visible:
             cursor_x = x + 5 + text_surface.get_width()
@@ -46,26 +48,26 @@ class Menu:
             self.screen.fill(BLACK)
             width, height = self.screen.get_size()
 
-            title = font.render('Shooter Multijoueur', True, WHITE)
+            title = text_cache.render('Shooter Multijoueur', FONT_SIZE, WHITE)
             title_rect = title.get_rect(center=(width/2, height/4))
             self.screen.blit(title, title_rect)
 
-            host_button = font.render('Héberger une partie', True, WHITE)
+            host_button = text_cache.render('Héberger une partie', FONT_SIZE, WHITE)
             host_rect = host_button.get_rect(center=(width/2, height/2 - 50))
             pygame.draw.rect(self.screen, GREEN, host_rect.inflate(30, 20))
             self.screen.blit(host_button, host_rect)
 
-            join_button = font.render('Rejoindre une partie', True, WHITE)
+            join_button = text_cache.render('Rejoindre une partie', FONT_SIZE, WHITE)
             join_rect = join_button.get_rect(center=(width/2, height/2 + 50))
             pygame.draw.rect(self.screen, BLUE, join_rect.inflate(30, 20))
             self.screen.blit(join_button, join_rect)
 
             if self.mode == 'join':
-                label = small_font.render("IP de l'hôte :", True, WHITE)
+                label = text_cache.render("IP de l'hôte :", SMALL_FONT_SIZE, WHITE)
                 self.screen.blit(label, (width/2 - 150, height/2 + 120))
                 self.input_rect = self.draw_input(self.ip_input, width/2 - 50, height/2 + 115, 200, 40, self.active_input)
 
-                continue_button = small_font.render('Se connecter', True, WHITE)
+                continue_button = text_cache.render('Se connecter', SMALL_FONT_SIZE, WHITE)
                 continue_rect = continue_button.get_rect(center=(width/2, height/2 + 200))
                 pygame.draw.rect(self.screen, GREEN, continue_rect.inflate(20, 10))
                 self.screen.blit(continue_button, continue_rect)
@@ -115,23 +117,23 @@ class Menu:
             v_rect = None
             self.screen.fill(BLACK)
             width, height = self.screen.get_size()
-            title = small_font.render('Choisis ton pseudo et ton soldat', True, WHITE)
+            title = text_cache.render('Choisis ton pseudo et ton soldat', SMALL_FONT_SIZE, WHITE)
             self.screen.blit(title, (width/2 - 150, 50))
 
             # Draw soldier selection
             for i, name in enumerate(soldiers):
-                label = small_font.render(name, True, WHITE)
+                label = text_cache.render(name, SMALL_FONT_SIZE, WHITE)
                 rect = label.get_rect(topleft=(100, 100 + i * 50))
                 pygame.draw.rect(self.screen, GREEN if name == selected_soldier else GRAY, rect.inflate(20, 10), 2)
                 self.screen.blit(label, rect)
 
             # Draw name input
-            name_label = small_font.render('Ton pseudo:', True, WHITE)
+            name_label = text_cache.render('Ton pseudo:', SMALL_FONT_SIZE, WHITE)
             self.screen.blit(name_label, (100, 200))
             name_input = self.draw_input(selected_name if selected_name else '', 100, 240, 200, 40, False)
 
             if selected_name and selected_soldier:
-                validate = small_font.render('Valider', True, WHITE)
+                validate = text_cache.render('Valider', SMALL_FONT_SIZE, WHITE)
                 v_rect = validate.get_rect(center=(width/2, height - 60))
                 pygame.draw.rect(self.screen, GREEN, v_rect.inflate(20, 10))
                 self.screen.blit(validate, v_rect)
@@ -0,0 +1,146 @@
+import pygame
+import argparse
+import sys
+import os
+import time
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game.map_manager import MapManager
+from game.soldier import Soldier, SoldierState, BulletPool
+from game.replay import ReplayReader
+from game.text_cache import text_cache
+
+SCREEN_WIDTH, SCREEN_HEIGHT = 800, 600
+SEEK_SECONDS = 5  # Left / right arrows jump this far
+SPEEDS = (0.25, 0.5, 1, 2, 4, 8, 16)
+MAP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'map', 'map.tmx')
+
+WHITE = (255, 255, 255)
+
+
+# Plays a replay recorded with server.py --record through the same drawing
+# code as the game (MapManager.draw, Soldier.draw). The camera follows one
+# player, Tab switches to the next.
+#   Space: pause    Left / Right: -/+ 5 s    Up / Down: speed    Tab: next player
+# --fast renders every tick back to back, as fast as the machine goes (with
+# SDL_VIDEODRIVER=dummy, no window at all) and prints the ticks per second.
+def draw_world(screen, map_manager, soldiers, bullet_pool, states, camera_x, camera_y):
+    map_manager.draw(screen, camera_x, camera_y)
+    for player_id, (position, pseudo, soldier_type, health, bullets) in states.items():
+        soldier = soldiers.get(player_id)
+        if soldier is None:
+            soldier = soldiers[player_id] = Soldier(position[0], position[1], soldier_type, pseudo)
+        soldier.x, soldier.y = position
+        soldier.health = health
+        soldier.state = SoldierState.DEAD if health <= 0 else SoldierState.IDLE
+        soldier.sync_bullets(bullets, bullet_pool)
+        soldier.draw(screen, camera_x, camera_y)
+    for player_id in [player_id for player_id in soldiers if player_id not in states]:
+        soldiers.pop(player_id).release_bullets(bullet_pool)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lecteur de replays (server.py --record)")
+    parser.add_argument('replay')
+    parser.add_argument('--start', type=int, help="tick de départ")
+    parser.add_argument('--speed', type=float, default=1, help="vitesse de lecture (1: temps réel)")
+    parser.add_argument('--fast', action='store_true', help="aussi vite que possible, pour l'analyse")
+    parser.add_argument('--follow', help="pseudo du joueur à suivre")
+    args = parser.parse_args()
+
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption(f'Replay - {os.path.basename(args.replay)}')
+    reader = ReplayReader(args.replay)
+    map_manager = MapManager(MAP_PATH)
+    map_width, map_height = map_manager.get_map_size()
+    bullet_pool = BulletPool()
+    soldiers = {}  # {player_id: Soldier}
+
+    ticks = reader.ticks(args.start)
+    tick, states = next(ticks)
+    position = float(tick)  # Fractional tick we should be showing
+    speed = args.speed
+    paused = False
+    followed = None
+    clock = pygame.time.Clock()
+    started = time.perf_counter()
+    rendered = 0
+    running = True
+
+    while running:
+        seek = None
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key in (pygame.K_LEFT, pygame.K_RIGHT):
+                    step = SEEK_SECONDS * reader.tick_rate
+                    seek = tick + (step if event.key == pygame.K_RIGHT else -step)
+                elif event.key in (pygame.K_UP, pygame.K_DOWN):
+                    faster = [s for s in SPEEDS if s > speed]
+                    slower = [s for s in SPEEDS if s < speed]
+                    if event.key == pygame.K_UP and faster:
+                        speed = faster[0]
+                    elif event.key == pygame.K_DOWN and slower:
+                        speed = slower[-1]
+                elif event.key == pygame.K_TAB and states:
+                    ids = sorted(states, key=lambda player_id: states[player_id][1])
+                    followed = ids[(ids.index(followed) + 1) % len(ids)] if followed in ids else ids[0]
+
+        if seek is not None:
+            # Keyframe found in O(1) through the index whatever the distance,
+            # then at most keyframe_interval - 1 deltas on top of it
+            seek = max(reader.first_tick, min(reader.last_tick, seek))
+            ticks = reader.ticks(seek)
+            tick, states = next(ticks)
+            position = float(seek)
+        elif args.fast:
+            try:
+                tick, states = next(ticks)
+            except StopIteration:
+                running = False
+        elif not paused:
+            position += clock.get_time() / 1000 * reader.tick_rate * speed
+            try:
+                while tick < position:
+                    tick, states = next(ticks)
+            except StopIteration:
+                paused = True  # Stay on the last tick
+                position = tick
+
+        if followed not in states:
+            followed = None
+            for player_id, state in states.items():
+                if args.follow is None or state[1] == args.follow:
+                    followed = player_id
+                    break
+        camera_x = camera_y = 0
+        if followed is not None:
+            x, y = states[followed][0]
+            camera_x = max(0, min(x - SCREEN_WIDTH // 2, map_width - SCREEN_WIDTH))
+            camera_y = max(0, min(y - SCREEN_HEIGHT // 2, map_height - SCREEN_HEIGHT))
+
+        screen.fill((0, 0, 0))
+        draw_world(screen, map_manager, soldiers, bullet_pool, states, camera_x, camera_y)
+        seconds = (tick - reader.first_tick) / reader.tick_rate
+        status = f"tick {tick}  {seconds:.1f} s  x{speed:g}" + ("  pause" if paused else "")
+        screen.blit(text_cache.render(status, 28, WHITE), (10, 10))
+        pygame.display.flip()
+        rendered += 1
+        if not args.fast:
+            clock.tick(60)
+
+    elapsed = time.perf_counter() - started
+    if args.fast:
+        print(f"{rendered} ticks in {elapsed:.2f} s ({rendered / elapsed:.0f} ticks/s)")
+    reader.close()
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
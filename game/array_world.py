@@ -0,0 +1,248 @@
+try:
+    import numpy as np
+except ImportError:  # Optional dependency, only needed for --world numpy
+    np = None
+
+from game.protocol import DIRECTIONS, DIRECTION_CODES
+from game.player_input import BULLET_SPEED, DIRECTION_VECTORS
+
+
+HIT_CHUNK = 1024  # Bullets tested per vectorized block, bounds the bullets x players matrices
+
+
+class SlotArrays:
+    # A set of parallel numpy arrays indexed by slot. Freed slots go on a free
+    # list and are handed out again before the arrays grow.
+    def __init__(self, fields, capacity=64):
+        self.fields = fields  # {name: dtype}
+        self.capacity = capacity
+        self.arrays = {name: np.zeros(capacity, dtype) for name, dtype in fields.items()}
+        self.alive = np.zeros(capacity, bool)
+        self.free = list(range(capacity - 1, -1, -1))
+
+    def allocate(self):
+        if not self.free:
+            self._grow()
+        slot = self.free.pop()
+        self.alive[slot] = True
+        return slot
+
+    def release(self, slots):
+        self.alive[slots] = False
+        self.free.extend(slots)
+
+    def live(self):
+        return np.flatnonzero(self.alive)
+
+    def _grow(self):
+        old = self.capacity
+        self.capacity *= 2
+        for name, array in self.arrays.items():
+            grown = np.zeros(self.capacity, array.dtype)
+            grown[:old] = array
+            self.arrays[name] = grown
+        alive = np.zeros(self.capacity, bool)
+        alive[:old] = self.alive
+        self.alive = alive
+        self.free.extend(range(self.capacity - 1, old - 1, -1))
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+
+class ArrayWorld:
+    # Struct-of-arrays world state: player positions and health, and every
+    # live projectile, sit in contiguous arrays so a tick steps all bullets
+    # and resolves all hits in a few vectorized operations. Names and soldier
+    # types stay in Python lists indexed by the same slots.
+    def __init__(self, hit_radius=20, bullet_damage=10, capacity=64, bullet_capacity=1024):
+        if np is None:
+            raise ImportError("ArrayWorld needs numpy (pip install numpy)")
+        self.hit_radius = hit_radius
+        self.bullet_damage = bullet_damage
+        self.players = SlotArrays({'x': np.float64, 'y': np.float64, 'health': np.int32}, capacity)
+        self.bullets = SlotArrays({
+            'x': np.float64, 'y': np.float64, 'dx': np.float64, 'dy': np.float64,
+            'direction': np.int8, 'owner': np.int32, 'id': np.uint16,
+        }, bullet_capacity)
+        self.slots = {}  # {player_id: slot}
+        self.ids = {}  # {slot: player_id}
+        self.names = [""] * capacity
+        self.soldier_types = ["falcon"] * capacity
+        self.owned_bullets = {}  # {player slot: [bullet slots]}
+        self.collision = None  # CollisionMap, see set_collision
+        self.walls = None  # Its tile grid
+
+    def set_collision(self, collision_map):
+        # Bullets that meet a wall or leave the map are dropped each step
+        self.collision = collision_map
+        self.walls = np.frombuffer(bytes(collision_map.solid), np.uint8).reshape(
+            collision_map.height, collision_map.width
+        ).astype(bool)
+        self.tile_width = collision_map.tile_width
+        self.tile_height = collision_map.tile_height
+
+    def __contains__(self, player_id):
+        return player_id in self.slots
+
+    def player_ids(self):
+        return self.slots.keys()
+
+    def set_player(self, player_id, position, pseudo, soldier_type, health, bullets):
+        slot = self.slots.get(player_id)
+        if slot is None:
+            slot = self.players.allocate()
+            self.slots[player_id] = slot
+            self.ids[slot] = player_id
+            if slot >= len(self.names):
+                grow = self.players.capacity - len(self.names)
+                self.names.extend([""] * grow)
+                self.soldier_types.extend(["falcon"] * grow)
+        self.players['x'][slot], self.players['y'][slot] = position
+        self.players['health'][slot] = health
+        self.names[slot] = pseudo
+        self.soldier_types[slot] = soldier_type
+
+        # bullets, when given, replace the full list of the player's bullets
+        if bullets is not None:
+            old = self.owned_bullets.pop(slot, None)
+            if old:
+                self.bullets.release(old)
+            if bullets:
+                self._add_bullets(slot, bullets)
+
+    def add_bullet(self, player_id, bullet):
+        # bullet: (x, y, direction, id), fired by player_id, moves from the next step
+        self._add_bullets(self.slots[player_id], [bullet])
+
+    def _add_bullets(self, slot, bullets):
+        added = [self.bullets.allocate() for _ in bullets]
+        self.owned_bullets.setdefault(slot, []).extend(added)
+        codes = [DIRECTION_CODES[getattr(bullet[2], 'value', bullet[2])] for bullet in bullets]
+        vectors = np.array([DIRECTION_VECTORS[DIRECTIONS[code]] for code in codes])
+        self.bullets['x'][added] = [bullet[0] for bullet in bullets]
+        self.bullets['y'][added] = [bullet[1] for bullet in bullets]
+        self.bullets['dx'][added] = vectors[:, 0]
+        self.bullets['dy'][added] = vectors[:, 1]
+        self.bullets['direction'][added] = codes
+        self.bullets['id'][added] = [bullet[3] for bullet in bullets]
+        self.bullets['owner'][added] = slot
+
+    def remove_player(self, player_id):
+        slot = self.slots.pop(player_id, None)
+        if slot is None:
+            return
+        del self.ids[slot]
+        owned = self.owned_bullets.pop(slot, None)
+        if owned:
+            self.bullets.release(owned)
+        self.players.release([slot])
+
+    def step(self, dt):
+        # dt seconds of flight for every bullet, the tick's fixed step like
+        # the dict world's resolve_hits(elapsed): same inputs, same result
+        live = self.bullets.live()
+        if not live.size:
+            return
+
+        distance = BULLET_SPEED * dt
+        self.bullets['x'][live] += self.bullets['dx'][live] * distance
+        self.bullets['y'][live] += self.bullets['dy'][live] * distance
+
+        if self.collision is not None:
+            live = self._drop_blocked(live, distance)
+            if not live.size:
+                return
+
+        targets = self.players.live()
+        if not targets.size:
+            return
+        target_x = self.players['x'][targets]
+        target_y = self.players['y'][targets]
+        bullet_x = self.bullets['x'][live]
+        bullet_y = self.bullets['y'][live]
+        owners = self.bullets['owner'][live]
+
+        # Each bullet hits the nearest other player within the radius, the
+        # lowest player id on a tie (same rule as the dict world)
+        hit_bullets = []
+        hit_targets = []
+        radius_squared = self.hit_radius * self.hit_radius
+        for start in range(0, live.size, HIT_CHUNK):
+            end = start + HIT_CHUNK
+            dx = bullet_x[start:end, None] - target_x[None, :]
+            dy = bullet_y[start:end, None] - target_y[None, :]
+            distance = dx * dx + dy * dy
+            distance[(distance >= radius_squared) | (owners[start:end, None] == targets[None, :])] = np.inf
+            nearest = distance.min(axis=1)
+            any_hit = nearest < np.inf
+            if any_hit.any():
+                distance = distance[any_hit]
+                nearest = nearest[any_hit]
+                chosen = targets[distance.argmin(axis=1)]
+                for row in np.flatnonzero((distance == nearest[:, None]).sum(axis=1) > 1).tolist():
+                    tied = targets[distance[row] == nearest[row]].tolist()
+                    chosen[row] = self.slots[min(self.ids[slot] for slot in tied)]
+                hit_bullets.append(live[start:end][any_hit])
+                hit_targets.append(chosen)
+        if not hit_bullets:
+            return
+
+        hit_bullets = np.concatenate(hit_bullets)
+        damage = np.bincount(np.concatenate(hit_targets), minlength=self.players.capacity) * self.bullet_damage
+        health = self.players['health']
+        np.maximum(health - damage, 0, out=health)
+
+        self._release_bullets(hit_bullets)
+
+    def _drop_blocked(self, live, distance):
+        # Same test as the dict world (move_projectile): a raycast over the
+        # segment each bullet flew, so a long step (late tick) can't jump a
+        # wall. Bullets still in the open tile they started from can't have
+        # met one, the raycast only runs for those that crossed a border.
+        x = self.bullets['x'][live]
+        y = self.bullets['y'][live]
+        start_x = x - self.bullets['dx'][live] * distance
+        start_y = y - self.bullets['dy'][live] * distance
+        tile_x = np.floor(x / self.tile_width).astype(np.int64)
+        tile_y = np.floor(y / self.tile_height).astype(np.int64)
+        height, width = self.walls.shape
+        inside = (tile_x >= 0) & (tile_x < width) & (tile_y >= 0) & (tile_y < height)
+        clear = inside & (tile_x == np.floor(start_x / self.tile_width)) & (tile_y == np.floor(start_y / self.tile_height))
+        clear[clear] = ~self.walls[tile_y[clear], tile_x[clear]]
+        blocked = np.zeros(live.size, bool)
+        raycast = self.collision.raycast
+        for index in np.flatnonzero(~clear).tolist():
+            blocked[index] = raycast(start_x[index], start_y[index], x[index], y[index]) is not None
+        if blocked.any():
+            self._release_bullets(live[blocked])
+            live = live[~blocked]
+        return live
+
+    def _release_bullets(self, slots):
+        for slot, owner in zip(slots.tolist(), self.bullets['owner'][slots].tolist()):
+            self.owned_bullets[owner].remove(slot)
+        self.bullets.release(slots.tolist())
+
+    def states(self):
+        # Dict view for the network layer:
+        # {player_id: (position, pseudo, soldier_type, health, bullets)}
+        xs = self.players['x'].tolist()
+        ys = self.players['y'].tolist()
+        healths = self.players['health'].tolist()
+        bullet_x = self.bullets['x']
+        bullet_y = self.bullets['y']
+        bullet_direction = self.bullets['direction']
+        bullet_ids = self.bullets['id']
+        states = {}
+        for player_id, slot in self.slots.items():
+            owned = self.owned_bullets.get(slot)
+            bullets = []
+            if owned:
+                bullets = list(zip(
+                    bullet_x[owned].tolist(), bullet_y[owned].tolist(),
+                    [DIRECTIONS[code] for code in bullet_direction[owned].tolist()],
+                    bullet_ids[owned].tolist()
+                ))
+            states[player_id] = ((xs[slot], ys[slot]), self.names[slot], self.soldier_types[slot], healths[slot], bullets)
+        return states
@@ -0,0 +1,146 @@
+import math
+
+
+COLLISION_LAYER = "Collision"  # Any tile on a layer with this name is a wall
+SOLID_PROPERTIES = ('collides', 'solid')  # Or tiles with one of these properties set to true, on any layer
+PLAYER_HALF_SIZE = 16  # Soldiers collide as a 32x32 box centered on their position
+
+
+def solid_grid(map_data):
+    # One byte per tile, row by row: 1 for a wall
+    solid_gids = {
+        gid for gid, properties in map_data.tile_properties.items()
+        if any(str(properties.get(name, '')).lower() == 'true' for name in SOLID_PROPERTIES)
+    }
+    solid = bytearray(map_data.map_width * map_data.map_height)
+    for name, gids in map_data.layers.items():
+        wall_layer = name.lower() == COLLISION_LAYER.lower()
+        for index, gid in enumerate(gids):
+            if gid and (wall_layer or gid in solid_gids):
+                solid[index] = 1
+    return solid
+
+
+class CollisionMap:
+    # Walkability index of the map, one byte per tile (1 = wall), built from
+    # MapData so the client and the headless server share it. A summed area
+    # table over the same grid answers "is there a wall in this rectangle"
+    # in O(1) whatever the rectangle size, and raycast() walks the tiles a
+    # segment crosses (Amanatides & Woo) instead of sampling pixels.
+    #
+    # Points and rays treat everything outside the map as solid, so bullets
+    # stop at the border. Boxes only test the tiles they overlap, keeping the
+    # map bounds to the callers' clamps.
+    def __init__(self, map_data, solid=None):
+        # solid: an already built grid (the map cache stores one), skips the
+        # walk over MapData's layers
+        self.tile_width = map_data.tile_width
+        self.tile_height = map_data.tile_height
+        self.width = map_data.map_width
+        self.height = map_data.map_height
+        self.solid = bytearray(solid) if solid is not None else solid_grid(map_data)
+
+        # summed[ty * (width + 1) + tx] = walls in the tiles above and left of (tx, ty)
+        stride = self.width + 1
+        self.summed = [0] * (stride * (self.height + 1))
+        for ty in range(self.height):
+            row_total = 0
+            for tx in range(self.width):
+                row_total += self.solid[ty * self.width + tx]
+                self.summed[(ty + 1) * stride + tx + 1] = self.summed[ty * stride + tx + 1] + row_total
+        self.wall_count = self.summed[-1]
+
+    def tile_solid(self, tx, ty):
+        if 0 <= tx < self.width and 0 <= ty < self.height:
+            return self.solid[ty * self.width + tx] == 1
+        return True
+
+    def point_solid(self, x, y):
+        return self.tile_solid(int(x // self.tile_width), int(y // self.tile_height))
+
+    def rect_solid(self, left, top, right, bottom):
+        # Walls overlapping the pixel rectangle [left, right) x [top, bottom)
+        if not self.wall_count:
+            return False
+        tx0 = max(0, int(left // self.tile_width))
+        ty0 = max(0, int(top // self.tile_height))
+        tx1 = min(self.width, math.ceil(right / self.tile_width))
+        ty1 = min(self.height, math.ceil(bottom / self.tile_height))
+        if tx0 >= tx1 or ty0 >= ty1:
+            return False
+        stride = self.width + 1
+        summed = self.summed
+        count = (summed[ty1 * stride + tx1] - summed[ty0 * stride + tx1]
+                 - summed[ty1 * stride + tx0] + summed[ty0 * stride + tx0])
+        return count > 0
+
+    def box_solid(self, x, y, half_width=PLAYER_HALF_SIZE, half_height=PLAYER_HALF_SIZE):
+        return self.rect_solid(x - half_width, y - half_height, x + half_width, y + half_height)
+
+    def move_box(self, x, y, dx, dy, half_width=PLAYER_HALF_SIZE, half_height=PLAYER_HALF_SIZE):
+        # Moves axis by axis so the box slides along walls, and stops flush
+        # against the wall instead of a few pixels before it. A box that
+        # already overlaps a wall (spawned inside one) moves freely to get out.
+        if not self.wall_count or self.box_solid(x, y, half_width, half_height):
+            return x + dx, y + dy
+        if dx:
+            new_x = x + dx
+            if self.box_solid(new_x, y, half_width, half_height):
+                if dx > 0:
+                    new_x = (new_x + half_width) // self.tile_width * self.tile_width - half_width
+                else:
+                    new_x = ((new_x - half_width) // self.tile_width + 1) * self.tile_width + half_width
+                if self.box_solid(new_x, y, half_width, half_height):
+                    new_x = x
+            x = new_x
+        if dy:
+            new_y = y + dy
+            if self.box_solid(x, new_y, half_width, half_height):
+                if dy > 0:
+                    new_y = (new_y + half_height) // self.tile_height * self.tile_height - half_height
+                else:
+                    new_y = ((new_y - half_height) // self.tile_height + 1) * self.tile_height + half_height
+                if self.box_solid(x, new_y, half_width, half_height):
+                    new_y = y
+            y = new_y
+        return x, y
+
+    def raycast(self, x0, y0, x1, y1):
+        # Point where the segment enters its first wall, None if it is clear
+        tx = int(x0 // self.tile_width)
+        ty = int(y0 // self.tile_height)
+        if self.tile_solid(tx, ty):
+            return (x0, y0)
+        end_tx = int(x1 // self.tile_width)
+        end_ty = int(y1 // self.tile_height)
+        dx = x1 - x0
+        dy = y1 - y0
+
+        # Segment fraction at which we cross the next column / row border
+        if dx:
+            step_x = 1 if dx > 0 else -1
+            t_max_x = ((tx + (dx > 0)) * self.tile_width - x0) / dx
+            t_delta_x = self.tile_width / abs(dx)
+        else:
+            step_x, t_max_x, t_delta_x = 0, math.inf, math.inf
+        if dy:
+            step_y = 1 if dy > 0 else -1
+            t_max_y = ((ty + (dy > 0)) * self.tile_height - y0) / dy
+            t_delta_y = self.tile_height / abs(dy)
+        else:
+            step_y, t_max_y, t_delta_y = 0, math.inf, math.inf
+
+        while tx != end_tx or ty != end_ty:
+            if t_max_x < t_max_y:
+                t = t_max_x
+                tx += step_x
+                t_max_x += t_delta_x
+            else:
+                t = t_max_y
+                ty += step_y
+                t_max_y += t_delta_y
+            if t > 1:  # Rounding, we are past the end of the segment
+                break
+            if self.tile_solid(tx, ty):
+                return (x0 + dx * t, y0 + dy * t)
+        return None
@@ -0,0 +1,120 @@
+from collections import deque
+
+
+DEFAULT_TICK_INTERVAL = 1.0 / 30  # Until we have measured the server's tick rate
+MIN_DELAY = 0.05  # Seconds remote soldiers are rendered in the past, at least...
+MAX_DELAY = 0.5   # ...and at most, whatever the jitter
+JITTER_FACTOR = 3.0  # Delay = one tick interval + this many times the measured jitter
+MAX_EXTRAPOLATION = 0.1  # Seconds we keep moving a soldier past its last known position
+BUFFER_SIZE = 32  # Snapshots kept per remote soldier
+
+
+class SnapshotTimeline:
+    # Maps server ticks to local time. Snapshots are stamped with their tick,
+    # not with when they arrived, so network jitter doesn't end up in the
+    # positions. The anchor is the expected arrival time of the newest tick:
+    # early arrivals pull it back at once (fastest path through the network),
+    # lateness over it is the jitter, and the rendering delay follows it.
+    def __init__(self, min_delay=MIN_DELAY, max_delay=MAX_DELAY, jitter_factor=JITTER_FACTOR):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.jitter_factor = jitter_factor
+        self.tick_interval = DEFAULT_TICK_INTERVAL
+        self.jitter = 0.0
+        self.anchor = None  # (tick, expected local arrival time)
+        self.last = None  # (tick, arrival time), to measure the tick interval
+
+    def add(self, tick, now):
+        if self.last is not None and tick > self.last[0]:
+            interval = (now - self.last[1]) / (tick - self.last[0])
+            self.tick_interval += (interval - self.tick_interval) * 0.05
+        if self.last is None or tick > self.last[0]:
+            self.last = (tick, now)
+
+        if self.anchor is None:
+            self.anchor = (tick, now)
+            return
+        anchor_tick, anchor_time = self.anchor
+        expected = anchor_time + (tick - anchor_tick) * self.tick_interval
+        lateness = now - expected
+        if lateness < 0:
+            expected = now
+        else:
+            self.jitter += (lateness - self.jitter) * 0.1
+            expected += lateness * 0.01  # Follow clock drift and route changes slowly
+        if tick >= anchor_tick:
+            self.anchor = (tick, expected)
+
+    def delay(self):
+        delay = self.tick_interval + self.jitter_factor * self.jitter
+        return max(self.min_delay, min(self.max_delay, delay))
+
+    def render_tick(self, now):
+        # The (fractional) server tick to show remote soldiers at
+        anchor_tick, anchor_time = self.anchor
+        return anchor_tick + (now - anchor_time - self.delay()) / self.tick_interval
+
+
+class PositionBuffer:
+    # Ring buffer of (tick, x, y) for one remote soldier
+    def __init__(self, size=BUFFER_SIZE):
+        self.samples = deque(maxlen=size)
+
+    def add(self, tick, x, y):
+        if self.samples and tick <= self.samples[-1][0]:
+            return  # Duplicate or out of order
+        self.samples.append((tick, x, y))
+
+    def sample(self, render_tick, max_extrapolation_ticks):
+        samples = self.samples
+        if len(samples) == 1 or render_tick <= samples[0][0]:
+            return samples[0][1], samples[0][2]
+
+        last_tick, last_x, last_y = samples[-1]
+        if render_tick >= last_tick:
+            # Nothing newer yet: keep going at the last known velocity, for a while
+            previous_tick, previous_x, previous_y = samples[-2]
+            ahead = min(render_tick - last_tick, max_extrapolation_ticks)
+            span = last_tick - previous_tick
+            return (
+                last_x + (last_x - previous_x) * ahead / span,
+                last_y + (last_y - previous_y) * ahead / span
+            )
+
+        # Newest samples are the most likely neighbours, search from the end
+        for index in range(len(samples) - 2, -1, -1):
+            tick, x, y = samples[index]
+            if tick <= render_tick:
+                next_tick, next_x, next_y = samples[index + 1]
+                t = (render_tick - tick) / (next_tick - tick)
+                return x + (next_x - x) * t, y + (next_y - y) * t
+        return samples[0][1], samples[0][2]
+
+
+class Interpolator:
+    # Remote soldier positions, rendered a little in the past and
+    # interpolated between the two snapshots around that moment
+    def __init__(self, min_delay=MIN_DELAY, max_delay=MAX_DELAY, max_extrapolation=MAX_EXTRAPOLATION):
+        self.timeline = SnapshotTimeline(min_delay, max_delay)
+        self.max_extrapolation = max_extrapolation
+        self.buffers = {}  # {player_id: PositionBuffer}
+
+    def add_snapshot(self, tick, now, positions):
+        # positions: {player_id: (x, y)}
+        self.timeline.add(tick, now)
+        for player_id, (x, y) in positions.items():
+            buffer = self.buffers.get(player_id)
+            if buffer is None:
+                buffer = self.buffers[player_id] = PositionBuffer()
+            buffer.add(tick, x, y)
+
+    def position(self, player_id, now):
+        buffer = self.buffers.get(player_id)
+        if buffer is None or not buffer.samples:
+            return None
+        render_tick = self.timeline.render_tick(now)
+        max_ticks = self.max_extrapolation / self.timeline.tick_interval
+        return buffer.sample(render_tick, max_ticks)
+
+    def remove(self, player_id):
+        self.buffers.pop(player_id, None)
@@ -0,0 +1,176 @@
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import xml.etree.ElementTree as ET
+
+import pygame
+
+# Allow running as a script: python game/map_cache.py assets/map/map.tmx
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# Compiled map file: the rendered pixels of every chunk of the ground layer
+# plus the collision grid, so the client can skip pytmx, the TMX parsing
+# and the tile by tile rendering at startup.
+#
+#   header = magic | version | sha256 of the sources | tile width | tile height
+#            | map width | map height | chunk side in tiles
+#   solid  = map width * map height bytes, row by row, 1 for a wall (CollisionMap)
+#   chunks = RGBX pixels of each chunk, row by row of chunks
+#
+# The hash covers the .tmx, the .tsx tilesets and their images: editing any
+# of them invalidates the cache and the client falls back to pytmx.
+MAGIC = b'MAPC'
+CACHE_VERSION = 2
+HEADER = struct.Struct('!4sB32sHHHHH')
+PIXEL_FORMAT = 'RGBX'
+PIXEL_SIZE = 4
+
+
+def cache_path_for(map_path):
+    return os.path.splitext(map_path)[0] + '.mapcache'
+
+
+def source_files(map_path):
+    # The .tmx, every external tileset and every image they point to
+    files = [map_path]
+    root = ET.parse(map_path).getroot()
+    map_dir = os.path.dirname(map_path)
+    for tileset in root.iter('tileset'):
+        tileset_dir = map_dir
+        source = tileset.get('source')
+        if source:
+            tileset_path = os.path.join(map_dir, source)
+            files.append(tileset_path)
+            tileset_dir = os.path.dirname(tileset_path)
+            tileset = ET.parse(tileset_path).getroot()
+        for image in tileset.iter('image'):
+            files.append(os.path.join(tileset_dir, image.get('source')))
+    return files
+
+
+def source_hash(map_path):
+    digest = hashlib.sha256()
+    for path in source_files(map_path):
+        digest.update(os.path.basename(path).encode('utf-8'))
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.digest()
+
+
+def chunk_layout(map_width, map_height, chunk_tiles, tile_width, tile_height):
+    # [(pixel width, pixel height)] of each chunk, edge chunks are cut to the map
+    layout = []
+    for first_y in range(0, map_height, chunk_tiles):
+        for first_x in range(0, map_width, chunk_tiles):
+            layout.append((
+                (min(first_x + chunk_tiles, map_width) - first_x) * tile_width,
+                (min(first_y + chunk_tiles, map_height) - first_y) * tile_height
+            ))
+    return layout
+
+
+class MapCache:
+    # A compiled map opened with mmap: chunk pixels are only read (and paged
+    # in) when MapManager builds that chunk
+    def __init__(self, path, digest, chunk_tiles):
+        self.file = open(path, 'rb')
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file
+            self.file.close()
+            raise
+        (magic, version, stored_digest, self.tile_width, self.tile_height,
+         self.map_width, self.map_height, stored_chunk_tiles) = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != CACHE_VERSION or stored_digest != digest or stored_chunk_tiles != chunk_tiles:
+            self.close()
+            raise ValueError(f"Stale or foreign map cache: {path}")
+        self.chunk_tiles = chunk_tiles
+        self.chunks_x = -(-self.map_width // chunk_tiles)
+
+        offset = HEADER.size
+        solid_bytes = self.map_width * self.map_height
+        self.solid = self.data[offset:offset + solid_bytes]
+        offset += solid_bytes
+
+        self.chunks = []  # [(offset, (width, height))]
+        for size in chunk_layout(self.map_width, self.map_height, chunk_tiles, self.tile_width, self.tile_height):
+            self.chunks.append((offset, size))
+            offset += size[0] * size[1] * PIXEL_SIZE
+        if offset != len(self.data):
+            self.close()
+            raise ValueError(f"Truncated map cache: {path}")
+
+    def chunk_surface(self, chunk_x, chunk_y):
+        offset, size = self.chunks[chunk_y * self.chunks_x + chunk_x]
+        pixels = self.data[offset:offset + size[0] * size[1] * PIXEL_SIZE]
+        surface = pygame.image.frombuffer(pixels, size, PIXEL_FORMAT)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()  # Same pixel format as the screen, faster blits
+        return surface
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+def load_map_cache(map_path, chunk_tiles, cache_path=None):
+    # Returns None when there is no usable cache for this map
+    cache_path = cache_path or cache_path_for(map_path)
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        return MapCache(cache_path, source_hash(map_path), chunk_tiles)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"Ignoring map cache {cache_path}: {e}")
+        return None
+
+
+def compile_map(map_path, chunk_tiles, cache_path=None):
+    # Renders every chunk through pytmx once and writes the cache file
+    from game.map_manager import MapManager
+    from game.map_data import MapData
+    from game.collision_map import solid_grid
+
+    cache_path = cache_path or cache_path_for(map_path)
+    manager = MapManager(map_path, chunk_tiles=chunk_tiles, use_cache=False)
+    solid = solid_grid(MapData(map_path))
+
+    temp_path = cache_path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(HEADER.pack(
+            MAGIC, CACHE_VERSION, source_hash(map_path), manager.tile_width, manager.tile_height,
+            manager.map_width, manager.map_height, chunk_tiles
+        ))
+        f.write(solid)
+        for chunk_y in range(manager.chunks_y):
+            for chunk_x in range(manager.chunks_x):
+                surface = manager._render_chunk(chunk_x, chunk_y)
+                f.write(pygame.image.tostring(surface, PIXEL_FORMAT))
+    # Readers never see a half written cache
+    os.replace(temp_path, cache_path)
+    return cache_path
+
+
+def main():
+    from game.map_manager import CHUNK_TILES
+
+    parser = argparse.ArgumentParser(description="Precompile a TMX map for fast client startup")
+    parser.add_argument('map_path')
+    parser.add_argument('--chunk-tiles', type=int, default=CHUNK_TILES)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+
+    # pytmx.load_pygame needs a display mode for convert_alpha
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    path = compile_map(args.map_path, args.chunk_tiles, args.output)
+    print(f"Map cache written to {path} ({os.path.getsize(path)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
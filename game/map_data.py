@@ -0,0 +1,66 @@
+import base64
+import gzip
+import os
+import zlib
+import xml.etree.ElementTree as ET
+
+
+GID_MASK = 0x0FFFFFFF  # The high bits of a gid are Tiled's flip/rotation flags
+
+
+class MapData:
+    # Reads the map straight from the TMX file, without pytmx or pygame, so
+    # the server can use it: dimensions, tile layers as flat gid lists and
+    # the custom properties of the tiles of every tileset
+    def __init__(self, map_path):
+        root = ET.parse(map_path).getroot()
+        self.tile_width = int(root.get('tilewidth'))
+        self.tile_height = int(root.get('tileheight'))
+        self.map_width = int(root.get('width'))
+        self.map_height = int(root.get('height'))
+
+        self.layers = {}  # {layer name: [gid] row by row}
+        for layer in root.iter('layer'):
+            data = layer.find('data')
+            if data is not None:
+                self.layers[layer.get('name')] = self._read_gids(data)
+
+        self.tile_properties = {}  # {gid: {property name: value}}
+        map_dir = os.path.dirname(map_path)
+        for tileset in root.iter('tileset'):
+            first_gid = int(tileset.get('firstgid'))
+            source = tileset.get('source')
+            if source:
+                tileset = ET.parse(os.path.join(map_dir, source)).getroot()
+            for tile in tileset.iter('tile'):
+                properties = {
+                    prop.get('name'): prop.get('value', prop.text)
+                    for prop in tile.iter('property')
+                }
+                if properties:
+                    self.tile_properties[first_gid + int(tile.get('id'))] = properties
+
+    def _read_gids(self, data):
+        encoding = data.get('encoding')
+        if encoding == 'csv':
+            gids = [int(value) for value in data.text.replace('\n', '').split(',') if value.strip()]
+        elif encoding == 'base64':
+            raw = base64.b64decode(data.text.strip())
+            compression = data.get('compression')
+            if compression == 'zlib':
+                raw = zlib.decompress(raw)
+            elif compression == 'gzip':
+                raw = gzip.decompress(raw)
+            elif compression:
+                raise ValueError(f"Unsupported layer compression: {compression}")
+            gids = [int.from_bytes(raw[i:i + 4], 'little') for i in range(0, len(raw), 4)]
+        else:
+            # Plain XML, one <tile gid="..."/> per cell
+            gids = [int(tile.get('gid', 0)) for tile in data.iter('tile')]
+        return [gid & GID_MASK for gid in gids]
+
+    def get_map_size(self):
+        return (
+            self.map_width * self.tile_width,
+            self.map_height * self.tile_height
+        )
@@ -1,40 +1,131 @@
 import pygame
 import pytmx
+from collections import OrderedDict
+
+from game.map_cache import load_map_cache
+from game.map_data import MapData
+from game.collision_map import CollisionMap
+
+
+CHUNK_TILES = 16  # Chunk side in tiles, 512 px with the 32 px tileset
+CHUNK_BUDGET = 32 * 1024 * 1024  # Pixel memory kept for built chunks, in bytes
 
 
 class MapManager:
-    def __init__(self, map_path):
-        self.tmx_data = pytmx.load_pygame(map_path)
-        self.tile_width = self.tmx_data.tilewidth
-        self.tile_height = self.tmx_data.tileheight
-        self.map_width = self.tmx_data.width
-        self.map_height = self.tmx_data.height
-     
-        # Create a surface for the entire map
-        self.map_surface = pygame.Surface((
-            self.map_width * self.tile_width,
-            self.map_height * self.tile_height
+    # The map is cut into square chunks of chunk_tiles x chunk_tiles tiles.
+    # A chunk is only rendered to its own surface the first time it shows up
+    # in the camera rectangle, and draw() blits just the chunks it intersects.
+    # Built chunks are kept least recently used first and dropped once they
+    # go over memory_budget bytes, so big maps never need a full size surface.
+    # When a compiled cache matching the map sources exists (see map_cache.py)
+    # chunks come straight from it and pytmx.load_pygame is skipped.
+    def __init__(self, map_path, chunk_tiles=CHUNK_TILES, memory_budget=CHUNK_BUDGET, use_cache=True):
+        self.cache = load_map_cache(map_path, chunk_tiles) if use_cache else None
+        if self.cache is not None:
+            self.tmx_data = None
+            self.layer = None
+            self.tile_width = self.cache.tile_width
+            self.tile_height = self.cache.tile_height
+            self.map_width = self.cache.map_width
+            self.map_height = self.cache.map_height
+        else:
+            self.tmx_data = pytmx.load_pygame(map_path)
+            self.tile_width = self.tmx_data.tilewidth
+            self.tile_height = self.tmx_data.tileheight
+            self.map_width = self.tmx_data.width
+            self.map_height = self.tmx_data.height
+
+            # Get the first layer (assuming it's the ground layer)
+            self.layer = self.tmx_data.get_layer_by_name("Tile Layer 1")
+
+        # Walls, shared with the server through MapData (no pygame needed),
+        # or read from the cache without parsing the TMX again
+        if self.cache is not None:
+            self.collision = CollisionMap(self.cache, self.cache.solid)
+        else:
+            self.collision = CollisionMap(MapData(map_path))
+
+        self.chunk_tiles = chunk_tiles
+        self.chunk_width = chunk_tiles * self.tile_width
+        self.chunk_height = chunk_tiles * self.tile_height
+        self.chunks_x = -(-self.map_width // chunk_tiles)
+        self.chunks_y = -(-self.map_height // chunk_tiles)
+
+        self.memory_budget = memory_budget
+        self.chunks = OrderedDict()  # {(chunk x, chunk y): (surface, size in bytes)}
+        self.chunk_bytes = 0
+        self.chunks_built = 0
+
+    def _build_chunk(self, chunk_x, chunk_y):
+        self.chunks_built += 1
+        if self.cache is not None:
+            return self.cache.chunk_surface(chunk_x, chunk_y)
+        return self._render_chunk(chunk_x, chunk_y)
+
+    def _render_chunk(self, chunk_x, chunk_y):
+        first_x = chunk_x * self.chunk_tiles
+        first_y = chunk_y * self.chunk_tiles
+        last_x = min(first_x + self.chunk_tiles, self.map_width)
+        last_y = min(first_y + self.chunk_tiles, self.map_height)
+
+        # Chunks on the right and bottom edges are cut to the map size
+        surface = pygame.Surface((
+            (last_x - first_x) * self.tile_width,
+            (last_y - first_y) * self.tile_height
         ))
-        self.map_surface.fill((0, 0, 0))  # Black background
-      
-        # Render the map once
-        self._render_map()
-    
-    def _render_map(self):
-        # Get the first layer (assuming it's the ground layer)
-        layer = self.tmx_data.get_layer_by_name("Tile Layer 1")
-        
-        # Render each tile
-        for x, y, tile in layer.tiles():
-            if tile:
-                self.map_surface.blit(
-                    tile,
-                    (x * self.tile_width, y * self.tile_height)
-                )
-        
+        surface.fill((0, 0, 0))  # Black background
+
+        data = self.layer.data
+        get_image = self.tmx_data.get_tile_image_by_gid
+        for y in range(first_y, last_y):
+            row = data[y]
+            for x in range(first_x, last_x):
+                gid = row[x]
+                if gid:
+                    tile = get_image(gid)
+                    if tile:
+                        surface.blit(tile, ((x - first_x) * self.tile_width, (y - first_y) * self.tile_height))
+        return surface
+
+    def _get_chunk(self, key):
+        entry = self.chunks.get(key)
+        if entry is not None:
+            self.chunks.move_to_end(key)
+            return entry[0]
+        surface = self._build_chunk(*key)
+        size = surface.get_width() * surface.get_height() * surface.get_bytesize()
+        self.chunks[key] = (surface, size)
+        self.chunk_bytes += size
+        return surface
+
+    def _evict(self, visible):
+        # Never drop a chunk that is on screen, even if the budget is too small
+        while self.chunk_bytes > self.memory_budget and len(self.chunks) > len(visible):
+            key = next(iter(self.chunks))
+            if key in visible:
+                break
+            _, size = self.chunks.pop(key)
+            self.chunk_bytes -= size
+
+    def visible_chunks(self, camera_x, camera_y, view_width, view_height):
+        first_x = max(0, int(camera_x) // self.chunk_width)
+        first_y = max(0, int(camera_y) // self.chunk_height)
+        last_x = min(self.chunks_x - 1, int(camera_x + view_width - 1) // self.chunk_width)
+        last_y = min(self.chunks_y - 1, int(camera_y + view_height - 1) // self.chunk_height)
+        return [
+            (chunk_x, chunk_y)
+            for chunk_y in range(first_y, last_y + 1)
+            for chunk_x in range(first_x, last_x + 1)
+        ]
+
     def draw(self, screen, camera_x=0, camera_y=0):
-        # Draw the map surface with camera offset
-        screen.blit(self.map_surface, (-camera_x, -camera_y))
+        # Only blit the chunks that intersect the camera rectangle
+        view_width, view_height = screen.get_size()
+        visible = self.visible_chunks(camera_x, camera_y, view_width, view_height)
+        for chunk_x, chunk_y in visible:
+            surface = self._get_chunk((chunk_x, chunk_y))
+            screen.blit(surface, (chunk_x * self.chunk_width - camera_x, chunk_y * self.chunk_height - camera_y))
+        self._evict(set(visible))
 
     def get_map_size(self):
         return (
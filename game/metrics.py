@@ -0,0 +1,189 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+TIME_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 33, 50, 100, 250, 1000)  # Upper bounds of the histogram buckets
+RECENT_SAMPLES = 1024  # Samples kept per histogram for the percentiles
+DUMP_INTERVAL = 10  # Seconds between two writes of the stats file
+
+
+class Histogram:
+    # Cumulative buckets since startup (for scrapers that compute rates) plus
+    # the last RECENT_SAMPLES values for percentiles of what happens now
+    def __init__(self, buckets=TIME_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last one: over the highest bound
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.recent.append(value)
+
+    def to_dict(self):
+        recent = sorted(self.recent)
+
+        def percentile(p):
+            return recent[min(len(recent) - 1, int(len(recent) * p / 100))] if recent else 0.0
+
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'avg': self.total / self.count if self.count else 0.0,
+            'p50': percentile(50),
+            'p99': percentile(99),
+            'max': recent[-1] if recent else 0.0,
+            'buckets': buckets,
+        }
+
+
+class Metrics:
+    # Counters, gauges and histograms of the server, plus per-client traffic.
+    # Written by the tick and the client threads, read by the stats endpoint:
+    # everything goes through one lock, held for a few dict operations only.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counters = {}  # {name: total since startup}
+        self.gauges = {}  # {name: last value}
+        self.histograms = {}  # {name: Histogram}
+        self.clients = {}  # {client_id: {name: total}}
+        self.probes = []  # Functions returning {client_id: {name: value}}, read when exporting
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def gauge(self, name, value):
+        self.gauges[name] = value
+
+    def observe(self, name, value):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def client_count(self, client_id, name, amount=1):
+        # Per client and in the server total
+        with self.lock:
+            client = self.clients.get(client_id)
+            if client is None:
+                client = self.clients[client_id] = {}
+            client[name] = client.get(name, 0) + amount
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def received(self, client_id, size, messages):
+        self.client_count(client_id, 'bytes_in', size)
+        self.client_count(client_id, 'messages_in', messages)
+
+    def sent(self, client_id, size, messages=1):
+        self.client_count(client_id, 'bytes_out', size)
+        self.client_count(client_id, 'messages_out', messages)
+
+    def remove_client(self, client_id):
+        # Its traffic stays in the totals
+        with self.lock:
+            self.clients.pop(client_id, None)
+
+    def add_probe(self, probe):
+        self.probes.append(probe)
+
+    def snapshot(self):
+        with self.lock:
+            clients = {client_id: dict(values) for client_id, values in self.clients.items()}
+            report = {
+                'uptime_s': time.time() - self.started,
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+                'histograms': {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+            }
+        for probe in self.probes:
+            for client_id, values in probe().items():
+                if client_id in clients:
+                    clients[client_id].update(values)
+        report['clients'] = clients
+        return report
+
+    def to_text(self):
+        # Prometheus text format, one line per value
+        report = self.snapshot()
+        lines = [f"game_uptime_seconds {report['uptime_s']:.0f}"]
+        for name, value in sorted(report['counters'].items()):
+            lines.append(f"game_{name}_total {value}")
+        for name, value in sorted(report['gauges'].items()):
+            lines.append(f"game_{name} {value}")
+        for name, histogram in sorted(report['histograms'].items()):
+            for bound, count in histogram['buckets'].items():
+                lines.append(f'game_{name}_bucket{{le="{bound}"}} {count}')
+            lines.append(f"game_{name}_sum {histogram['sum']:.3f}")
+            lines.append(f"game_{name}_count {histogram['count']}")
+        for client_id, values in sorted(report['clients'].items()):
+            for name, value in sorted(values.items()):
+                lines.append(f'game_client_{name}{{client="{client_id}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+class StatsHandler(BaseHTTPRequestHandler):
+    # GET /stats (or /): JSON, GET /metrics: plaintext
+    metrics = None
+
+    def do_GET(self):
+        if self.path in ('/', '/stats'):
+            body = json.dumps(self.metrics.snapshot(), indent=2).encode()
+            content_type = 'application/json'
+        elif self.path == '/metrics':
+            body = self.metrics.to_text().encode()
+            content_type = 'text/plain; version=0.0.4'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapers would flood the game log
+
+
+def start_stats_server(metrics, host, port):
+    # Local HTTP endpoint on its own thread, never touches the game sockets
+    handler = type('Handler', (StatsHandler,), {'metrics': metrics})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_stats_dump(metrics, path, interval=DUMP_INTERVAL):
+    # Rewrites path with the JSON stats every interval seconds. Readers
+    # never see a half-written file: it is written aside, then renamed.
+    def dump():
+        while True:
+            time.sleep(interval)
+            temporary = path + '.tmp'
+            with open(temporary, 'w') as f:
+                json.dump(metrics.snapshot(), f, indent=2)
+            os.replace(temporary, path)
+
+    thread = threading.Thread(target=dump, daemon=True)
+    thread.start()
+    return thread
+
+
+metrics = Metrics()  # The server's, one per process
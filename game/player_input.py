@@ -0,0 +1,62 @@
+# Player simulation shared by the server (authoritative) and the client
+# (prediction and replay). Both must run exactly the same code on the same
+# inputs, so nothing here depends on pygame, time or randomness.
+
+# Input buttons, one bit each, sampled once per client frame
+BUTTON_LEFT = 1
+BUTTON_RIGHT = 2
+BUTTON_UP = 4
+BUTTON_DOWN = 8
+BUTTON_SHOOT = 16
+BUTTON_RESPAWN = 32
+
+INPUT_RATE = 60  # Inputs per second, one per client frame
+PLAYER_SPEED = 5  # Pixels per input
+EDGE_MARGIN = 50  # Players stay within [0, map size - EDGE_MARGIN]
+SPAWN_POSITION = (400, 300)
+MAX_HEALTH = 100
+SHOOT_COOLDOWN = 30  # Inputs between two shots, 500 ms at 60 inputs/s
+
+BULLET_SPEED = 600.0  # Pixels per second, 10 px per input
+# Unit vectors by direction (protocol.DIRECTIONS names)
+DIRECTION_VECTORS = {
+    'front': (0.0, 1.0),
+    'back': (0.0, -1.0),
+    'left': (-1.0, 0.0),
+    'right': (1.0, 0.0),
+}
+
+
+def simulate_input(x, y, health, direction, cooldown, buttons, collision=None, map_size=None):
+    # One input step. Returns (x, y, health, direction, cooldown, fired):
+    # fired tells the caller to spawn a bullet at (x, y) going direction.
+    if health <= 0:
+        if buttons & BUTTON_RESPAWN:
+            return SPAWN_POSITION[0], SPAWN_POSITION[1], MAX_HEALTH, 'front', 0, False
+        return x, y, health, direction, cooldown, False
+
+    # Same priority as the arrow keys always had: one axis at a time
+    dx = dy = 0
+    if buttons & BUTTON_LEFT:
+        dx, direction = -PLAYER_SPEED, 'left'
+    elif buttons & BUTTON_RIGHT:
+        dx, direction = PLAYER_SPEED, 'right'
+    elif buttons & BUTTON_UP:
+        dy, direction = -PLAYER_SPEED, 'back'
+    elif buttons & BUTTON_DOWN:
+        dy, direction = PLAYER_SPEED, 'front'
+
+    if collision is not None:
+        x, y = collision.move_box(x, y, dx, dy)
+    else:
+        x, y = x + dx, y + dy
+    if map_size is not None:
+        x = max(0, min(x, map_size[0] - EDGE_MARGIN))
+        y = max(0, min(y, map_size[1] - EDGE_MARGIN))
+
+    if cooldown > 0:
+        cooldown -= 1
+    fired = bool(buttons & BUTTON_SHOOT) and cooldown == 0
+    if fired:
+        cooldown = SHOOT_COOLDOWN
+    return x, y, health, direction, cooldown, fired
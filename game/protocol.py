@@ -0,0 +1,322 @@
+import struct
+import uuid
+from functools import lru_cache
+
+
+# Wire format: every message is one frame made of a fixed header followed by
+# a payload whose layout depends on the message type.
+#
+#   header  = payload length (uint32) | protocol version (uint8) | type (uint8)
+#
+# All integers are big endian. Player ids are the 16 raw bytes of the uuid the
+# server hands out, strings are utf-8 with a one byte length prefix.
+PROTOCOL_VERSION = 5
+MAX_FRAME_SIZE = 1 << 20  # Refuse anything bigger than 1 MiB
+ID_CACHE_SIZE = 4096  # Encoded player ids kept, far more than players in a match
+
+MSG_INIT = 1
+MSG_DISCONNECT = 2
+MSG_SNAPSHOT = 5
+MSG_DELTA = 6
+MSG_JOIN = 7
+MSG_INPUT = 8
+MSG_INPUT_ACK = 9
+
+HEADER = struct.Struct('!IBB')
+PLAYER_ID = struct.Struct('!16s')
+# tick, player count, followed by one player state record per player
+SNAPSHOT = struct.Struct('!IH')
+# id, x, y, health, pseudo length, soldier type length, bullet count
+PLAYER_STATE = struct.Struct('!16sffhBBH')
+# tick, baseline tick, removed player count, changed player count
+DELTA = struct.Struct('!IIHH')
+# id, mask of the fields that follow (see FIELD_*)
+DELTA_PLAYER = struct.Struct('!16sB')
+POSITION = struct.Struct('!ff')
+HEALTH = struct.Struct('!h')
+COUNT = struct.Struct('!H')
+# pseudo length, soldier type length, followed by both strings
+JOIN = struct.Struct('!BB')
+# last applied snapshot tick, input count, followed by the input commands
+INPUT = struct.Struct('!IB')
+# sequence number, buttons (see player_input.BUTTON_*)
+INPUT_COMMAND = struct.Struct('!IB')
+# tick of the snapshot that follows, last input sequence number it includes
+INPUT_ACK = struct.Struct('!II')
+# x, y, direction, id (chosen by the shooter, stable for the bullet's whole flight)
+BULLET = struct.Struct('!ffBH')
+
+# Bullet directions travel as an index into this tuple (SoldierDirection values)
+DIRECTIONS = ('front', 'back', 'left', 'right')
+DIRECTION_CODES = {name: code for code, name in enumerate(DIRECTIONS)}
+
+# Delta snapshots only carry the fields of a player state that changed
+FIELD_POSITION = 1
+FIELD_PSEUDO = 2
+FIELD_SOLDIER_TYPE = 4
+FIELD_HEALTH = 8
+FIELD_BULLETS = 16
+ALL_FIELDS = FIELD_POSITION | FIELD_PSEUDO | FIELD_SOLDIER_TYPE | FIELD_HEALTH | FIELD_BULLETS
+FIELDS = (FIELD_POSITION, FIELD_PSEUDO, FIELD_SOLDIER_TYPE, FIELD_HEALTH, FIELD_BULLETS)
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def _frame(msg_type, payload):
+    if len(payload) > MAX_FRAME_SIZE:
+        raise ProtocolError(f"Frame too large: {len(payload)} bytes")
+    return HEADER.pack(len(payload), PROTOCOL_VERSION, msg_type) + payload
+
+
+@lru_cache(maxsize=ID_CACHE_SIZE)
+def _encode_id(player_id):
+    # Every record of every per-client delta carries ids: parse each uuid once
+    return uuid.UUID(player_id).bytes
+
+
+def _decode_id(raw):
+    return str(uuid.UUID(bytes=bytes(raw)))
+
+
+def _encode_text(text):
+    raw = text.encode('utf-8')
+    if len(raw) > 255:
+        raise ProtocolError(f"String too long: {text!r}")
+    return raw
+
+
+def _encode_bullets(bullets):
+    parts = []
+    for bullet in bullets:
+        x, y, direction, bullet_id = bullet
+        parts.append(BULLET.pack(x, y, DIRECTION_CODES[getattr(direction, 'value', direction)], bullet_id))
+    return b''.join(parts)
+
+
+def _decode_bullets(payload, offset, count):
+    bullets = []
+    for _ in range(count):
+        x, y, code, bullet_id = BULLET.unpack_from(payload, offset)
+        offset += BULLET.size
+        if code >= len(DIRECTIONS):
+            raise ProtocolError(f"Unknown bullet direction: {code}")
+        bullets.append((x, y, DIRECTIONS[code], bullet_id))
+    return bullets, offset
+
+
+def _decode_text(payload, offset, length):
+    end = offset + length
+    if end > len(payload):
+        raise ProtocolError("Truncated string")
+    return bytes(payload[offset:end]).decode('utf-8'), end
+
+
+def encode_init(client_id):
+    return _frame(MSG_INIT, PLAYER_ID.pack(_encode_id(client_id)))
+
+
+def encode_disconnect(client_id):
+    return _frame(MSG_DISCONNECT, PLAYER_ID.pack(_encode_id(client_id)))
+
+
+def _encode_player_state(player_id, position, pseudo, soldier_type, health, bullets):
+    pseudo_raw = _encode_text(pseudo)
+    type_raw = _encode_text(soldier_type)
+    record = PLAYER_STATE.pack(
+        _encode_id(player_id), position[0], position[1], int(health),
+        len(pseudo_raw), len(type_raw), len(bullets)
+    )
+    return record + pseudo_raw + type_raw + _encode_bullets(bullets)
+
+
+def _decode_player_state(payload, offset):
+    raw_id, x, y, health, pseudo_len, type_len, count = PLAYER_STATE.unpack_from(payload, offset)
+    offset += PLAYER_STATE.size
+    pseudo, offset = _decode_text(payload, offset, pseudo_len)
+    soldier_type, offset = _decode_text(payload, offset, type_len)
+    bullets, offset = _decode_bullets(payload, offset, count)
+    return _decode_id(raw_id), ((x, y), pseudo, soldier_type, health, bullets), offset
+
+
+def encode_snapshot(tick, states):
+    # states: iterable of (player_id, position, pseudo, soldier_type, health, bullets)
+    records = [_encode_player_state(*state) for state in states]
+    return _frame(MSG_SNAPSHOT, SNAPSHOT.pack(tick, len(records)) + b''.join(records))
+
+
+def encode_delta(tick, baseline_tick, baseline, states):
+    # baseline and states: {player_id: (position, pseudo, soldier_type, health, bullets)}
+    removed = [player_id for player_id in baseline if player_id not in states]
+    records = []
+    for player_id, state in states.items():
+        previous = baseline.get(player_id)
+        if previous is None:
+            mask = ALL_FIELDS
+        else:
+            mask = 0
+            for field, value, old_value in zip(FIELDS, state, previous):
+                if value != old_value:
+                    mask |= field
+            if not mask:
+                continue
+        position, pseudo, soldier_type, health, bullets = state
+        parts = [DELTA_PLAYER.pack(_encode_id(player_id), mask)]
+        if mask & FIELD_POSITION:
+            parts.append(POSITION.pack(position[0], position[1]))
+        if mask & FIELD_PSEUDO:
+            raw = _encode_text(pseudo)
+            parts.append(bytes((len(raw),)) + raw)
+        if mask & FIELD_SOLDIER_TYPE:
+            raw = _encode_text(soldier_type)
+            parts.append(bytes((len(raw),)) + raw)
+        if mask & FIELD_HEALTH:
+            parts.append(HEALTH.pack(int(health)))
+        if mask & FIELD_BULLETS:
+            parts.append(COUNT.pack(len(bullets)) + _encode_bullets(bullets))
+        records.append(b''.join(parts))
+
+    payload = DELTA.pack(tick, baseline_tick, len(removed), len(records))
+    payload += b''.join(_encode_id(player_id) for player_id in removed)
+    return _frame(MSG_DELTA, payload + b''.join(records))
+
+
+def _decode_delta(payload):
+    tick, baseline_tick, removed_count, changed_count = DELTA.unpack_from(payload)
+    offset = DELTA.size
+    removed = []
+    for _ in range(removed_count):
+        (raw_id,) = PLAYER_ID.unpack_from(payload, offset)
+        offset += PLAYER_ID.size
+        removed.append(_decode_id(raw_id))
+    changes = {}
+    for _ in range(changed_count):
+        raw_id, mask = DELTA_PLAYER.unpack_from(payload, offset)
+        offset += DELTA_PLAYER.size
+        position = pseudo = soldier_type = health = bullets = None
+        if mask & FIELD_POSITION:
+            position = POSITION.unpack_from(payload, offset)
+            offset += POSITION.size
+        if mask & FIELD_PSEUDO:
+            pseudo, offset = _decode_text(payload, offset + 1, payload[offset])
+        if mask & FIELD_SOLDIER_TYPE:
+            soldier_type, offset = _decode_text(payload, offset + 1, payload[offset])
+        if mask & FIELD_HEALTH:
+            (health,) = HEALTH.unpack_from(payload, offset)
+            offset += HEALTH.size
+        if mask & FIELD_BULLETS:
+            (count,) = COUNT.unpack_from(payload, offset)
+            bullets, offset = _decode_bullets(payload, offset + COUNT.size, count)
+        changes[_decode_id(raw_id)] = (mask, (position, pseudo, soldier_type, health, bullets))
+    return ('delta', tick, baseline_tick, removed, changes)
+
+
+def apply_delta(baseline, removed, changes):
+    # Builds the new world from the baseline the server encoded against
+    states = dict(baseline)
+    for player_id in removed:
+        states.pop(player_id, None)
+    for player_id, (mask, values) in changes.items():
+        previous = states.get(player_id)
+        if previous is None:
+            if mask != ALL_FIELDS:
+                raise ProtocolError(f"Partial delta for unknown player {player_id}")
+            states[player_id] = values
+        else:
+            states[player_id] = tuple(
+                value if mask & field else old_value
+                for field, value, old_value in zip(FIELDS, values, previous)
+            )
+    return states
+
+
+def encode_join(pseudo, soldier_type):
+    pseudo_raw = _encode_text(pseudo)
+    type_raw = _encode_text(soldier_type)
+    return _frame(MSG_JOIN, JOIN.pack(len(pseudo_raw), len(type_raw)) + pseudo_raw + type_raw)
+
+
+def encode_input(commands, ack=0):
+    # commands: [(sequence number, buttons)], oldest first
+    if len(commands) > 255:
+        raise ProtocolError(f"Too many input commands: {len(commands)}")
+    payload = INPUT.pack(ack, len(commands))
+    return _frame(MSG_INPUT, payload + b''.join(INPUT_COMMAND.pack(seq, buttons) for seq, buttons in commands))
+
+
+def encode_input_ack(tick, sequence):
+    return _frame(MSG_INPUT_ACK, INPUT_ACK.pack(tick, sequence))
+
+
+def decode_payload(msg_type, payload):
+    # Returns ('init', id), ('disconnect', id),
+    #   ('snapshot', tick, {player_id: (position, pseudo, soldier_type, health, bullets)}),
+    #   ('delta', tick, baseline tick, removed ids, {player_id: (mask, values)}),
+    #   ('input_ack', tick, sequence) or, from clients, a join or input dict
+    try:
+        if msg_type == MSG_INIT or msg_type == MSG_DISCONNECT:
+            (raw_id,) = PLAYER_ID.unpack_from(payload)
+            return ('init' if msg_type == MSG_INIT else 'disconnect', _decode_id(raw_id))
+
+        if msg_type == MSG_SNAPSHOT:
+            tick, count = SNAPSHOT.unpack_from(payload)
+            offset = SNAPSHOT.size
+            states = {}
+            for _ in range(count):
+                player_id, state, offset = _decode_player_state(payload, offset)
+                states[player_id] = state
+            return ('snapshot', tick, states)
+
+        if msg_type == MSG_DELTA:
+            return _decode_delta(payload)
+
+        if msg_type == MSG_INPUT_ACK:
+            tick, sequence = INPUT_ACK.unpack_from(payload)
+            return ('input_ack', tick, sequence)
+
+        if msg_type == MSG_JOIN:
+            pseudo_len, type_len = JOIN.unpack_from(payload)
+            pseudo, offset = _decode_text(payload, JOIN.size, pseudo_len)
+            soldier_type, offset = _decode_text(payload, offset, type_len)
+            return {'pseudo': pseudo, 'soldier_type': soldier_type}
+
+        if msg_type == MSG_INPUT:
+            ack, count = INPUT.unpack_from(payload)
+            offset = INPUT.size
+            commands = []
+            for _ in range(count):
+                commands.append(INPUT_COMMAND.unpack_from(payload, offset))
+                offset += INPUT_COMMAND.size
+            return {'inputs': commands, 'ack': ack}
+    except (struct.error, UnicodeDecodeError, ValueError, IndexError) as e:
+        raise ProtocolError(f"Malformed message of type {msg_type}: {e}") from e
+
+    raise ProtocolError(f"Unknown message type: {msg_type}")
+
+
+class StreamDecoder:
+    # Reassembles frames from a TCP stream: feed it whatever recv() returned,
+    # it keeps partial frames around and returns every complete message.
+    def __init__(self, max_frame_size=MAX_FRAME_SIZE):
+        self.buffer = bytearray()
+        self.max_frame_size = max_frame_size
+
+    def feed(self, data):
+        self.buffer += data
+        messages = []
+        offset = 0
+        while len(self.buffer) - offset >= HEADER.size:
+            length, version, msg_type = HEADER.unpack_from(self.buffer, offset)
+            if version != PROTOCOL_VERSION:
+                raise ProtocolError(f"Unsupported protocol version: {version}")
+            if length > self.max_frame_size:
+                raise ProtocolError(f"Frame too large: {length} bytes")
+            start = offset + HEADER.size
+            end = start + length
+            if end > len(self.buffer):
+                break
+            messages.append(decode_payload(msg_type, bytes(self.buffer[start:end])))
+            offset = end
+        del self.buffer[:offset]
+        return messages
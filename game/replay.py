@@ -0,0 +1,195 @@
+import argparse
+import mmap
+import os
+import queue
+import struct
+import sys
+import threading
+
+# Allow running as a script: python game/replay.py match.replay
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game import protocol
+
+
+# Replay file: every tick's world as the protocol frames the server sends,
+# a full snapshot (keyframe) every KEYFRAME_INTERVAL ticks and a delta
+# against the previous tick in between, then an index of the keyframes.
+#
+#   header  = magic | version | protocol version | tick rate | keyframe interval
+#   frames  = protocol frames (snapshot or delta), back to back
+#   index   = offset of the keyframe of each slot of keyframe_interval ticks (uint64)
+#   trailer = magic | index offset | first tick | last tick
+#
+# The file is only ever appended to while recording. The index is written on
+# close; a file without one (server killed) is still readable, the index is
+# rebuilt by walking the frames once. Slots are counted from the first tick
+# and tick numbers have no gaps (a late TickScheduler runs its ticks later,
+# it never skips a number), so the keyframe of any tick is found in O(1),
+# then at most keyframe_interval - 1 deltas are applied on top of it.
+MAGIC = b'RPLY'
+TRAILER_MAGIC = b'RIDX'
+VERSION = 1
+HEADER = struct.Struct('!4sBBHH')
+TRAILER = struct.Struct('!4sQII')
+INDEX_ENTRY = struct.Struct('!Q')
+KEYFRAME_INTERVAL = 90  # Ticks between two full snapshots, 3 s at 30 Hz
+WRITE_BUFFER = 1 << 20
+
+
+class ReplayRecorder:
+    # record() only queues the tick's world: encoding and writing happen on
+    # a thread of their own, so recording costs the tick one queue.put.
+    # The states handed over must not be modified afterwards (the server
+    # builds a new dict of new tuples every tick).
+    def __init__(self, path, tick_rate, keyframe_interval=KEYFRAME_INTERVAL):
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.file = open(path, 'wb', buffering=WRITE_BUFFER)
+        self.file.write(HEADER.pack(MAGIC, VERSION, protocol.PROTOCOL_VERSION, tick_rate, keyframe_interval))
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._write, daemon=True)
+        self.thread.start()
+
+    def record(self, tick, states):
+        # states: {player_id: (position, pseudo, soldier_type, health, bullets)}
+        self.queue.put((tick, states))
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def _write(self):
+        index = []  # Keyframe offset of each slot
+        first_tick = last_tick = None
+        previous = None  # (tick, states) of the last frame written
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            tick, states = item
+            if first_tick is None:
+                first_tick = tick
+            slot = (tick - first_tick) // self.keyframe_interval
+            if slot >= len(index) or previous is None:
+                # First tick of a new slot: a keyframe, the file is flushed
+                # so a crash loses at most one slot
+                self.file.flush()
+                offset = self.file.tell()
+                while len(index) <= slot:
+                    index.append(offset)
+                frame = protocol.encode_snapshot(tick, ((player_id,) + state for player_id, state in states.items()))
+            else:
+                frame = protocol.encode_delta(tick, previous[0], previous[1], states)
+            self.file.write(frame)
+            previous = (tick, states)
+            last_tick = tick
+
+        index_offset = self.file.tell()
+        for offset in index:
+            self.file.write(INDEX_ENTRY.pack(offset))
+        self.file.write(TRAILER.pack(TRAILER_MAGIC, index_offset, first_tick or 0, last_tick or 0))
+        self.file.close()
+
+
+class ReplayReader:
+    # Memory-mapped playback: nothing is read until a tick is asked for
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, protocol_version, self.tick_rate, self.keyframe_interval = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a replay file")
+        if protocol_version != protocol.PROTOCOL_VERSION:
+            raise ValueError(f"{path} was recorded with protocol version {protocol_version}")
+
+        self.index = None  # Rebuilt index, when the file has none
+        trailer_offset = len(self.data) - TRAILER.size
+        trailer = TRAILER.unpack_from(self.data, trailer_offset) if trailer_offset >= HEADER.size else None
+        if trailer is not None and trailer[0] == TRAILER_MAGIC:
+            _, self.index_offset, self.first_tick, self.last_tick = trailer
+            self.frames_end = self.index_offset
+            self.slots = (trailer_offset - self.index_offset) // INDEX_ENTRY.size
+        else:
+            self._rebuild_index()
+
+    def _rebuild_index(self):
+        self.index = []
+        self.first_tick = self.last_tick = None
+        for offset, end, msg_type, tick in self._frame_headers(HEADER.size, len(self.data)):
+            if self.first_tick is None:
+                self.first_tick = tick
+            if msg_type == protocol.MSG_SNAPSHOT:
+                slot = (tick - self.first_tick) // self.keyframe_interval
+                while len(self.index) <= slot:
+                    self.index.append(offset)
+            self.last_tick = tick
+            self.frames_end = end
+        if self.first_tick is None:
+            raise ValueError("Empty replay")
+        self.slots = len(self.index)
+
+    def _frame_headers(self, offset, end):
+        # (offset, end, type, tick) of each complete frame from offset
+        data = self.data
+        while offset + protocol.HEADER.size + 4 <= end:
+            length, _, msg_type = protocol.HEADER.unpack_from(data, offset)
+            frame_end = offset + protocol.HEADER.size + length
+            if frame_end > end:
+                break  # Cut short by a crash
+            tick, = struct.unpack_from('!I', data, offset + protocol.HEADER.size)
+            yield offset, frame_end, msg_type, tick
+            offset = frame_end
+
+    def keyframe_offset(self, tick):
+        slot = max(0, min(self.slots - 1, (tick - self.first_tick) // self.keyframe_interval))
+        if self.index is not None:
+            return self.index[slot]
+        return INDEX_ENTRY.unpack_from(self.data, self.index_offset + slot * INDEX_ENTRY.size)[0]
+
+    def ticks(self, start=None):
+        # Yields (tick, states) from the last tick <= start (the first tick
+        # by default) to the end of the replay
+        start = self.first_tick if start is None else max(self.first_tick, start)
+        states = None
+        pending = None  # Last world before start, only yielded once we know it is the closest
+        for offset, end, msg_type, tick in self._frame_headers(self.keyframe_offset(start), self.frames_end):
+            message = protocol.decode_payload(msg_type, bytes(self.data[offset + protocol.HEADER.size:end]))
+            if message[0] == 'snapshot':
+                states = message[2]
+            else:
+                states = protocol.apply_delta(states, message[3], message[4])
+            if tick < start:
+                pending = (tick, states)
+                continue
+            if pending is not None and tick > start:
+                yield pending
+            pending = None
+            yield tick, states
+        if pending is not None:  # start is past the end
+            yield pending
+
+    def seek(self, tick):
+        # The world at tick, or at the last tick recorded before it
+        for found in self.ticks(tick):
+            return found
+        return None
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Informations sur un fichier de replay")
+    parser.add_argument('replay')
+    args = parser.parse_args()
+    reader = ReplayReader(args.replay)
+    duration = (reader.last_tick - reader.first_tick) / reader.tick_rate
+    print(f"{args.replay}: ticks {reader.first_tick}-{reader.last_tick} ({duration:.1f} s at {reader.tick_rate} Hz), "
+          f"{reader.slots} keyframes, {os.path.getsize(args.replay) / 1024:.0f} KiB"
+          + ("" if reader.index is None else ", index rebuilt (recording was interrupted)"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# Headless game core: soldiers and projectiles as plain state. Soldiers
+# move one input at a time, projectiles by an explicit timestep. No pygame,
+# no clock, no display, so the server, the bots and the benchmarks can
+# import it and run it faster than real time.
+# game/soldier.py wraps it with sprites and animations for the client.
+from game.player_input import simulate_input, MAX_HEALTH, INPUT_RATE, BULLET_SPEED, DIRECTION_VECTORS
+
+INPUT_STEP = 1.0 / INPUT_RATE  # Seconds simulated by one input
+HIT_RADIUS = 20  # Collision radius between a bullet and a player
+BULLET_DAMAGE = 10
+BULLET_BOUNDS = (-100, 2000)  # Without a collision map, bullets outside this square are gone
+
+
+def move_projectile(x, y, direction, dt, collision=None):
+    # New position after dt seconds, None when the bullet met a wall, left
+    # the map (raycast) or, without collision map, left BULLET_BOUNDS
+    dx, dy = DIRECTION_VECTORS[direction]
+    distance = BULLET_SPEED * dt
+    new_x, new_y = x + dx * distance, y + dy * distance
+    if collision is not None:
+        if collision.raycast(x, y, new_x, new_y) is not None:
+            return None
+    elif not (BULLET_BOUNDS[0] <= new_x <= BULLET_BOUNDS[1] and BULLET_BOUNDS[0] <= new_y <= BULLET_BOUNDS[1]):
+        return None
+    return new_x, new_y
+
+
+def apply_damage(health, amount):
+    return max(0, health - amount)
+
+
+class ProjectileCore:
+    __slots__ = ('x', 'y', 'direction', 'id')
+
+    def __init__(self, x, y, direction, projectile_id=0):
+        self.x = x
+        self.y = y
+        self.direction = direction  # protocol.DIRECTIONS name
+        self.id = projectile_id  # Stable over the network for the bullet's whole flight
+
+    def step(self, dt, collision=None):
+        # False once the bullet is gone
+        position = move_projectile(self.x, self.y, self.direction, dt, collision)
+        if position is None:
+            return False
+        self.x, self.y = position
+        return True
+
+    def to_tuple(self):
+        # As in the snapshots: (x, y, direction, bullet_id)
+        return self.x, self.y, self.direction, self.id
+
+
+class SoldierCore:
+    __slots__ = ('x', 'y', 'health', 'direction', 'cooldown', 'next_bullet_id', 'bullets')
+
+    def __init__(self, x, y, health=MAX_HEALTH, direction='front'):
+        self.x = x
+        self.y = y
+        self.health = health
+        self.direction = direction
+        self.cooldown = 0  # Inputs left before the next shot
+        self.next_bullet_id = 0
+        self.bullets = []  # [ProjectileCore]
+
+    @property
+    def is_dead(self):
+        return self.health <= 0
+
+    def apply_input(self, buttons, collision=None, map_size=None):
+        # One input, same rules as the server (simulate_input). Returns the
+        # projectile fired, if any.
+        self.x, self.y, self.health, self.direction, self.cooldown, fired = simulate_input(
+            self.x, self.y, self.health, self.direction, self.cooldown, buttons, collision, map_size
+        )
+        return self.fire() if fired else None
+
+    def fire(self):
+        projectile = ProjectileCore(self.x, self.y, self.direction, self.next_bullet_id)
+        self.next_bullet_id = (self.next_bullet_id + 1) % 65536
+        self.bullets.append(projectile)
+        return projectile
+
+    def step_projectiles(self, dt, collision=None):
+        if self.bullets:
+            self.bullets = [projectile for projectile in self.bullets if projectile.step(dt, collision)]
+
+    def step_input(self, buttons, bullet_dt=INPUT_STEP, collision=None, map_size=None):
+        # A whole input frame: the input, then bullet_dt seconds of bullet
+        # flight. Movement and cooldown count inputs like the server does
+        # (simulate_input), not seconds, so only the bullets use bullet_dt.
+        fired = self.apply_input(buttons, collision, map_size)
+        self.step_projectiles(bullet_dt, collision)
+        return fired
+
+    def take_damage(self, amount):
+        self.health = apply_damage(self.health, amount)
+
+    def reconcile(self, position, health, pending, collision=None, map_size=None):
+        # Start again from the state the server computed, then replay the
+        # inputs it had not simulated yet. Only position and health come
+        # from the server, bullets and cooldown stay predicted locally.
+        x, y = position
+        direction = self.direction
+        for _, buttons in pending:
+            x, y, health, direction, _, _ = simulate_input(x, y, health, direction, 0, buttons, collision, map_size)
+        self.x, self.y, self.health = x, y, health
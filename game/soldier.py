@@ -1,7 +1,38 @@
 import pygame
-import os
 from enum import Enum
 
+from game.sprite_cache import sprite_cache
+from game.text_cache import text_cache
+from game.simulation import SoldierCore, ProjectileCore, INPUT_STEP
+from game.player_input import (
+    BUTTON_LEFT, BUTTON_RIGHT, BUTTON_UP, BUTTON_DOWN, BUTTON_SHOOT, BUTTON_RESPAWN
+)
+
+MOVE_BUTTONS = BUTTON_LEFT | BUTTON_RIGHT | BUTTON_UP | BUTTON_DOWN
+
+
+def core_attribute(name):
+    # Attribute of the sprite that lives in its headless core (game/simulation.py)
+    return property(lambda self: getattr(self.core, name), lambda self, value: setattr(self.core, name, value))
+
+
+def buttons_from_keys(keys):
+    # The input command sent to the server for this frame
+    buttons = 0
+    if keys[pygame.K_LEFT]:
+        buttons |= BUTTON_LEFT
+    if keys[pygame.K_RIGHT]:
+        buttons |= BUTTON_RIGHT
+    if keys[pygame.K_UP]:
+        buttons |= BUTTON_UP
+    if keys[pygame.K_DOWN]:
+        buttons |= BUTTON_DOWN
+    if keys[pygame.K_SPACE]:
+        buttons |= BUTTON_SHOOT
+    if keys[pygame.K_r]:
+        buttons |= BUTTON_RESPAWN
+    return buttons
+
 
 class SoldierState(Enum):
     IDLE = "Idle"
@@ -21,60 +52,42 @@ class SoldierDirection(Enum):
 
 
 class Bullet:
-    def __init__(self, x, y, direction):
-        self.x = x
-        self.y = y
+    # Sprite of a ProjectileCore: the position and the flight are the core's
+    x = core_attribute('x')
+    y = core_attribute('y')
+    id = core_attribute('id')
+
+    def __init__(self, x, y, direction, bullet_id=0):
+        self.core = ProjectileCore(x, y, direction.value, bullet_id)
         self.direction = direction
-        self.speed = 10
         self.images = []
         self.animation_frame = 0
         self.animation_timer = 0
         self.animation_delay = 50
+        self.scale_factor = 0.3
         self.load_images()
         
     def load_images(self):
-        # Get the absolute path of the current file
-        current_file_path = os.path.abspath(__file__)
-        # Go up two directories to reach the multiplayer directory
-        multiplayer_dir = os.path.dirname(os.path.dirname(current_file_path))
-        # Construct the path to the assets directory
-        base_path = os.path.join(multiplayer_dir, 'assets', 'Objects', 'Bullet')
-        
-        # Verify the directory exists
-        if not os.path.exists(base_path):
-            print(f"Bullet assets directory not found: {base_path}")
-            return
-        
+        # Frames are shared by every bullet through the sprite cache
         prefix = "Horizontal" if self.direction in [SoldierDirection.LEFT, SoldierDirection.RIGHT] else "Vertical"
-        for i in range(1, 11):
-            try:
-                image_path = os.path.join(base_path, f"{prefix} ({i}).png")
-                image = pygame.image.load(image_path).convert_alpha()
-                image.set_colorkey((0, 0, 0))
-                # Scale up the image
-                scale_factor = 0.3  # Increased from 0.1 to 0.3
-                new_size = (
-                    int(image.get_width() * scale_factor),
-                    int(image.get_height() * scale_factor)
-                )
-                image = pygame.transform.scale(image, new_size)
-                self.images.append(image)
-            except Exception as e:
-                print(f"Error loading bullet image {i}: {str(e)}")
-                break
-
-    def update(self):
-        # Update position based on direction
-        if self.direction == SoldierDirection.LEFT:
-            self.x -= self.speed
-        elif self.direction == SoldierDirection.RIGHT:
-            self.x += self.speed
-        elif self.direction == SoldierDirection.BACK:
-            self.y -= self.speed
-        elif self.direction == SoldierDirection.FRONT:
-            self.y += self.speed
+        self.images = sprite_cache.bullet_frames(prefix, self.scale_factor)
 
-        # Update animation
+    def reset(self, x, y, direction, bullet_id=0):
+        # Reuse this object for another bullet (see BulletPool)
+        self.core.x, self.core.y, self.core.direction, self.core.id = x, y, direction.value, bullet_id
+        if direction != self.direction:
+            self.direction = direction
+            self.load_images()
+        self.animation_frame = 0
+        self.animation_timer = 0
+
+    def update(self, dt=INPUT_STEP, collision=None):
+        # False once the bullet is gone (see ProjectileCore.step)
+        alive = self.core.step(dt, collision)
+        self.animate()
+        return alive
+
+    def animate(self):
         current_time = pygame.time.get_ticks()
         if current_time - self.animation_timer > self.animation_delay:
             self.animation_timer = current_time
@@ -89,103 +102,82 @@ class Bullet:
             screen.blit(current_image, (draw_x, draw_y))
 
 
+class BulletPool:
+    # Preallocated bullets for remote soldiers, so heavy fire doesn't create
+    # and drop Bullet objects every frame
+    def __init__(self, size=256):
+        self.free = [Bullet(0, 0, SoldierDirection.FRONT) for _ in range(size)]
+
+    def acquire(self, x, y, direction, bullet_id=0):
+        if not self.free:
+            return Bullet(x, y, direction, bullet_id)
+        bullet = self.free.pop()
+        bullet.reset(x, y, direction, bullet_id)
+        return bullet
+
+    def release(self, bullet):
+        self.free.append(bullet)
+
+
 class Soldier:
+    # Sprites and animations around a SoldierCore, which holds everything
+    # the simulation needs (position, health, cooldown, bullets)
+    x = core_attribute('x')
+    y = core_attribute('y')
+    health = core_attribute('health')
+    shoot_cooldown = core_attribute('cooldown')  # Inputs left before the next shot
+    next_bullet_id = core_attribute('next_bullet_id')
+
     def __init__(self, x, y, soldier_type, name):
-        self.x = x
-        self.y = y
+        self.core = SoldierCore(x, y)
         self.soldier_type = soldier_type
         self.name = name
         self.state = SoldierState.IDLE
-        self.direction = SoldierDirection.FRONT
         self.animation_frame = 0
         self.animation_timer = 0
         self.animation_delay = 100  # milliseconds between frames
         self.images = {}
         self.scale_factor = 0.1  # Scale down to 40% of original size
-        self.bullets = []
-        self.shoot_cooldown = 0
-        self.shoot_delay = 500  # milliseconds between shots
-        self.max_health = 100
-        self.health = self.max_health
+        self.bullets = []  # Sprites of self.core.bullets, in the same order
+        self.max_health = self.core.health
         self.is_dead = False
         self.load_animations()
 
+    @property
+    def direction(self):
+        return SoldierDirection(self.core.direction)
+
+    @direction.setter
+    def direction(self, direction):
+        self.core.direction = direction.value
+
     def load_animations(self):
-        # Handle case sensitivity for soldier type
-        soldier_folder = "rogue" if self.soldier_type.lower() == "rogue" else "falcon"
-        
-        # Get the absolute path of the current file
-        current_file_path = os.path.abspath(__file__)
-        
-        # Go up two directories to reach the multiplayer directory
-        multiplayer_dir = os.path.dirname(os.path.dirname(current_file_path))
-        
-        # Construct the path to the assets directory
-        base_path = os.path.join(multiplayer_dir, 'assets', 'soldiers', soldier_folder)
-        
-        # Verify the directory exists
-        if not os.path.exists(base_path):
-            print(f"Soldier assets directory not found: {base_path}")
-            return
-        
+        # Frames are shared by every soldier of this type through the sprite cache
         for direction in SoldierDirection:
             self.images[direction] = {}
             for state in SoldierState:
-                self.images[direction][state] = []
-                # Load all frames for this state and direction
-                frame_count = 4 if state != SoldierState.DEAD else 5
-                for i in range(1, frame_count + 1):
-                    try:
-                        image_path = os.path.join(
-                            base_path, 
-                            direction.value, 
-                            f"{state.value} ({i}).png"
-                        )
-                        
-                        # Load and convert image with alpha channel
-                        image = pygame.image.load(image_path).convert_alpha()
-                        # Remove black background
-                        image.set_colorkey((0, 0, 0))
-                        # Scale down the image
-                        new_size = (
-                            int(image.get_width() * self.scale_factor),
-                            int(image.get_height() * self.scale_factor)
-                        )
-                        image = pygame.transform.scale(image, new_size)
-                        # Flip sprites to face the correct direction
-                        if direction in [SoldierDirection.LEFT, SoldierDirection.RIGHT]:
-                            image = pygame.transform.flip(image, True, False)
-                        self.images[direction][state].append(image)
-                    except Exception as e:
-                        print(f"Error loading image for {state.value} {direction.value} frame {i}: {str(e)}")
-                        continue
-
-    def update(self, keys, other_soldiers=None):
+                self.images[direction][state] = sprite_cache.soldier_frames(
+                    self.soldier_type, direction, state, self.scale_factor
+                )
+
+    def update(self, buttons, other_soldiers=None, collision=None, map_size=None, dt=INPUT_STEP):
+        # One input step, predicted with the same simulate_input the server
+        # runs, then dt seconds of bullet flight
+        was_dead = self.core.is_dead
+        fired = self.core.apply_input(buttons, collision, map_size)
+        if fired is not None:
+            self.add_bullet(fired)
+        self.step_bullets(dt, collision)
+
         # Skip update if dead
-        if self.health <= 0:
+        if self.core.is_dead:
             self.state = SoldierState.DEAD
             self.is_dead = True
             return
-        
-        # Update position based on keys
-        if keys[pygame.K_LEFT]:
-            self.x -= 5
-            self.direction = SoldierDirection.LEFT
-            self.state = SoldierState.WALK
-        elif keys[pygame.K_RIGHT]:
-            self.x += 5
-            self.direction = SoldierDirection.RIGHT
-            self.state = SoldierState.WALK
-        elif keys[pygame.K_UP]:
-            self.y -= 5
-            self.direction = SoldierDirection.BACK
-            self.state = SoldierState.WALK
-        elif keys[pygame.K_DOWN]:
-            self.y += 5
-            self.direction = SoldierDirection.FRONT
-            self.state = SoldierState.WALK
-        else:
-            self.state = SoldierState.IDLE
+        if was_dead:  # Respawned
+            self.is_dead = False
+
+        self.state = SoldierState.WALK if buttons & MOVE_BUTTONS else SoldierState.IDLE
 
         # Update animation
         current_time = pygame.time.get_ticks()
@@ -197,38 +189,70 @@ class Soldier:
                 if frames:  # Only update if we have frames for this state
                     self.animation_frame = (self.animation_frame + 1) % len(frames)
 
-        # Handle shooting
-        if keys[pygame.K_SPACE] and self.shoot_cooldown <= 0:
-            self.shoot()
-            self.shoot_cooldown = self.shoot_delay
+        # Handle shooting (the cooldown is counted in inputs, see simulate_input)
+        if fired is not None:
+            self.show_shot()
 
-        # Update shoot cooldown
-        if self.shoot_cooldown > 0:
-            self.shoot_cooldown -= pygame.time.get_ticks() - self.animation_timer
+    def step_bullets(self, dt, collision=None):
+        # The core moves the bullets and drops the ones that hit a wall or
+        # left the map, the sprites follow
+        self.core.step_projectiles(dt, collision)
+        if len(self.bullets) != len(self.core.bullets):
+            alive = set(map(id, self.core.bullets))
+            self.bullets = [bullet for bullet in self.bullets if id(bullet.core) in alive]
+        for bullet in self.bullets:
+            bullet.animate()
 
-        # Update bullets
-        for bullet in self.bullets[:]:
-            bullet.update()
-            
-            # Remove bullets that are off screen
-            if (bullet.x < -100 or bullet.x > 2000 or 
-                bullet.y < -100 or bullet.y > 2000):
-                self.bullets.remove(bullet)
+    def add_bullet(self, projectile):
+        # Sprite for a bullet the core fired
+        bullet = Bullet(projectile.x, projectile.y, self.direction, projectile.id)
+        bullet.core = projectile
+        self.bullets.append(bullet)
 
     def shoot(self):
-        # Create a new bullet based on the soldier's direction
-        bullet = Bullet(self.x, self.y, self.direction)
-        self.bullets.append(bullet)
-        
+        self.add_bullet(self.core.fire())
+        self.show_shot()
+
+    def show_shot(self):
         # Only change to SHOOT state if we have animation frames for it
         if (self.direction in self.images and 
             SoldierState.SHOOT in self.images[self.direction] and 
             self.images[self.direction][SoldierState.SHOOT]):
             self.state = SoldierState.SHOOT
 
+    def reconcile(self, position, health, pending, collision=None, map_size=None):
+        # See SoldierCore.reconcile, our own bullets stay predicted locally
+        self.core.reconcile(position, health, pending, collision, map_size)
+
+    def sync_bullets(self, bullets_data, pool):
+        # Remote soldiers: reconcile our bullets with the ones from the network
+        # by id, so a bullet keeps its object and animation across frames
+        current = {bullet.id: bullet for bullet in self.bullets}
+        self.bullets.clear()
+        for x, y, direction, bullet_id in bullets_data:
+            bullet = current.pop(bullet_id, None)
+            if bullet is None or bullet.core.direction != direction:
+                if bullet is not None:
+                    pool.release(bullet)
+                bullet = pool.acquire(x, y, SoldierDirection(direction), bullet_id)
+            else:
+                bullet.x = x
+                bullet.y = y
+            bullet.animate()
+            self.bullets.append(bullet)
+        self.core.bullets = [bullet.core for bullet in self.bullets]
+        for bullet in current.values():
+            pool.release(bullet)
+
+    def release_bullets(self, pool):
+        for bullet in self.bullets:
+            pool.release(bullet)
+        self.bullets.clear()
+        self.core.bullets = []
+
     def take_damage(self, amount):
-        self.health = max(0, self.health - amount)
-        if self.health <= 0:
+        self.core.take_damage(amount)
+        if self.core.is_dead:
             self.state = SoldierState.DEAD
             self.is_dead = True
 
@@ -271,8 +295,7 @@ class Soldier:
                 
                 # Draw name above soldier (only if alive)
                 if self.health > 0:
-                    font = pygame.font.Font(None, 28)
-                    label = font.render(self.name, True, (255, 255, 255))
+                    label = text_cache.render(self.name, 28, (255, 255, 255))
                     label_x = draw_x + current_image.get_width() // 2 - label.get_width() // 2
                     label_y = draw_y - 20
                     screen.blit(label, (label_x, label_y))
@@ -0,0 +1,66 @@
+class SpatialHash:
+    # Uniform grid over the map. Items live in the cell containing their
+    # position, points outside the map are clamped to the border cells so
+    # queries stay correct for anything that wandered off the edges.
+    def __init__(self, cell_size, width, height):
+        self.cell_size = cell_size
+        self.columns = max(1, -(-int(width) // cell_size))
+        self.rows = max(1, -(-int(height) // cell_size))
+        self.cells = {}  # {cell index: {item: (x, y)}}
+        self.item_cells = {}  # {item: cell index}
+
+    def _column(self, x):
+        return min(self.columns - 1, max(0, int(x // self.cell_size)))
+
+    def _row(self, y):
+        return min(self.rows - 1, max(0, int(y // self.cell_size)))
+
+    def cell_index(self, x, y):
+        return self._row(y) * self.columns + self._column(x)
+
+    def __len__(self):
+        return len(self.item_cells)
+
+    def __contains__(self, item):
+        return item in self.item_cells
+
+    def items(self):
+        return self.item_cells.keys()
+
+    def clear(self):
+        self.cells.clear()
+        self.item_cells.clear()
+
+    def move(self, item, x, y):
+        # Insert or move an item, only touches the buckets if it changed cell
+        index = self.cell_index(x, y)
+        previous = self.item_cells.get(item)
+        if previous is not None and previous != index:
+            bucket = self.cells[previous]
+            del bucket[item]
+            if not bucket:
+                del self.cells[previous]
+        self.item_cells[item] = index
+        self.cells.setdefault(index, {})[item] = (x, y)
+
+    def remove(self, item):
+        index = self.item_cells.pop(item, None)
+        if index is None:
+            return
+        bucket = self.cells[index]
+        del bucket[item]
+        if not bucket:
+            del self.cells[index]
+
+    def query(self, x, y, radius):
+        # Broad phase: every item in the cells overlapped by the circle's
+        # bounding box, as (item, x, y). The caller does the exact test.
+        found = []
+        for row in range(self._row(y - radius), self._row(y + radius) + 1):
+            base = row * self.columns
+            for column in range(self._column(x - radius), self._column(x + radius) + 1):
+                bucket = self.cells.get(base + column)
+                if bucket:
+                    for item, (item_x, item_y) in bucket.items():
+                        found.append((item, item_x, item_y))
+        return found
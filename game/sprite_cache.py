@@ -0,0 +1,123 @@
+import pygame
+import os
+from collections import OrderedDict
+
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets')
+
+
+class SpriteCache:
+    # Process-wide cache of loaded, converted and scaled animation frames.
+    # Entries are tuples shared read-only by every Soldier and Bullet, so only
+    # the first instance of a kind pays for the disk reads. With max_bytes set,
+    # the least recently used entries are dropped once the estimated pixel
+    # memory goes over the budget (instances keep the frames they hold).
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # {key: (frames, size in bytes)}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, loader):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[0]
+
+        self.misses += 1
+        frames = tuple(loader())
+        size = sum(frame.get_width() * frame.get_height() * frame.get_bytesize() for frame in frames)
+        self.entries[key] = (frames, size)
+        self.total_bytes += size
+        if self.max_bytes is not None:
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+        return frames
+
+    def clear(self):
+        self.entries.clear()
+        self.total_bytes = 0
+
+    def soldier_frames(self, soldier_type, direction, state, scale):
+        # Handle case sensitivity for soldier type
+        soldier_folder = "rogue" if soldier_type.lower() == "rogue" else "falcon"
+        return self.get(
+            ('soldier', soldier_folder, direction, state, scale),
+            lambda: _load_soldier_frames(soldier_folder, direction, state, scale)
+        )
+
+    def bullet_frames(self, orientation, scale):
+        # orientation: "Horizontal" or "Vertical"
+        return self.get(
+            ('bullet', orientation, scale),
+            lambda: _load_bullet_frames(orientation, scale)
+        )
+
+
+def _load_soldier_frames(soldier_folder, direction, state, scale):
+    base_path = os.path.join(ASSETS_DIR, 'soldiers', soldier_folder)
+
+    # Verify the directory exists
+    if not os.path.exists(base_path):
+        print(f"Soldier assets directory not found: {base_path}")
+        return []
+
+    frames = []
+    # Load all frames for this state and direction
+    frame_count = 4 if state.value != "Dead" else 5
+    for i in range(1, frame_count + 1):
+        try:
+            image_path = os.path.join(base_path, direction.value, f"{state.value} ({i}).png")
+
+            # Load and convert image with alpha channel
+            image = pygame.image.load(image_path).convert_alpha()
+            # Remove black background
+            image.set_colorkey((0, 0, 0))
+            # Scale down the image
+            new_size = (
+                int(image.get_width() * scale),
+                int(image.get_height() * scale)
+            )
+            image = pygame.transform.scale(image, new_size)
+            # Flip sprites to face the correct direction
+            if direction.value in ("left", "right"):
+                image = pygame.transform.flip(image, True, False)
+            frames.append(image)
+        except Exception as e:
+            print(f"Error loading image for {state.value} {direction.value} frame {i}: {str(e)}")
+            continue
+    return frames
+
+
+def _load_bullet_frames(orientation, scale):
+    base_path = os.path.join(ASSETS_DIR, 'Objects', 'Bullet')
+
+    # Verify the directory exists
+    if not os.path.exists(base_path):
+        print(f"Bullet assets directory not found: {base_path}")
+        return []
+
+    frames = []
+    for i in range(1, 11):
+        try:
+            image_path = os.path.join(base_path, f"{orientation} ({i}).png")
+            image = pygame.image.load(image_path).convert_alpha()
+            image.set_colorkey((0, 0, 0))
+            # Scale up the image
+            new_size = (
+                int(image.get_width() * scale),
+                int(image.get_height() * scale)
+            )
+            image = pygame.transform.scale(image, new_size)
+            frames.append(image)
+        except Exception as e:
+            print(f"Error loading bullet image {i}: {str(e)}")
+            break
+    return frames
+
+
+# Shared by the whole process
+sprite_cache = SpriteCache()
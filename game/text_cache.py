@@ -0,0 +1,52 @@
+import pygame
+from collections import OrderedDict
+
+
+class TextCache:
+    # Rendered text surfaces keyed by (font, size, text, color, antialias).
+    # Labels that don't change (player names, buttons, game over) are rendered
+    # once and then only blitted. Font handles are opened once per (font, size)
+    # and kept for the whole process; surfaces are dropped least recently used
+    # first when there are more than max_entries of them.
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self.fonts = {}  # {(font name, size): pygame.font.Font}
+        self.surfaces = OrderedDict()  # {(font name, size, text, color, antialias): Surface}
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, size, name=None):
+        key = (name, size)
+        handle = self.fonts.get(key)
+        if handle is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            handle = pygame.font.Font(name, size)
+            self.fonts[key] = handle
+        return handle
+
+    def preload(self, sizes, name=None):
+        for size in sizes:
+            self.font(size, name)
+
+    def render(self, text, size, color, name=None, antialias=True):
+        key = (name, size, text, tuple(color), antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = self.font(size, name).render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+
+# Shared by the whole process
+text_cache = TextCache()
@@ -0,0 +1,71 @@
+import time
+from collections import deque
+
+
+class TickScheduler:
+    # Runs a tick function at a fixed rate. Ticks are scheduled on an absolute
+    # timeline (next_tick += interval) so small delays don't accumulate. When a
+    # tick overruns so badly that we are more than one interval late, missed
+    # ticks are dropped instead of being replayed back to back.
+    def __init__(self, rate, history=300, clock=time.perf_counter):
+        self.rate = rate
+        self.interval = 1.0 / rate
+        self.clock = clock
+        self.tick = 0
+        self.next_tick = None
+        self.durations = deque(maxlen=history)  # seconds, last ticks only
+        self.overruns = 0  # ticks that took longer than one interval
+        self.skipped = 0   # ticks dropped to catch up
+        self.late = 0.0    # how late the last tick started, in seconds
+
+    def time_until_next(self):
+        if self.next_tick is None:
+            return 0.0
+        return max(0.0, self.next_tick - self.clock())
+
+    def run_pending(self, tick_fn):
+        # Run at most one tick if it is due, returns True if a tick ran
+        now = self.clock()
+        if self.next_tick is None:
+            self.next_tick = now
+        if now < self.next_tick:
+            return False
+
+        self.late = now - self.next_tick
+        self.tick += 1
+        tick_fn(self.tick)
+        duration = self.clock() - now
+        self.durations.append(duration)
+        if duration > self.interval:
+            self.overruns += 1
+
+        self.next_tick += self.interval
+        behind = self.clock() - self.next_tick
+        if behind > self.interval:
+            missed = int(behind / self.interval)
+            self.skipped += missed
+            self.next_tick += missed * self.interval
+        return True
+
+    def run_forever(self, tick_fn, stop_event=None):
+        while stop_event is None or not stop_event.is_set():
+            self.run_pending(tick_fn)
+            time.sleep(self.time_until_next())
+
+    def stats(self):
+        durations = sorted(self.durations)
+        if durations:
+            average = sum(durations) / len(durations)
+            p99 = durations[min(len(durations) - 1, int(len(durations) * 0.99))]
+            worst = durations[-1]
+        else:
+            average = p99 = worst = 0.0
+        return {
+            'tick': self.tick,
+            'rate': self.rate,
+            'avg_ms': average * 1000,
+            'p99_ms': p99 * 1000,
+            'max_ms': worst * 1000,
+            'overruns': self.overruns,
+            'skipped': self.skipped,
+        }
@@ -0,0 +1,295 @@
+import heapq
+import random
+import socket
+import struct
+import threading
+import time
+from collections import deque
+
+from game import protocol
+
+
+# UDP datagrams carry whole protocol frames behind a small header:
+#
+#   header = kind (uint8) | sequence number (uint32)
+#
+# Unreliable packets (ticks: snapshots, deltas, inputs) are sequenced: a
+# packet older than the newest one received is stale and dropped. Reliable
+# packets (init, join, disconnect) are numbered separately, acknowledged
+# with a cumulative ack and sent again until they are, and delivered in
+# order. Nothing on the unreliable side ever waits for a lost packet.
+# Damage has no reliable event: health is a field of every snapshot, and
+# deltas are encoded against a tick the client acked, so the next delta
+# after a lost one carries the health change again.
+PACKET = struct.Struct('!BI')
+PACKET_UNRELIABLE = 0
+PACKET_RELIABLE = 1
+PACKET_ACK = 2  # sequence = every reliable packet up to it was received
+
+MAX_DATAGRAM = 65507
+MAX_PAYLOAD = 1200  # Bytes per datagram that cross a usual path MTU without IP fragmentation
+RESEND_INTERVAL = 0.1  # Seconds without ack before a reliable packet goes again
+PEER_TIMEOUT = 5.0  # Seconds of silence before a UDP peer counts as gone
+CONNECT_TIMEOUT = 2.0  # Seconds the client waits for its init over UDP before falling back to TCP
+CLOSE_LINGER = 1.0  # Seconds a closing UDP client keeps resending its unacked reliable packets
+OUTBOUND_FRAMES = 8  # Frames queued per TCP client before stale snapshots are dropped
+
+
+class NetworkConditions:
+    # Simulated loss, latency and jitter on outgoing datagrams, to test the
+    # UDP transport on localhost. Delayed packets wait in a heap until
+    # flush() sends them, jitter can deliver them out of order.
+    def __init__(self, loss=0.0, latency=0.0, jitter=0.0, seed=None):
+        self.loss = loss
+        self.latency = latency
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.queue = []  # [(due time, order, packet, address)]
+        self.order = 0
+        self.lock = threading.Lock()
+
+    def sendto(self, sock, packet, address):
+        with self.lock:
+            if self.loss and self.random.random() < self.loss:
+                return
+            if not self.latency and not self.jitter:
+                sock.sendto(packet, address)
+                return
+            due = time.perf_counter() + self.latency + self.random.uniform(0, self.jitter)
+            self.order += 1
+            heapq.heappush(self.queue, (due, self.order, packet, address))
+
+    def flush(self, sock):
+        now = time.perf_counter()
+        with self.lock:
+            while self.queue and self.queue[0][0] <= now:
+                _, _, packet, address = heapq.heappop(self.queue)
+                try:
+                    sock.sendto(packet, address)
+                except OSError:
+                    pass
+
+
+class OutboundQueue:
+    # Frames waiting to be written to one TCP client, bounded. Snapshot
+    # frames (reliable=False) are deltas against a tick the client acked,
+    # so any one of them can be applied without the ones before: when the
+    # queue is full, the queued snapshots are dropped for the newest one.
+    # A client that reads slowly gets fewer, newer snapshots rather than a
+    # growing backlog. Reliable frames (init, disconnect) are always kept.
+    # behind_since tells how long the client has been unable to keep up.
+    def __init__(self, max_frames=OUTBOUND_FRAMES):
+        self.max_frames = max_frames
+        self.frames = deque()  # [(frame, reliable)]
+        self.condition = threading.Condition()
+        self.behind_since = None  # When the queue overflowed, None once drained
+        self.replaced = 0  # Snapshots dropped for a newer one
+        self.closed = False
+
+    def __len__(self):
+        return len(self.frames)
+
+    def put(self, frame, reliable=False, now=None):
+        with self.condition:
+            if len(self.frames) >= self.max_frames:
+                if not reliable:
+                    kept = deque(entry for entry in self.frames if entry[1])
+                    self.replaced += len(self.frames) - len(kept)
+                    self.frames = kept
+                if self.behind_since is None:
+                    self.behind_since = time.perf_counter() if now is None else now
+            self.frames.append((frame, reliable))
+            self.condition.notify()
+
+    def take(self):
+        # Everything queued as one buffer, b'' if nothing is. Taking a full
+        # queue doesn't count as catching up: the writer is still behind.
+        with self.condition:
+            if len(self.frames) < self.max_frames:
+                self.behind_since = None
+            data = b''.join(frame for frame, _ in self.frames)
+            self.frames.clear()
+            return data
+
+    def wait(self):
+        # Blocking take() for a writer thread, None once closed
+        with self.condition:
+            while not self.frames and not self.closed:
+                self.condition.wait()
+            if self.closed:
+                return None
+        return self.take()
+
+    def behind_for(self, now):
+        return 0.0 if self.behind_since is None else now - self.behind_since
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class UdpPeer:
+    # One end of a UDP "connection": sequencing, acks and resends for the
+    # remote address. The server keeps one per client on its single socket.
+    def __init__(self, sock, address, conditions=None):
+        self.sock = sock
+        self.address = address
+        self.conditions = conditions
+        self.lock = threading.Lock()  # Client: the game loop sends, the receive thread acks
+        self.client_id = None
+        self.last_heard = time.perf_counter()
+
+        self.send_sequence = 0  # Last unreliable packet sent
+        self.receive_sequence = 0  # Newest unreliable packet received
+        self.reliable_sequence = 0  # Last reliable packet sent
+        self.unacked = {}  # {sequence: [packet, last sent]}
+        self.reliable_received = 0  # Every reliable packet up to this one was delivered
+        self.out_of_order = {}  # {sequence: payload} received ahead of a missing one
+        self.decoder = protocol.StreamDecoder()  # The reliable channel is an ordered stream
+        self.stale = 0  # Unreliable packets dropped because a newer one was already there
+        self.resent = 0
+        self.oversized = 0  # Frames too big for one datagram, sent over the reliable channel instead
+
+    def _sendto(self, packet):
+        try:
+            if self.conditions is not None:
+                self.conditions.sendto(self.sock, packet, self.address)
+            else:
+                self.sock.sendto(packet, self.address)
+        except OSError:  # Too big for a datagram, or unreachable
+            return False
+        return True
+
+    def send(self, data, reliable=False):
+        # An unreliable packet must fit in one datagram (see fits()). The
+        # reliable channel is a stream, split in MAX_PAYLOAD chunks that
+        # the other end joins back in order.
+        with self.lock:
+            if not reliable:
+                self.send_sequence += 1
+                packets = [PACKET.pack(PACKET_UNRELIABLE, self.send_sequence) + data]
+            else:
+                packets = []
+                now = time.perf_counter()
+                for start in range(0, max(1, len(data)), MAX_PAYLOAD):
+                    self.reliable_sequence += 1
+                    packet = PACKET.pack(PACKET_RELIABLE, self.reliable_sequence) + data[start:start + MAX_PAYLOAD]
+                    self.unacked[self.reliable_sequence] = [packet, now]
+                    packets.append(packet)
+        sent = True
+        for packet in packets:
+            sent = self._sendto(packet) and sent
+        return sent
+
+    @staticmethod
+    def fits(data):
+        # Whether data can go unreliable, as one unfragmented datagram
+        return len(data) <= MAX_PAYLOAD
+
+    def receive(self, packet):
+        # Returns the protocol messages this datagram delivers, maybe none
+        kind, sequence = PACKET.unpack_from(packet)
+        payload = packet[PACKET.size:]
+        self.last_heard = time.perf_counter()
+
+        if kind == PACKET_ACK:
+            with self.lock:
+                for acked in [s for s in self.unacked if s <= sequence]:
+                    del self.unacked[acked]
+            return []
+
+        if kind == PACKET_UNRELIABLE:
+            if sequence <= self.receive_sequence:
+                self.stale += 1
+                return []
+            self.receive_sequence = sequence
+            # Each datagram holds whole frames, decoded on their own
+            return protocol.StreamDecoder().feed(payload)
+
+        if kind == PACKET_RELIABLE:
+            if sequence > self.reliable_received:
+                self.out_of_order[sequence] = payload
+            delivered = []
+            while self.reliable_received + 1 in self.out_of_order:
+                self.reliable_received += 1
+                delivered.append(self.out_of_order.pop(self.reliable_received))
+            # Acked every time, our previous ack may have been lost
+            self._sendto(PACKET.pack(PACKET_ACK, self.reliable_received))
+            return self.decoder.feed(b''.join(delivered)) if delivered else []
+
+        raise protocol.ProtocolError(f"Unknown packet kind: {kind}")
+
+    def resend(self, now):
+        with self.lock:
+            late = [entry for entry in self.unacked.values() if now - entry[1] >= RESEND_INTERVAL]
+            for entry in late:
+                entry[1] = now
+        for packet, _ in late:
+            self.resent += 1
+            self._sendto(packet)
+
+
+class TcpConnection:
+    # Client side of the TCP transport, the original one
+    def __init__(self, host, port):
+        self.sock = socket.create_connection((host, port))
+        self.decoder = protocol.StreamDecoder()
+
+    def send(self, data, reliable=False):
+        # Everything is reliable over TCP
+        self.sock.sendall(data)
+
+    def receive(self):
+        # Messages received, None once the server closed the connection
+        data = self.sock.recv(4096)
+        if not data:
+            return None
+        return self.decoder.feed(data)
+
+    def close(self, linger=0.0):
+        self.sock.close()
+
+
+class UdpConnection:
+    # Client side of the UDP transport
+    def __init__(self, host, port, conditions=None):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.settimeout(0.005)  # receive() also drives resends and delayed packets
+        self.conditions = conditions
+        self.peer = UdpPeer(self.sock, (socket.gethostbyname(host), port), conditions)
+
+    def send(self, data, reliable=False):
+        if not self.peer.send(data, reliable):
+            raise socket.error(f"Could not send {len(data)} bytes over UDP")
+
+    def receive(self):
+        now = time.perf_counter()
+        self.peer.resend(now)
+        if self.conditions is not None:
+            self.conditions.flush(self.sock)
+        try:
+            packet, address = self.sock.recvfrom(MAX_DATAGRAM)
+        except socket.timeout:
+            return []
+        except ConnectionRefusedError:  # ICMP port unreachable from an earlier datagram
+            return []
+        if address != self.peer.address:
+            return []
+        try:
+            return self.peer.receive(packet)
+        except (protocol.ProtocolError, struct.error):
+            return []  # A bad datagram is just dropped, the next one is independent
+
+    def close(self, linger=0.0):
+        # For up to linger seconds, resend what the server hasn't acked (the
+        # leave message) and let the simulated network deliver what it
+        # holds, otherwise they die with the socket. Messages received
+        # meanwhile are dropped, we are leaving.
+        deadline = time.perf_counter() + linger
+        while time.perf_counter() < deadline:
+            pending = self.conditions is not None and self.conditions.queue
+            if not self.peer.unacked and not pending:
+                break
+            self.receive()
+        self.sock.close()
@@ -1,16 +1,53 @@
 import socket
+import struct
+import selectors
 import threading
+import argparse
 import logging
-import pickle
 import uuid
 import time
+import sys
+import os
+import multiprocessing
+import atexit
+import signal
+from collections import deque
+from types import MappingProxyType
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game import protocol
+from game.tick import TickScheduler
+from game.map_data import MapData
+from game.collision_map import CollisionMap
+from game.spatial_hash import SpatialHash
+from game.replay import ReplayRecorder
+from game.metrics import metrics, start_stats_server, start_stats_dump
+from game.transport import OutboundQueue, OUTBOUND_FRAMES, UdpPeer, NetworkConditions, PACKET, PACKET_RELIABLE, MAX_DATAGRAM, MAX_PAYLOAD, PEER_TIMEOUT
+from game.player_input import simulate_input, INPUT_RATE, SPAWN_POSITION, MAX_HEALTH
+from game.simulation import move_projectile, apply_damage, HIT_RADIUS, BULLET_DAMAGE
 
 
 # Configuration du serveur
 HOST = '0.0.0.0'  # Adresse de connection
 PORT = 12345        # Port à utiliser
 BUFFER_SIZE = 8192  # Increased buffer size
-UPDATE_RATE = 30    # Updates per second
+UPDATE_RATE = 30    # Ticks (world snapshots) per second
+STATS_INTERVAL = 60  # Seconds between two tick timing reports in the log
+INPUT_BACKLOG = 120  # Input commands kept per client waiting for a tick (2 s)
+SNAPSHOT_HISTORY = 32  # Ticks kept as delta baselines (about 1 s at 30 Hz)
+INTEREST_RADIUS = 700     # Clients only hear about what is this close (0: everything)
+INTEREST_HYSTERESIS = 100  # Extra distance before a visible player leaves the view
+MAP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'map', 'map.tmx')
+ENGINES = ('threaded', 'eventloop')
+DEFAULT_ENGINE = 'threaded'
+WORLDS = ('dict', 'numpy')
+DEFAULT_WORLD = 'dict'
+ROOM_CAPACITY = 16  # Players per room with --workers
+SLOW_CLIENT_TIMEOUT = 5.0  # Seconds a client's outbound queue may stay full before it is disconnected
+UDP_SERVICE_INTERVAL = 0.01  # Seconds between two passes over UDP resends and timeouts
+FIRST_RELIABLE_PACKET = PACKET.pack(PACKET_RELIABLE, 1)  # Header of a UDP client's join
 
 # Configuration du logging
 logging.basicConfig(
@@ -19,124 +56,501 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Dictionnaire des joueurs avec leurs positions
+# Dictionnaire des joueurs avec leurs positions, double buffer :
+# - players is the tick's working copy, only the tick reads or writes it
+# - published_world is the last world the tick published, read-only.
+#   Publishing swaps one reference, so a reader takes `published_world`
+#   once and iterates it without any lock, never seeing a half-simulated
+#   tick. Entries are tuples and bullet lists are rebuilt, never modified
+#   in place.
 players = {}  # {client_id: (socket, position, pseudo, soldier_type, health, bullets)}
+published_world = MappingProxyType({})  # Same entries, as of the end of the last tick's simulation
 client_sockets = {}  # {socket: client_id}
+# Messages received since the last tick, joins and departures included:
+# only the tick applies them, in the order they came in
+pending_inputs = deque()  # [(client_id, socket, player_data or PLAYER_JOINED / PLAYER_LEFT)]
+PLAYER_JOINED = 'joined'
+PLAYER_LEFT = 'left'
+# Input commands not simulated yet, and what the simulation keeps per player
+client_commands = {}  # {client_id: deque([(sequence, buttons)])}
+input_states = {}  # {client_id: {'sequence', 'direction', 'cooldown', 'next_bullet_id'}}
+# What each client was sent during the last ticks, deltas are encoded against it
+client_views = {}  # {client_id: {tick: {player_id: (position, pseudo, soldier_type, health, bullets)}}}
+client_acks = {}  # {client_id: last snapshot tick the client has applied}
+# Players and bullets bucketed by position, only touched by the tick
+map_data = MapData(MAP_PATH)
+map_size = map_data.get_map_size()
+# Walls of the map: they stop players and bullets
+collision_map = CollisionMap(map_data)
+player_grid = SpatialHash(HIT_RADIUS * 2, *map_size)
+# Interest queries span radius + hysteresis: their grids have cells about
+# that size, so a query reads a handful of cells instead of the ~1500
+# HIT_RADIUS cells of player_grid
+interest_grid = SpatialHash(max(INTEREST_RADIUS, HIT_RADIUS * 2), *map_size)
+bullet_grid = SpatialHash(max(INTEREST_RADIUS, HIT_RADIUS * 2), *map_size)
+interest_radius = INTEREST_RADIUS
+# With --world numpy the simulation state lives in an ArrayWorld and players
+# is the view derived from it each tick
+array_world = None
+# Moteur threaded : le tick ne fait que remplir ces files, un thread par client les vide
+send_queues = {}  # {socket: OutboundQueue}
+# --record: every tick's world goes to a replay file, written by its own thread
+recorder = None
+max_queued_frames = OUTBOUND_FRAMES
+slow_client_timeout = SLOW_CLIENT_TIMEOUT
+
+
+# === Logique commune aux deux moteurs ===
+def add_player(client_id, client_socket):
+    # The next tick puts it in the world, before any of its messages
+    client_sockets[client_socket] = client_id
+    client_commands[client_id] = deque()
+    input_states[client_id] = {'sequence': 0, 'direction': 'front', 'cooldown': 0, 'next_bullet_id': 0}
+    pending_inputs.append((client_id, client_socket, PLAYER_JOINED))
+    metrics.count('connections')
+
+
+def remove_player(client_id, client_socket):
+    # The next tick takes it out of the world, after its last messages
+    pending_inputs.append((client_id, client_socket, PLAYER_LEFT))
+
+
+def join_player(client_id, client_socket):
+    # Position initiale, pseudo, type, health, bullets
+    players[client_id] = (client_socket, SPAWN_POSITION, "", "falcon", MAX_HEALTH, [])
+
+
+def drop_player(client_id, client_socket, send):
+    if client_id in players:
+        del players[client_id]
+        # Notifier tous les clients de la déconnexion
+        disconnect_message = protocol.encode_disconnect(client_id)
+        for other_socket, _, _, _, _, _ in players.values():
+            send(other_socket, disconnect_message, True)
+    client_acks.pop(client_id, None)
+    client_views.pop(client_id, None)
+    client_commands.pop(client_id, None)
+    input_states.pop(client_id, None)
+    metrics.remove_client(client_id)
+    metrics.count('disconnections')
+    if client_sockets.get(client_socket) == client_id:
+        del client_sockets[client_socket]
+
+
+def initial_frames(client_id):
+    # Envoyer l'ID du client, le prochain tick lui enverra un snapshot complet
+    return [protocol.encode_init(client_id)]
+
+
+def publish_world():
+    # Swap the buffers: the world simulated so far becomes the published
+    # one, and the next tick works on a copy of it
+    global published_world, players
+    published_world = MappingProxyType(players)
+    players = dict(players)
+
+
+def world_states(published):
+    return {
+        player_id: (player_pos, pseudo, soldier_type, health, bullets)
+        for player_id, (_, player_pos, pseudo, soldier_type, health, bullets) in published.items()
+    }
+
+
+def client_queues():
+    # Per-client queues of the stats endpoint: commands waiting for a tick,
+    # and with the threaded engine frames waiting for the writer thread
+    stats = {client_id: {'input_backlog': len(commands)} for client_id, commands in list(client_commands.items())}
+    for client_socket, queue in list(send_queues.items()):
+        client_id = client_sockets.get(client_socket)
+        if client_id in stats:
+            stats[client_id].update({'outbound_frames': len(queue), 'snapshots_replaced': queue.replaced})
+    return stats
+
+
+metrics.add_probe(client_queues)
+
+
+def queue_player_update(client_id, client_socket, player_data):
+    pending_inputs.append((client_id, client_socket, player_data))
+
+
+def apply_pending_inputs(send):
+    # Queue the input commands received since the last tick, in order and
+    # without the copies the client sends again for redundancy
+    while pending_inputs:
+        client_id, client_socket, player_data = pending_inputs.popleft()
+        if player_data is PLAYER_JOINED:
+            join_player(client_id, client_socket)
+            continue
+        if player_data is PLAYER_LEFT:
+            drop_player(client_id, client_socket, send)
+            continue
+        commands = client_commands.get(client_id)
+        state = input_states.get(client_id)
+        if client_id not in players or commands is None or state is None:  # Disconnected since
+            continue
+        if 'inputs' in player_data:
+            client_acks[client_id] = player_data['ack']
+            last = commands[-1][0] if commands else state['sequence']
+            for sequence, buttons in player_data['inputs']:
+                if sequence > last:
+                    commands.append((sequence, buttons))
+                    last = sequence
+            while len(commands) > INPUT_BACKLOG:
+                commands.popleft()
+                metrics.client_count(client_id, 'inputs_dropped')
+        else:
+            _, position, _, _, health, bullets = players[client_id]
+            players[client_id] = (client_socket, position, player_data['pseudo'], player_data['soldier_type'],
+                                  health, bullets)
+            if array_world is not None:
+                array_world.set_player(client_id, position, player_data['pseudo'], player_data['soldier_type'],
+                                       health, None)
+
+
+def simulate_inputs(max_inputs):
+    # The server is the authority on movement, shots and respawns: it runs
+    # the clients' inputs through the same simulate_input the clients use to
+    # predict. A client gets at most max_inputs steps per tick, sending
+    # inputs faster than it renders frames doesn't make it move faster.
+    for client_id, commands in list(client_commands.items()):
+        entry = players.get(client_id)
+        state = input_states.get(client_id)
+        if not commands or entry is None or state is None:
+            continue
+        client_socket, (x, y), pseudo, soldier_type, health, bullets = entry
+        direction, cooldown = state['direction'], state['cooldown']
+        fired = []
+        for _ in range(min(max_inputs, len(commands))):
+            sequence, buttons = commands.popleft()
+            x, y, health, direction, cooldown, shot = simulate_input(
+                x, y, health, direction, cooldown, buttons, collision_map, map_size
+            )
+            if shot:
+                fired.append((x, y, direction, state['next_bullet_id']))
+                state['next_bullet_id'] = (state['next_bullet_id'] + 1) % 65536
+            state['sequence'] = sequence
+        state['direction'], state['cooldown'] = direction, cooldown
+        if commands:  # Over max_inputs, the rest waits for the next tick
+            metrics.client_count(client_id, 'inputs_deferred', len(commands))
+
+        if array_world is not None:
+            array_world.set_player(client_id, (x, y), pseudo, soldier_type, health, None)
+            for bullet in fired:
+                array_world.add_bullet(client_id, bullet)
+        players[client_id] = (client_socket, (x, y), pseudo, soldier_type, health, bullets + fired)
+
+
+def step_bullets(elapsed):
+    # Move every bullet, the ones that meet a wall or leave the map are gone
+    for player_id, (client_socket, position, pseudo, soldier_type, health, bullets) in players.items():
+        if not bullets:
+            continue
+        moved = []
+        for x, y, direction, bullet_id in bullets:
+            moved_to = move_projectile(x, y, direction, elapsed, collision_map)
+            if moved_to is not None:
+                moved.append((moved_to[0], moved_to[1], direction, bullet_id))
+        players[player_id] = (client_socket, position, pseudo, soldier_type, health, moved)
+
+
+def step_array_world(elapsed):
+    for stale_id in [player_id for player_id in array_world.player_ids() if player_id not in players]:
+        array_world.remove_player(stale_id)
+    for player_id, (_, position, pseudo, soldier_type, health, _) in players.items():
+        if player_id not in array_world:  # Joined since the last tick
+            array_world.set_player(player_id, position, pseudo, soldier_type, health, [])
+    array_world.step(elapsed)
+    for player_id, state in array_world.states().items():
+        entry = players.get(player_id)
+        if entry is not None:
+            players[player_id] = (entry[0],) + state
+
+
+def sync_player_grid():
+    # Keep the grid in sync with the players, cells only change for players
+    # who crossed a cell border since the last tick
+    for stale_id in [player_id for player_id in player_grid.items() if player_id not in players]:
+        player_grid.remove(stale_id)
+    for player_id, (_, (x, y), _, _, _, _) in players.items():
+        player_grid.move(player_id, x, y)
+
+
+def resolve_hits(elapsed):
+    if array_world is not None:
+        step_array_world(elapsed)
+        return
+
+    step_bullets(elapsed)
+
+    # Broad phase in player_grid, narrow phase on squared distances. Each
+    # bullet hits at most one player, the nearest (lowest id on a tie), the
+    # same rule as ArrayWorld.step so both --world backends agree
+    radius_squared = HIT_RADIUS * HIT_RADIUS
+    damage = {}  # {target_id: damage taken this tick}
+    for shooter_id, (socket_obj, pos, pseudo, soldier_type, health, bullets) in players.items():
+        if not bullets:
+            continue
+        remaining = []
+        for bullet in bullets:
+            bullet_x, bullet_y = bullet[0], bullet[1]
+            nearest = None  # (squared distance, target_id)
+            for target_id, target_x, target_y in player_grid.query(bullet_x, bullet_y, HIT_RADIUS):
+                if target_id == shooter_id:  # Don't damage self
+                    continue
+                candidate = ((bullet_x - target_x) ** 2 + (bullet_y - target_y) ** 2, target_id)
+                if candidate[0] < radius_squared and (nearest is None or candidate < nearest):
+                    nearest = candidate
+            if nearest is None:
+                remaining.append(bullet)
+            else:
+                damage[nearest[1]] = damage.get(nearest[1], 0) + BULLET_DAMAGE
+        if len(remaining) != len(bullets):
+            players[shooter_id] = (socket_obj, pos, pseudo, soldier_type, health, remaining)
+
+    for target_id, amount in damage.items():
+        if target_id in players:
+            socket_obj, pos, pseudo, soldier_type, health, bullets = players[target_id]
+            players[target_id] = (socket_obj, pos, pseudo, soldier_type, apply_damage(health, amount), bullets)
+
+
+def index_players(states):
+    # Only players who crossed a cell border since the last tick move bucket
+    for stale_id in [player_id for player_id in interest_grid.items() if player_id not in states]:
+        interest_grid.remove(stale_id)
+    for player_id, state in states.items():
+        interest_grid.move(player_id, state[0][0], state[0][1])
+
+
+def index_bullets(states):
+    bullet_grid.clear()
+    for player_id, (_, _, _, _, bullets) in states.items():
+        for index, bullet in enumerate(bullets):
+            bullet_grid.move((player_id, index), bullet[0], bullet[1])
+
+
+def interest_view(client_id, states, previous):
+    # Players within the radius, plus those already visible that are still
+    # within radius + hysteresis so nobody flickers on the border. Bullets are
+    # kept when close enough, their shooter comes along even if far away.
+    if client_id not in states:
+        return {}
+    x, y = states[client_id][0]
+    enter_squared = interest_radius * interest_radius
+    leave_radius = interest_radius + INTEREST_HYSTERESIS
+    leave_squared = leave_radius * leave_radius
+
+    view = {client_id: states[client_id]}
+    for player_id, player_x, player_y in interest_grid.query(x, y, leave_radius):
+        if player_id in states and player_id not in view:
+            distance_squared = (player_x - x) ** 2 + (player_y - y) ** 2
+            if distance_squared <= enter_squared or (distance_squared <= leave_squared and player_id in previous):
+                view[player_id] = states[player_id]
+
+    nearby_bullets = {}  # {player_id: indexes of visible bullets}
+    for (player_id, index), bullet_x, bullet_y in bullet_grid.query(x, y, leave_radius):
+        if (bullet_x - x) ** 2 + (bullet_y - y) ** 2 <= leave_squared:
+            nearby_bullets.setdefault(player_id, []).append(index)
+    for player_id, state in list(view.items()):
+        if player_id not in nearby_bullets and state[4]:
+            view[player_id] = state[:4] + ([],)
+    for player_id, indexes in nearby_bullets.items():
+        state = states[player_id]
+        if len(indexes) != len(state[4]):
+            bullets = [state[4][index] for index in sorted(indexes)]
+            state = state[:4] + (bullets,)
+        view[player_id] = state
+    return view
 
 
+def broadcast_snapshot(tick, send):
+    published = published_world  # One world for the whole broadcast, whatever gets published meanwhile
+    states = world_states(published)
+    if recorder is not None:
+        recorder.record(tick, states)
+    if interest_radius:
+        index_players(states)
+        index_bullets(states)
+
+    # Each client gets a delta against the last view it acknowledged, or a
+    # full snapshot if it has none we still remember (join, loss). Players
+    # entering or leaving its area show up as new or removed in the delta.
+    # Without interest management every view is the same, so clients on the
+    # same baseline share one buffer, encoded once. The snapshot is preceded
+    # by the client's own input ack, which tells it how far the server got
+    # in its inputs so it can replay the rest on top of that state.
+    for stale_id in [client_id for client_id in client_views if client_id not in published]:
+        del client_views[stale_id]
+    shared_frames = {}  # {baseline tick or None: frame}
+    send_time = 0.0  # Returned apart from the encoding time
+    for client_id, (client_socket, _, _, _, _, _) in published.items():
+        history = client_views.setdefault(client_id, {})
+        baseline_tick = client_acks.get(client_id)
+        baseline = history.get(baseline_tick)
+        if interest_radius:
+            last_view = history.get(tick - 1, {})
+            view = interest_view(client_id, states, last_view)
+            frame = None
+        else:
+            view = states
+            frame = shared_frames.get(baseline_tick if baseline is not None else None)
+        if frame is None:
+            if baseline is None:
+                frame = protocol.encode_snapshot(tick, (
+                    (player_id,) + state for player_id, state in view.items()
+                ))
+            else:
+                frame = protocol.encode_delta(tick, baseline_tick, baseline, view)
+            if not interest_radius:
+                shared_frames[baseline_tick if baseline is not None else None] = frame
+        history[tick] = view
+        history.pop(tick - SNAPSHOT_HISTORY, None)
+        state = input_states.get(client_id)
+        if state is not None:
+            frame = protocol.encode_input_ack(tick, state['sequence']) + frame
+        send_start = time.perf_counter()
+        if not send(client_socket, frame):
+            logger.error(f"Error sending data to client {client_id}")
+            metrics.client_count(client_id, 'send_failures')
+        else:
+            metrics.sent(client_id, len(frame), 2 if state is not None else 1)
+        send_time += time.perf_counter() - send_start
+    return send_time
+
+
+def run_tick(scheduler, send):
+    # One tick: simulate with the inputs received so far, then send the
+    # resulting world snapshot to everyone
+    max_inputs = -(-INPUT_RATE // scheduler.rate) * 2  # Room for late inputs to catch up
+
+    def tick(tick_number):
+        start = time.perf_counter()
+        apply_pending_inputs(send)
+        simulate_inputs(max_inputs)
+        sync_player_grid()
+        resolve_hits(1.0 / scheduler.rate)
+        publish_world()
+        published = published_world
+        simulated = time.perf_counter()
+        send_time = broadcast_snapshot(tick_number, send)
+        end = time.perf_counter()
+
+        metrics.observe('tick_ms', (end - start) * 1000)
+        metrics.observe('simulation_ms', (simulated - start) * 1000)
+        metrics.observe('serialization_ms', (end - simulated - send_time) * 1000)
+        metrics.observe('send_ms', send_time * 1000)
+        metrics.observe('tick_start_late_ms', scheduler.late * 1000)
+        metrics.gauge('tick', tick_number)
+        metrics.gauge('tick_overruns', scheduler.overruns)
+        metrics.gauge('ticks_skipped', scheduler.skipped)
+        metrics.gauge('players', len(published))
+        metrics.gauge('bullets', sum(len(entry[5]) for entry in published.values()))
+        if tick_number % (scheduler.rate * STATS_INTERVAL) == 0:
+            stats = scheduler.stats()
+            logger.info(
+                f"Tick {stats['tick']}: avg {stats['avg_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms, "
+                f"max {stats['max_ms']:.2f} ms, {stats['overruns']} overruns, {stats['skipped']} skipped"
+            )
+    return tick
+
+
+def queued_send(client_socket, data, reliable=False):
+    # Never blocks the tick: the frame waits in the client's queue for its
+    # writer thread, so a slow client only ever delays itself
+    queue = send_queues.get(client_socket)
+    if queue is None:
+        return False
+    now = time.perf_counter()
+    queue.put(data, reliable, now)
+    if queue.behind_for(now) > slow_client_timeout:
+        evict_slow_client(client_sockets.get(client_socket), queue)
+        send_queues.pop(client_socket, None)
+        queue.close()
+        try:
+            # Wakes the client's thread up in recv(), which cleans up
+            client_socket.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        return False
+    return True
+
+
+def evict_slow_client(client_id, queue):
+    logger.warning(f"Client {client_id} trop lent depuis {slow_client_timeout} s "
+                   f"({queue.replaced} snapshots remplacés), déconnecté")
+    metrics.count('slow_client_evictions')
+
+
+def write_frames(client_socket, queue):
+    # Writer thread of one client: blocking writes, but only this thread waits
+    while True:
+        data = queue.wait()
+        if data is None:
+            return
+        try:
+            client_socket.sendall(data)
+        except socket.error:
+            queue.close()
+            return
+
+
+# === Moteur "threaded" : un thread par client ===
 class ClientThread(threading.Thread):
     def __init__(self, client_socket, client_address):
         threading.Thread.__init__(self)
         self.client_socket = client_socket
         self.client_address = client_address
         self.client_id = str(uuid.uuid4())
-        # Position initiale, pseudo, type, health, bullets
-        players[self.client_id] = (client_socket, (400, 300), "", "falcon", 100, []) 
-        client_sockets[client_socket] = self.client_id
-
-    def send_data(self, data):
-        try:
-            self.client_socket.send(pickle.dumps(data))
-        except socket.error as e:
-            logger.error(f"Error sending data to client: {e}")
-            return False
-        return True
 
     def run(self):
+        queue = send_queues[self.client_socket] = OutboundQueue(max_queued_frames)
+        threading.Thread(target=write_frames, args=(self.client_socket, queue), daemon=True).start()
         try:
-            # Envoyer l'ID du client
-            if not self.send_data(('init', self.client_id)):
-                return
-            
-            # Envoyer l'état actuel de tous les joueurs au nouveau client
-            for player_id, (_, player_pos, pseudo, soldier_type, health, bullets) in players.items():
-                if player_id != self.client_id:  # Ne pas envoyer sa propre position
-                    if not self.send_data((player_id, player_pos, pseudo, soldier_type, health, bullets)):
-                        return
-            
-            last_update = 0
+            for frame in initial_frames(self.client_id):
+                queued_send(self.client_socket, frame, True)
+            # Only visible to the tick once it has its init message
+            add_player(self.client_id, self.client_socket)
+
+            decoder = protocol.StreamDecoder()
             while True:
                 data = self.client_socket.recv(BUFFER_SIZE)
                 if not data:
                     break
 
-                # Mettre à jour les données du joueur
+                # A bad frame means we lost track of the stream, drop the client
                 try:
-                    player_data = pickle.loads(data)
-                    if isinstance(player_data, dict):
-                        position = player_data.get('position', (400, 300))
-                        pseudo = player_data.get('pseudo', "")
-                        soldier_type = player_data.get('soldier_type', "falcon")
-                        health = player_data.get('health', 100)
-                        bullets = player_data.get('bullets', [])
-                        
-                        # Process bullets damage to other players
-                        if bullets:
-                            for bullet in bullets:
-                                bullet_x, bullet_y, direction = bullet[:3]
-                                for target_id, (_, target_pos, _, _, target_health, _) in players.items():
-                                    if target_id != self.client_id:  # Don't damage self
-                                        target_x, target_y = target_pos
-                                        # Simple distance-based collision
-                                        distance = ((bullet_x - target_x) ** 2 + (bullet_y - target_y) ** 2) ** 0.5
-                                        if distance < 20:  # Collision radius
-                                            # Update target health (-10 damage)
-                                            new_health = max(0, target_health - 10)
-                                            socket_obj, pos, p, st, _, b = players[target_id]
-                                            players[target_id] = (socket_obj, pos, p, st, new_health, b)
-                                            # Remove bullet
-                                            bullets.remove(bullet)
-                                            break
-                        
-                        # Store updated player data
-                        players[self.client_id] = (self.client_socket, position, pseudo, soldier_type, health, bullets)
-                except Exception as e:
-                    logger.error(f"Error processing player data: {e}")
-                    continue
+                    messages = decoder.feed(data)
+                except protocol.ProtocolError as e:
+                    logger.error(f"Protocol error from {self.client_address}: {e}")
+                    metrics.count('protocol_errors')
+                    break
+                metrics.received(self.client_id, len(data), len(messages))
 
-                # Rate limit updates
-                current_time = time.time()
-                if current_time - last_update >= 1.0 / UPDATE_RATE:
-                    last_update = current_time
-                    # Envoyer les données de tous les joueurs à tous les clients
-                    for client_id, (client_socket, _, _, _, _, _) in players.items():
-                        try:
-                            # Envoyer toutes les données à ce client
-                            for player_id, (_, player_pos, pseudo, soldier_type, health, bullets) in players.items():
-                                try:
-                                    client_socket.send(pickle.dumps((player_id, player_pos, pseudo, soldier_type, health, bullets)))
-                                except socket.error as e:
-                                    logger.error(f"Error sending data to client {client_id}: {e}")
-                                    break
-                        except socket.error as e:
-                            logger.error(f"Error sending data to client: {e}")
-                            break
+                # La mise à jour sera appliquée au prochain tick
+                for player_data in messages:
+                    if isinstance(player_data, dict):
+                        queue_player_update(self.client_id, self.client_socket, player_data)
 
         except socket.error as e:
             logger.error(f"Error in client thread: {e}")
         finally:
+            send_queues.pop(self.client_socket, None)
+            queue.close()
             self.client_socket.close()
-            if self.client_id in players:
-                # Notifier tous les clients de la déconnexion
-                disconnect_message = ('disconnect', self.client_id)
-                for _, (client_socket, _, _, _, _, _) in players.items():
-                    if client_socket != self.client_socket:  # Don't send to disconnected socket
-                        try:
-                            client_socket.send(pickle.dumps(disconnect_message))
-                        except socket.error:
-                            pass
-                del players[self.client_id]
-            if self.client_socket in client_sockets:
-                del client_sockets[self.client_socket]
+            remove_player(self.client_id, self.client_socket)
             logger.info(f"Client disconnected: {self.client_address}")
 
 
-def start_server():
+def start_threaded_server(host=HOST, port=PORT, tick_rate=UPDATE_RATE):
+    scheduler = TickScheduler(tick_rate)
+    threading.Thread(target=scheduler.run_forever, args=(run_tick(scheduler, queued_send),), daemon=True).start()
+
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    server_socket.bind((HOST, PORT))
+    server_socket.bind((host, port))
     server_socket.listen(5)
-    logger.info(f"Serveur démarré sur {HOST}:{PORT}")
+    logger.info(f"Serveur démarré sur {host}:{port}")
 
     while True:
         try:
@@ -148,5 +562,508 @@ def start_server():
             logger.error(f"Error accepting connection: {e}")
 
 
+# === Moteur "eventloop" : un seul thread, sockets non bloquantes ===
+class ClientConnection:
+    def __init__(self, client_socket, client_address):
+        self.client_socket = client_socket
+        self.client_address = client_address
+        self.client_id = str(uuid.uuid4())
+        self.decoder = protocol.StreamDecoder()
+        self.queue = OutboundQueue(max_queued_frames)  # Whole frames not written yet
+        self.outbound = bytearray()  # Bytes taken from the queue, being written
+
+
+class EventLoopServer:
+    def __init__(self, host=HOST, port=PORT, tick_rate=UPDATE_RATE, udp=False, conditions=None, control=None):
+        self.host = host
+        self.port = port
+        self.scheduler = TickScheduler(tick_rate)
+        self.tick = run_tick(self.scheduler, self.send)
+        self.selector = selectors.DefaultSelector()
+        self.connections = {}  # {socket: ClientConnection}
+        self.server_socket = None
+        # UDP clients share one socket on the same port, each one is a
+        # UdpPeer that stands in for its socket in players
+        self.udp = udp
+        self.conditions = conditions  # Simulated loss and latency, for testing
+        self.udp_socket = None
+        self.peers = {}  # {address: UdpPeer}
+        self.last_udp_service = 0.0
+        metrics.add_probe(self.queue_stats)
+        # In a room behind the lobby: clients arrive as file descriptors on
+        # this Unix socket instead of through our own listening socket
+        self.control = control
+
+    def listen(self):
+        if self.control is not None:
+            self.control.setblocking(False)
+            self.selector.register(self.control, selectors.EVENT_READ)
+            logger.info(f"Salle démarrée (pid {os.getpid()})")
+            return
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind((self.host, self.port))
+        self.server_socket.listen(128)
+        self.server_socket.setblocking(False)
+        self.selector.register(self.server_socket, selectors.EVENT_READ)
+        if self.udp:
+            self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.udp_socket.bind((self.host, self.port))
+            self.udp_socket.setblocking(False)
+            self.selector.register(self.udp_socket, selectors.EVENT_READ)
+        logger.info(f"Serveur (eventloop) démarré sur {self.host}:{self.port}" + (" (tcp + udp)" if self.udp else ""))
+
+    def serve_forever(self):
+        self.listen()
+        while True:
+            timeout = self.scheduler.time_until_next()
+            if self.udp:
+                timeout = min(timeout, UDP_SERVICE_INTERVAL)
+            for key, events in self.selector.select(timeout):
+                if key.fileobj is self.server_socket:
+                    self.accept()
+                    continue
+                if key.fileobj is self.udp_socket:
+                    self.read_udp()
+                    continue
+                if key.fileobj is self.control:
+                    self.receive_handoff()
+                    continue
+                connection = self.connections.get(key.fileobj)
+                if connection is None:
+                    continue
+                if events & selectors.EVENT_WRITE:
+                    self.flush(connection)
+                if events & selectors.EVENT_READ and connection.client_socket in self.connections:
+                    self.read(connection)
+            self.scheduler.run_pending(self.tick)
+            if self.udp:
+                self.service_udp()
+
+    def accept(self):
+        try:
+            client_socket, client_address = self.server_socket.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        except socket.error as e:
+            logger.error(f"Error accepting connection: {e}")
+            return
+        logger.info(f"Connexion reçue de {client_address}")
+        self.adopt(client_socket, client_address)
+
+    def receive_handoff(self):
+        # The lobby accepted these clients and passed their sockets to us
+        try:
+            _, fds, _, _ = socket.recv_fds(self.control, 1, MAX_HANDOFF)
+        except (BlockingIOError, InterruptedError):
+            return
+        if not fds:
+            logger.info("Lobby fermé, arrêt de la salle")
+            sys.exit(0)
+        for fd in fds:
+            client_socket = socket.socket(fileno=fd)
+            try:
+                client_address = client_socket.getpeername()
+            except socket.error:  # Already gone
+                client_socket.close()
+                self.control.send(ROOM_LEFT)
+                continue
+            self.adopt(client_socket, client_address)
+
+    def adopt(self, client_socket, client_address):
+        client_socket.setblocking(False)
+        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connection = ClientConnection(client_socket, client_address)
+        self.connections[client_socket] = connection
+        self.selector.register(client_socket, selectors.EVENT_READ)
+        for frame in initial_frames(connection.client_id):
+            self.send(client_socket, frame, True)
+        add_player(connection.client_id, client_socket)
+
+    def read(self, connection):
+        try:
+            data = connection.client_socket.recv(BUFFER_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except socket.error as e:
+            logger.error(f"Error in client connection: {e}")
+            data = b""
+        if not data:
+            self.close(connection)
+            return
+
+        try:
+            messages = connection.decoder.feed(data)
+        except protocol.ProtocolError as e:
+            logger.error(f"Protocol error from {connection.client_address}: {e}")
+            metrics.count('protocol_errors')
+            self.close(connection)
+            return
+        metrics.received(connection.client_id, len(data), len(messages))
+
+        for player_data in messages:
+            if isinstance(player_data, dict):
+                queue_player_update(connection.client_id, connection.client_socket, player_data)
+
+    def queue_stats(self):
+        # Outbound bytes the kernel hasn't taken yet, and the UDP channels' state
+        stats = {
+            connection.client_id: {
+                'outbound_bytes': len(connection.outbound), 'outbound_frames': len(connection.queue),
+                'snapshots_replaced': connection.queue.replaced
+            }
+            for connection in list(self.connections.values())
+        }
+        for peer in list(self.peers.values()):
+            stats[peer.client_id] = {
+                'unacked_reliable': len(peer.unacked), 'udp_stale': peer.stale, 'udp_resent': peer.resent,
+                'udp_oversized': peer.oversized
+            }
+        return stats
+
+    def read_udp(self):
+        # Drain every datagram waiting, a new address is a new client
+        while True:
+            try:
+                packet, address = self.udp_socket.recvfrom(MAX_DATAGRAM)
+            except (BlockingIOError, InterruptedError):
+                return
+            except socket.error as e:  # ICMP errors from datagrams we sent
+                logger.debug(f"UDP error: {e}")
+                continue
+            peer = self.peers.get(address)
+            if peer is None:
+                # Only a join opens a connection, so a late datagram from a
+                # client that already left doesn't bring it back
+                if packet[:PACKET.size] != FIRST_RELIABLE_PACKET:
+                    continue
+                peer = self.accept_udp(address)
+            try:
+                messages = peer.receive(packet)
+            except (protocol.ProtocolError, struct.error) as e:
+                # Unlike a stream, a bad datagram doesn't desync the next ones
+                logger.error(f"Protocol error from {address}: {e}")
+                metrics.count('protocol_errors')
+                continue
+            metrics.received(peer.client_id, len(packet), len(messages))
+            for player_data in messages:
+                if isinstance(player_data, dict):
+                    queue_player_update(peer.client_id, peer, player_data)
+                elif player_data[0] == 'disconnect':
+                    self.close_peer(peer)
+                    break
+
+    def accept_udp(self, address):
+        logger.info(f"Connexion UDP reçue de {address}")
+        peer = UdpPeer(self.udp_socket, address, self.conditions)
+        peer.client_id = str(uuid.uuid4())
+        self.peers[address] = peer
+        for frame in initial_frames(peer.client_id):
+            peer.send(frame, reliable=True)
+        add_player(peer.client_id, peer)
+        return peer
+
+    def service_udp(self):
+        # Reliable resends, silent peers, delayed datagrams of the simulation
+        now = time.perf_counter()
+        if now - self.last_udp_service < UDP_SERVICE_INTERVAL:
+            return
+        self.last_udp_service = now
+        for peer in list(self.peers.values()):
+            if now - peer.last_heard > PEER_TIMEOUT:
+                logger.info(f"Client UDP {peer.address} silencieux depuis {PEER_TIMEOUT} s")
+                self.close_peer(peer)
+            else:
+                peer.resend(now)
+        if self.conditions is not None:
+            self.conditions.flush(self.udp_socket)
+
+    def close_peer(self, peer):
+        if self.peers.pop(peer.address, None) is None:
+            return
+        remove_player(peer.client_id, peer)
+        logger.info(f"Client disconnected: {peer.address}")
+
+    def send(self, client_socket, data, reliable=False):
+        if isinstance(client_socket, UdpPeer):
+            if not reliable and not client_socket.fits(data):
+                # Would be fragmented (lost whole if any fragment is) or
+                # refused over 64 KB: the reliable channel splits it instead
+                if not client_socket.oversized:
+                    logger.warning(f"Snapshot de {len(data)} octets pour {client_socket.address}, "
+                                   f"plus de {MAX_PAYLOAD} : envoyé en fiable, découpé")
+                client_socket.oversized += 1
+                metrics.count('oversized_datagrams')
+                reliable = True
+            return client_socket.send(data, reliable)
+        # Never blocks: whatever the kernel doesn't take now waits in the
+        # connection's queue until the socket becomes writable
+        connection = self.connections.get(client_socket)
+        if connection is None:
+            return False
+        now = time.perf_counter()
+        connection.queue.put(data, reliable, now)
+        if connection.queue.behind_for(now) > slow_client_timeout:
+            evict_slow_client(connection.client_id, connection.queue)
+            self.close(connection)
+            return False
+        if not connection.outbound:
+            self.flush(connection)
+        return True
+
+    def flush(self, connection):
+        while True:
+            if not connection.outbound:
+                connection.outbound += connection.queue.take()
+                if not connection.outbound:
+                    break
+            try:
+                sent = connection.client_socket.send(connection.outbound)
+            except (BlockingIOError, InterruptedError):
+                break
+            except socket.error as e:
+                logger.error(f"Error sending data to client: {e}")
+                self.close(connection)
+                return
+            del connection.outbound[:sent]
+            if connection.outbound:
+                break  # The kernel buffer is full
+        events = selectors.EVENT_READ
+        if connection.outbound or len(connection.queue):
+            events |= selectors.EVENT_WRITE
+        if self.selector.get_key(connection.client_socket).events != events:
+            self.selector.modify(connection.client_socket, events)
+
+    def close(self, connection):
+        client_socket = connection.client_socket
+        if client_socket not in self.connections:
+            return
+        del self.connections[client_socket]
+        self.selector.unregister(client_socket)
+        client_socket.close()
+        remove_player(connection.client_id, client_socket)
+        logger.info(f"Client disconnected: {connection.client_address}")
+        if self.control is not None:
+            self.control.send(ROOM_LEFT)  # The lobby can give the seat to someone else
+
+
+def start_event_loop_server(host=HOST, port=PORT, tick_rate=UPDATE_RATE, udp=False, conditions=None):
+    EventLoopServer(host, port, tick_rate, udp, conditions).serve_forever()
+
+
+# === Lobby : une salle (un match) par processus ===
+# The lobby process only accepts connections on PORT. Each client is handed
+# off to a room, a worker process running its own EventLoopServer with its
+# own players, tick and map: its socket goes over a Unix socket pair
+# (SCM_RIGHTS), so the lobby never sees the game traffic. A room tells the
+# lobby when a player leaves, one byte per player. Each room has its own
+# interpreter and GIL, so matches don't slow each other down.
+ROOM_LEFT = b'-'
+MAX_HANDOFF = 16  # File descriptors read per handoff message
+
+
+def run_room(control, tick_rate, world, interest, stats_port, outbound_limits):
+    set_outbound_limits(*outbound_limits)
+    set_interest_radius(interest)
+    if world == 'numpy':
+        use_array_world()
+    if stats_port:
+        start_stats_server(metrics, '127.0.0.1', stats_port)
+    EventLoopServer(tick_rate=tick_rate, control=control).serve_forever()
+
+
+class Room:
+    def __init__(self, index, process, control):
+        self.index = index
+        self.process = process
+        self.control = control
+        self.players = 0
+
+
+class Lobby:
+    def __init__(self, host=HOST, port=PORT, workers=1, capacity=ROOM_CAPACITY, tick_rate=UPDATE_RATE,
+                 world=DEFAULT_WORLD, interest=INTEREST_RADIUS, stats_port=None):
+        self.host = host
+        self.port = port
+        self.capacity = capacity
+        self.selector = selectors.DefaultSelector()
+        self.rooms = []
+        # Spawned, not forked: a room only inherits its own end of the pair,
+        # so it sees the lobby close even while other rooms run
+        context = multiprocessing.get_context('spawn')
+        for index in range(workers):
+            control, room_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+            room_stats_port = stats_port + 1 + index if stats_port else None
+            process = context.Process(
+                target=run_room, daemon=True,
+                args=(room_end, tick_rate, world, interest, room_stats_port, (max_queued_frames, slow_client_timeout))
+            )
+            process.start()
+            room_end.close()
+            self.rooms.append(Room(index, process, control))
+            self.selector.register(control, selectors.EVENT_READ, self.rooms[-1])
+        self.update_gauges()
+
+    def pick_room(self):
+        # Fill matches one at a time: the fullest room that still has a seat
+        open_rooms = [room for room in self.rooms if room.players < self.capacity and room.process.is_alive()]
+        if not open_rooms:
+            return None
+        return max(open_rooms, key=lambda room: (room.players, -room.index))
+
+    def update_gauges(self):
+        active = sum(1 for room in self.rooms if room.players)
+        metrics.gauge('rooms', len(self.rooms))
+        metrics.gauge('rooms_active', active)
+        metrics.gauge('rooms_per_core', active / (os.cpu_count() or 1))
+        metrics.gauge('players', sum(room.players for room in self.rooms))
+        for room in self.rooms:
+            metrics.gauge(f'room_{room.index}_players', room.players)
+
+    def hand_off(self, client_socket, client_address):
+        room = self.pick_room()
+        if room is None:
+            logger.warning(f"Toutes les salles sont pleines, connexion de {client_address} refusée")
+            metrics.count('lobby_rejected')
+            client_socket.close()
+            return
+        try:
+            socket.send_fds(room.control, [b'+'], [client_socket.fileno()])
+        except socket.error as e:
+            logger.error(f"Error handing off to room {room.index}: {e}")
+            client_socket.close()
+            return
+        client_socket.close()  # The room has its own copy now
+        room.players += 1
+        metrics.count('lobby_handoffs')
+        logger.info(f"{client_address} -> salle {room.index} ({room.players}/{self.capacity})")
+        self.update_gauges()
+
+    def serve_forever(self):
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server_socket.bind((self.host, self.port))
+        server_socket.listen(128)
+        self.selector.register(server_socket, selectors.EVENT_READ)
+        logger.info(f"Lobby démarré sur {self.host}:{self.port}: {len(self.rooms)} salles de {self.capacity} joueurs")
+
+        while True:
+            for key, _ in self.selector.select():
+                if key.fileobj is server_socket:
+                    try:
+                        client_socket, client_address = server_socket.accept()
+                    except socket.error as e:
+                        logger.error(f"Error accepting connection: {e}")
+                        continue
+                    self.hand_off(client_socket, client_address)
+                    continue
+                room = key.data
+                data = room.control.recv(4096)
+                if not data:
+                    logger.error(f"Salle {room.index} arrêtée (code {room.process.exitcode})")
+                    self.selector.unregister(room.control)
+                    room.players = 0
+                else:
+                    room.players = max(0, room.players - data.count(ROOM_LEFT))
+                self.update_gauges()
+
+
+def start_recording(path, tick_rate):
+    global recorder
+    recorder = ReplayRecorder(path, tick_rate)
+    atexit.register(recorder.close)  # Writes the keyframe index, the file stays readable without it
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))  # So that atexit runs on kill too
+    logger.info(f"Enregistrement du match dans {path}")
+
+
+def set_outbound_limits(max_frames, timeout):
+    global max_queued_frames, slow_client_timeout
+    max_queued_frames = max_frames
+    slow_client_timeout = timeout
+
+
+def set_interest_radius(radius):
+    global interest_radius, interest_grid, bullet_grid
+    interest_radius = radius
+    interest_grid = SpatialHash(max(radius, HIT_RADIUS * 2), *map_size)
+    bullet_grid = SpatialHash(max(radius, HIT_RADIUS * 2), *map_size)
+
+
+def use_array_world():
+    global array_world
+    # Imported here: numpy is only loaded with --world numpy
+    from game.array_world import ArrayWorld
+    array_world = ArrayWorld(HIT_RADIUS, BULLET_DAMAGE)
+    array_world.set_collision(collision_map)
+    logger.info("Simulation sur tableaux numpy (--world numpy)")
+
+
+def start_server(engine=DEFAULT_ENGINE, host=HOST, port=PORT, tick_rate=UPDATE_RATE, world=DEFAULT_WORLD,
+                 interest=INTEREST_RADIUS, udp=False, conditions=None):
+    set_interest_radius(interest)
+    if world == 'numpy':
+        use_array_world()
+    if engine == 'eventloop':
+        start_event_loop_server(host, port, tick_rate, udp, conditions)
+    else:
+        start_threaded_server(host, port, tick_rate)
+
+
 if __name__ == "__main__":
-    start_server()
+    parser = argparse.ArgumentParser(description="Serveur du jeu shooter multijoueur")
+    parser.add_argument('--engine', choices=ENGINES,
+                        help=f"threaded: un thread par client, eventloop: une seule boucle selectors "
+                             f"(défaut : {DEFAULT_ENGINE}, eventloop avec --workers)")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--tick-rate', type=int, default=UPDATE_RATE, help="ticks (snapshots) par seconde")
+    parser.add_argument('--world', choices=WORLDS, default=DEFAULT_WORLD,
+                        help="dict: tuples Python, numpy: tableaux numpy vectorisés (pip install numpy)")
+    parser.add_argument('--interest-radius', type=int, default=INTEREST_RADIUS,
+                        help="distance au-delà de laquelle un client ne reçoit plus les autres (0: tout le monde)")
+    parser.add_argument('--udp', action='store_true',
+                        help="accepte aussi les clients en UDP sur le même port (moteur eventloop)")
+    parser.add_argument('--loss', type=float, default=0.0, help="UDP : proportion de datagrammes perdus (simulation)")
+    parser.add_argument('--latency', type=float, default=0.0, help="UDP : latence ajoutée en ms (simulation)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="UDP : gigue ajoutée en ms (simulation)")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="lobby sur --port et autant de salles, une par processus (0: une seule partie)")
+    parser.add_argument('--room-capacity', type=int, default=ROOM_CAPACITY, help="joueurs par salle avec --workers")
+    parser.add_argument('--max-queued-frames', type=int, default=OUTBOUND_FRAMES,
+                        help="trames en attente par client avant de remplacer les vieux snapshots par le dernier")
+    parser.add_argument('--slow-client-timeout', type=float, default=SLOW_CLIENT_TIMEOUT,
+                        help="secondes de file pleine avant de déconnecter un client trop lent")
+    parser.add_argument('--record', help="enregistre chaque tick dans ce fichier de replay (client/replay_viewer.py)")
+    parser.add_argument('--stats-port', type=int,
+                        help="sert les statistiques sur http://127.0.0.1:PORT/stats (JSON) et /metrics (texte)")
+    parser.add_argument('--stats-file', help="réécrit les statistiques en JSON dans ce fichier toutes les 10 s")
+    args = parser.parse_args()
+    if args.workers and args.engine == 'threaded':
+        parser.error("--workers runs every room with the eventloop engine, --engine threaded is not supported")
+    args.engine = args.engine or DEFAULT_ENGINE
+    if args.udp and (args.engine != 'eventloop' or args.workers):
+        parser.error("--udp requires --engine eventloop, without --workers")
+    set_outbound_limits(args.max_queued_frames, args.slow_client_timeout)
+    if args.record and args.workers:
+        parser.error("--record records one match, it is not supported with --workers")
+    if args.record:
+        start_recording(args.record, args.tick_rate)
+    lobby = None
+    if args.workers:
+        # Rooms always run the eventloop engine, the lobby hands sockets to them.
+        # Room i serves its own stats on --stats-port + 1 + i.
+        lobby = Lobby(args.host, args.port, args.workers, args.room_capacity, args.tick_rate, args.world,
+                      args.interest_radius, args.stats_port)
+    if args.stats_port:
+        start_stats_server(metrics, '127.0.0.1', args.stats_port)
+        logger.info(f"Statistiques sur http://127.0.0.1:{args.stats_port}/stats")
+    if args.stats_file:
+        start_stats_dump(metrics, args.stats_file)
+    if lobby is not None:
+        lobby.serve_forever()
+    else:
+        conditions = None
+        if args.loss or args.latency or args.jitter:
+            conditions = NetworkConditions(args.loss, args.latency / 1000, args.jitter / 1000)
+        start_server(args.engine, args.host, args.port, args.tick_rate, args.world, args.interest_radius,
+                     args.udp, conditions)
@@ -0,0 +1,206 @@
+import os
+import random
+import sys
+import uuid
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game import protocol
+from game.protocol import ProtocolError, StreamDecoder
+
+
+def player_id(n):
+    return str(uuid.UUID(int=n))
+
+
+def random_world(rng, ids):
+    return {
+        id_: ((float(rng.randrange(2000)), float(rng.randrange(2000))), f"bot{id_[-2:]}", rng.choice(('falcon', 'rogue')),
+              rng.randrange(0, 101),
+              [(float(rng.randrange(2000)), float(rng.randrange(2000)), rng.choice(protocol.DIRECTIONS), b)
+               for b in range(rng.randrange(4))])
+        for id_ in ids
+    }
+
+
+def next_world(rng, world):
+    # Some players move, get hit, shoot, leave; new ones join
+    result = {}
+    for id_, (position, pseudo, soldier_type, health, bullets) in world.items():
+        if rng.random() < 0.1:
+            continue
+        if rng.random() < 0.5:
+            position = (position[0] + 5, position[1])
+        if rng.random() < 0.2:
+            health = max(0, health - 10)
+        if rng.random() < 0.3:
+            bullets = bullets + [(position[0], position[1], 'left', len(bullets))]
+        result[id_] = (position, pseudo, soldier_type, health, bullets)
+    for _ in range(rng.randrange(3)):
+        result.update(random_world(rng, [player_id(rng.getrandbits(64))]))
+    return result
+
+
+def as_snapshot(world):
+    return ((id_,) + state for id_, state in world.items())
+
+
+def frames(rng):
+    # One of each message, as a server or client would send them
+    world = random_world(rng, [player_id(n) for n in range(1, 6)])
+    return [
+        protocol.encode_init(player_id(1)),
+        protocol.encode_snapshot(10, as_snapshot(world)),
+        protocol.encode_delta(11, 10, world, next_world(rng, world)),
+        protocol.encode_input_ack(11, 42),
+        protocol.encode_join('Zoé', 'falcon'),
+        protocol.encode_input([(40, 1), (41, 3), (42, 16)], 10),
+        protocol.encode_disconnect(player_id(1)),
+    ]
+
+
+def decode_all(data):
+    messages = []
+    offset = 0
+    while offset < len(data):
+        length, _, msg_type = protocol.HEADER.unpack_from(data, offset)
+        start = offset + protocol.HEADER.size
+        messages.append(protocol.decode_payload(msg_type, data[start:start + length]))
+        offset = start + length
+    return messages
+
+
+def test_round_trip():
+    world = random_world(random.Random(1), [player_id(n) for n in range(1, 4)])
+    data = b''.join([
+        protocol.encode_init(player_id(1)),
+        protocol.encode_snapshot(7, as_snapshot(world)),
+        protocol.encode_input_ack(7, 3),
+        protocol.encode_join('Zoé', 'rogue'),
+        protocol.encode_input([(1, 2), (2, 0)], 6),
+        protocol.encode_disconnect(player_id(2)),
+    ])
+    assert decode_all(data) == [
+        ('init', player_id(1)),
+        ('snapshot', 7, world),
+        ('input_ack', 7, 3),
+        {'pseudo': 'Zoé', 'soldier_type': 'rogue'},
+        {'inputs': [(1, 2), (2, 0)], 'ack': 6},
+        ('disconnect', player_id(2)),
+    ]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_stream_random_splits(seed):
+    # recv() can return any slice of the stream: partial headers, partial
+    # payloads, several frames at once
+    rng = random.Random(seed)
+    data = b''.join(frames(rng) * 3)
+    expected = decode_all(data)
+    decoder = StreamDecoder()
+    received = []
+    offset = 0
+    while offset < len(data):
+        size = rng.choice((1, 2, 5, rng.randrange(1, 200), rng.randrange(1, len(data) + 1)))
+        received += decoder.feed(data[offset:offset + size])
+        offset += size
+    assert received == expected
+    assert not decoder.buffer
+
+
+def test_stream_coalesced_and_byte_by_byte():
+    data = b''.join(frames(random.Random(3)))
+    expected = decode_all(data)
+    assert StreamDecoder().feed(data) == expected
+    decoder = StreamDecoder()
+    assert [message for byte in data for message in decoder.feed(bytes((byte,)))] == expected
+
+
+def test_stream_keeps_partial_frame():
+    frame = protocol.encode_input_ack(5, 9)
+    decoder = StreamDecoder()
+    assert decoder.feed(frame + frame[:3]) == [('input_ack', 5, 9)]
+    assert decoder.feed(frame[3:]) == [('input_ack', 5, 9)]
+
+
+def test_wrong_version():
+    header = protocol.HEADER.pack(8, protocol.PROTOCOL_VERSION + 1, protocol.MSG_INPUT_ACK)
+    with pytest.raises(ProtocolError):
+        StreamDecoder().feed(header + bytes(8))
+
+
+def test_frame_too_large():
+    # Refused from the header alone, before the payload is buffered
+    header = protocol.HEADER.pack(1000, protocol.PROTOCOL_VERSION, protocol.MSG_SNAPSHOT)
+    with pytest.raises(ProtocolError):
+        StreamDecoder(max_frame_size=999).feed(header)
+
+
+@pytest.mark.parametrize('msg_type, payload', [
+    (99, b''),  # Unknown type
+    (protocol.MSG_INPUT_ACK, bytes(3)),  # Truncated
+    (protocol.MSG_SNAPSHOT, protocol.SNAPSHOT.pack(1, 2)),  # Announces players that aren't there
+    (protocol.MSG_JOIN, protocol.JOIN.pack(5, 0) + b'abc'),  # String past the end
+    (protocol.MSG_JOIN, protocol.JOIN.pack(2, 0) + b'\xff\xfe'),  # Not utf-8
+    (protocol.MSG_INPUT, protocol.INPUT.pack(0, 2) + protocol.INPUT_COMMAND.pack(1, 0)),
+    (protocol.MSG_DELTA, protocol.DELTA.pack(2, 1, 1, 0)),  # Removed id missing
+])
+def test_malformed_payload(msg_type, payload):
+    frame = protocol.HEADER.pack(len(payload), protocol.PROTOCOL_VERSION, msg_type) + payload
+    with pytest.raises(ProtocolError):
+        StreamDecoder().feed(frame)
+
+
+def test_bad_bullet_direction():
+    world = {player_id(1): ((1.0, 2.0), 'a', 'falcon', 100, [(0.0, 0.0, 'left', 0)])}
+    frame = bytearray(protocol.encode_snapshot(1, as_snapshot(world)))
+    frame[-protocol.BULLET.size + 8] = len(protocol.DIRECTIONS)  # Direction byte of the bullet
+    with pytest.raises(ProtocolError):
+        StreamDecoder().feed(bytes(frame))
+
+
+def test_encode_refuses_long_strings():
+    with pytest.raises(ProtocolError):
+        protocol.encode_join('x' * 256, 'falcon')
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_delta_round_trip_against_acked_baseline(seed):
+    # The server encodes against the last world the client acked, which can
+    # be several ticks old; applying the delta to that world gives the new one
+    rng = random.Random(seed)
+    worlds = {1: random_world(rng, [player_id(n) for n in range(1, 9)])}
+    for tick in range(2, 12):
+        worlds[tick] = next_world(rng, worlds[tick - 1])
+    client_worlds = {1: worlds[1]}
+    acked = 1
+    for tick in range(2, 12):
+        (message,) = StreamDecoder().feed(protocol.encode_delta(tick, acked, worlds[acked], worlds[tick]))
+        _, decoded_tick, baseline_tick, removed, changes = message
+        assert (decoded_tick, baseline_tick) == (tick, acked)
+        client_worlds[tick] = protocol.apply_delta(client_worlds[baseline_tick], removed, changes)
+        assert client_worlds[tick] == worlds[tick]
+        if rng.random() < 0.5:  # Acks get lost, the baseline falls behind
+            acked = tick
+
+
+def test_delta_only_sends_changes():
+    world = random_world(random.Random(4), [player_id(n) for n in range(1, 4)])
+    moved = dict(world)
+    position, pseudo, soldier_type, health, bullets = world[player_id(2)]
+    moved[player_id(2)] = ((position[0] + 5, position[1]), pseudo, soldier_type, health, bullets)
+    del moved[player_id(3)]
+    (message,) = StreamDecoder().feed(protocol.encode_delta(2, 1, world, moved))
+    _, _, _, removed, changes = message
+    assert removed == [player_id(3)]
+    assert list(changes) == [player_id(2)]
+    assert changes[player_id(2)][0] == protocol.FIELD_POSITION
+    assert not StreamDecoder().feed(protocol.encode_delta(2, 1, world, world))[0][4]
+
+
+def test_partial_delta_for_unknown_player():
+    changes = {player_id(1): (protocol.FIELD_POSITION, ((1.0, 1.0), None, None, None, None))}
+    with pytest.raises(ProtocolError):
+        protocol.apply_delta({}, [], changes)
@@ -0,0 +1,81 @@
+import os
+import shutil
+import sys
+import uuid
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game.replay import ReplayRecorder, ReplayReader, TRAILER
+
+PLAYER_ID = str(uuid.UUID(int=1))
+KEYFRAME_INTERVAL = 10
+# TickScheduler numbers ticks from 1 without gaps; the last slot is partial
+TICKS = list(range(1, 96))
+
+
+def world_at(tick):
+    return {PLAYER_ID: ((tick, 100), 'bot', 'falcon', 100, [])}
+
+
+@pytest.fixture
+def replay_path(tmp_path):
+    path = str(tmp_path / 'match.replay')
+    recorder = ReplayRecorder(path, 30, KEYFRAME_INTERVAL)
+    for tick in TICKS:
+        recorder.record(tick, world_at(tick))
+    recorder.close()
+    return path
+
+
+def frames_end(path):
+    # Where the frames stop and the index starts
+    with open(path, 'rb') as f:
+        f.seek(-TRAILER.size, os.SEEK_END)
+        return TRAILER.unpack(f.read())[1]
+
+
+def cut(path, size, tmp_path):
+    # A copy of the recording as a crash would leave it: no index, maybe
+    # half a frame at the end
+    copy = str(tmp_path / f'cut{size}.replay')
+    shutil.copy(path, copy)
+    with open(copy, 'r+b') as f:
+        f.truncate(size)
+    return copy
+
+
+@pytest.mark.parametrize('rebuilt', [False, True])
+def test_seek_every_tick(replay_path, tmp_path, rebuilt):
+    if rebuilt:
+        replay_path = cut(replay_path, frames_end(replay_path), tmp_path)
+    reader = ReplayReader(replay_path)
+    assert reader.slots == 10
+    for tick in TICKS:
+        assert reader.seek(tick) == (tick, world_at(tick))
+    assert reader.seek(0) == (1, world_at(1))  # Before the start
+    assert reader.seek(500) == (95, world_at(95))  # Past the end, in the partial last slot
+    reader.close()
+
+
+def test_ticks_stream_from_seek(replay_path):
+    reader = ReplayReader(replay_path)
+    assert [tick for tick, _ in reader.ticks(37)] == TICKS[36:]
+    reader.close()
+
+
+def test_crash_mid_frame(replay_path, tmp_path):
+    # Every cut from inside the keyframe of the partial last slot (tick 81)
+    # to the end: the replay stops at the last complete frame, and a cut
+    # keyframe falls back to the slot before it
+    reader = ReplayReader(replay_path)
+    ends = [(end, tick) for _, end, _, tick in reader._frame_headers(reader.keyframe_offset(81), reader.frames_end)]
+    reader.close()
+    for size in range(ends[0][0] - 3, ends[-1][0]):
+        last_tick = max([tick for end, tick in ends if end <= size] or [80])
+        cut_reader = ReplayReader(cut(replay_path, size, tmp_path))
+        assert cut_reader.last_tick == last_tick
+        assert cut_reader.seek(last_tick + 5) == (last_tick, world_at(last_tick))
+        assert cut_reader.seek(75) == (75, world_at(75))
+        cut_reader.close()
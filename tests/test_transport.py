@@ -0,0 +1,139 @@
+import os
+import random
+import socket
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game import protocol, transport
+from game.transport import UdpPeer, NetworkConditions, PACKET, PACKET_ACK, MAX_PAYLOAD, RESEND_INTERVAL
+
+
+class Wire:
+    # Stands in for the socket: keeps what a peer sends
+    def __init__(self):
+        self.packets = []
+
+    def sendto(self, packet, address):
+        self.packets.append(packet)
+
+    def take(self):
+        packets, self.packets = self.packets, []
+        return packets
+
+
+def big_snapshot(tick, players=40):
+    # Several MAX_PAYLOAD chunks on the reliable channel
+    states = [(str(uuid.UUID(int=n + 1)), (float(n), 2.0), f"bot{n}", 'falcon', 100,
+               [(1.0, 2.0, 'left', b) for b in range(3)]) for n in range(players)]
+    return protocol.encode_snapshot(tick, states)
+
+
+def peers():
+    a_wire, b_wire = Wire(), Wire()
+    return UdpPeer(a_wire, ('b', 1)), a_wire, UdpPeer(b_wire, ('a', 1)), b_wire
+
+
+def test_reliable_reordered_and_duplicated():
+    a, a_wire, b, b_wire = peers()
+    for tick in range(1, 6):
+        a.send(protocol.encode_input_ack(tick, tick), reliable=True)
+    packets = a_wire.take()
+    delivered = []
+    for packet in reversed(packets + packets[1:3]):
+        delivered += b.receive(packet)
+    assert delivered == [('input_ack', tick, tick) for tick in range(1, 6)]
+    assert not b.out_of_order
+
+    # Every datagram got a cumulative ack, the last one covers everything
+    acks = b_wire.take()
+    assert PACKET.unpack_from(acks[-1]) == (PACKET_ACK, 5)
+    a.receive(acks[-1])
+    assert not a.unacked
+
+
+def test_reliable_chunks_joined_in_order():
+    a, a_wire, b, _ = peers()
+    frame = big_snapshot(7)
+    a.send(frame, reliable=True)
+    packets = a_wire.take()
+    assert len(packets) == -(-len(frame) // MAX_PAYLOAD)
+    assert all(len(packet) <= PACKET.size + MAX_PAYLOAD for packet in packets)
+    delivered = []
+    for packet in packets[1:]:
+        delivered += b.receive(packet)
+    assert delivered == []  # Nothing until the first chunk is there
+    delivered += b.receive(packets[0])
+    assert delivered == protocol.StreamDecoder().feed(frame)
+
+
+def test_unacked_resent_until_acked():
+    a, a_wire, b, b_wire = peers()
+    a.send(protocol.encode_disconnect(str(uuid.UUID(int=1))), reliable=True)
+    (packet,) = a_wire.take()
+    now = time.perf_counter()
+    a.resend(now)
+    assert a_wire.take() == []  # Not late yet
+    a.resend(now + RESEND_INTERVAL)
+    assert a_wire.take() == [packet]
+    b.receive(packet)
+    a.receive(b_wire.take()[0])
+    a.resend(now + 10 * RESEND_INTERVAL)
+    assert a_wire.take() == []
+
+
+def test_unreliable_stale_dropped():
+    a, a_wire, b, _ = peers()
+    for tick in (1, 2, 3):
+        a.send(protocol.encode_input_ack(tick, tick))
+    first, second, third = a_wire.take()
+    assert b.receive(third) == [('input_ack', 3, 3)]
+    assert b.receive(first) == []
+    assert b.receive(second) == []
+    assert b.stale == 2
+
+
+def test_loopback_reliable_in_order_under_loss(monkeypatch):
+    # Two peers over real sockets, both directions losing, delaying and
+    # reordering datagrams: every reliable frame arrives once, in order
+    monkeypatch.setattr(transport, 'RESEND_INTERVAL', 0.02)
+    a_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    b_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    for sock in (a_sock, b_sock):
+        sock.bind(('127.0.0.1', 0))
+        sock.setblocking(False)
+    a_conditions = NetworkConditions(loss=0.3, latency=0.002, jitter=0.01, seed=1)
+    b_conditions = NetworkConditions(loss=0.3, latency=0.002, jitter=0.01, seed=2)
+    a = UdpPeer(a_sock, b_sock.getsockname(), a_conditions)
+    b = UdpPeer(b_sock, a_sock.getsockname(), b_conditions)
+
+    rng = random.Random(3)
+    frames = [big_snapshot(tick, rng.randrange(1, 40)) if rng.random() < 0.2 else protocol.encode_input_ack(tick, tick)
+              for tick in range(1, 61)]
+    expected = [message for frame in frames for message in protocol.StreamDecoder().feed(frame)]
+    for frame in frames:
+        a.send(frame, reliable=True)
+
+    delivered = []
+    deadline = time.perf_counter() + 10
+    try:
+        while (len(delivered) < len(expected) or a.unacked) and time.perf_counter() < deadline:
+            a.resend(time.perf_counter())
+            a_conditions.flush(a_sock)
+            b_conditions.flush(b_sock)
+            for sock, peer, messages in ((b_sock, b, delivered), (a_sock, a, [])):
+                while True:
+                    try:
+                        packet, _ = sock.recvfrom(transport.MAX_DATAGRAM)
+                    except BlockingIOError:
+                        break
+                    messages += peer.receive(packet)
+            time.sleep(0.001)
+    finally:
+        a_sock.close()
+        b_sock.close()
+    assert delivered == expected
+    assert not a.unacked
+    assert a.resent > 0